@@ -7,9 +7,34 @@ from fastapi import APIRouter, Query, HTTPException
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+import os
+
+try:
+    from app.services.rollup_planner import DAY, WEEK, MONTH, buckets, choose_interval
+except ImportError:
+    from services.rollup_planner import DAY, WEEK, MONTH, buckets, choose_interval
 
 router = APIRouter()
 
+INTERVALS = (DAY, WEEK, MONTH, "auto")
+
+# "mock" (default, generated data) or "dynamodb" (rollups in METRICS_TABLE_NAME)
+METRICS_SOURCE = os.getenv("METRICS_SOURCE", "mock")
+
+_rollup_service = None
+
+
+def get_rollup_service():
+    """Rollup service, created on first use (boto3 is only needed with METRICS_SOURCE=dynamodb)"""
+    global _rollup_service
+    if _rollup_service is None:
+        try:
+            from app.services.metrics_rollup import MetricsRollupService
+        except ImportError:
+            from services.metrics_rollup import MetricsRollupService
+        _rollup_service = MetricsRollupService()
+    return _rollup_service
+
 
 # Response Models
 class CommitActivity(BaseModel):
@@ -43,33 +68,39 @@ class Contributor(BaseModel):
 
 
 # Mock data generators
-def generate_commit_activity(start_date: datetime, end_date: datetime) -> List[CommitActivity]:
-    """Generate mock commit activity data"""
+def generate_commit_activity(start_date: datetime, end_date: datetime, interval: str = DAY) -> List[CommitActivity]:
+    """Generate mock commit activity data, one entry per interval bucket"""
     import random
     
     activities = []
-    current_date = start_date
     
-    while current_date <= end_date:
-        # Generate random commit count (0-20)
-        count = random.randint(0, 20)
+    for first, last in buckets(start_date.date(), end_date.date(), interval):
+        # Generate random commit count (0-20 per day)
+        days = (last - first).days + 1
+        count = random.randint(0, 20 * days)
         
         # Generate random authors
         all_authors = ["alice", "bob", "charlie", "diana", "eve"]
-        num_authors = random.randint(1, min(count, len(all_authors)))
-        authors = random.sample(all_authors, num_authors) if count > 0 else []
+        num_authors = random.randint(1, min(count, len(all_authors))) if count > 0 else 0
+        authors = random.sample(all_authors, num_authors)
         
         activities.append(CommitActivity(
-            date=current_date.strftime("%Y-%m-%d"),
+            date=first.strftime("%Y-%m-%d"),
             count=count,
             authors=authors
         ))
-        
-        current_date += timedelta(days=1)
     
     return activities
 
 
+def _parse_range(start_date: str, end_date: str):
+    start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+    end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    return start, end
+
+
 def generate_pr_metrics() -> PRMetrics:
     """Generate mock PR metrics"""
     import random
@@ -93,24 +124,34 @@ def generate_pr_metrics() -> PRMetrics:
 async def get_commit_frequency(
     team_id: str = Query(..., description="Team identifier"),
     start_date: str = Query(..., description="Start date (ISO format)"),
-    end_date: str = Query(..., description="End date (ISO format)")
+    end_date: str = Query(..., description="End date (ISO format)"),
+    interval: str = Query("auto", description="Bucket size: day, week, month or auto")
 ):
     """
-    Get commit frequency data for a team within a date range
+    Get commit frequency data for a team within a date range, one entry per
+    interval bucket (auto: daily up to two months, then weekly, then monthly).
+
+    Buckets are read from the coarsest rollups that cover them, so a year of
+    data costs tens of reads.
     """
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVALS)}")
     try:
-        start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        
-        if start > end:
-            raise HTTPException(status_code=400, detail="Start date must be before end date")
-        
-        # Generate mock data
-        activities = generate_commit_activity(start, end)
-        
-        return activities
+        start, end = _parse_range(start_date, end_date)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
+    if interval == "auto":
+        interval = choose_interval(start.date(), end.date())
+    
+    if METRICS_SOURCE != "dynamodb":
+        # Generate mock data
+        return generate_commit_activity(start, end, interval)
+    
+    series = get_rollup_service().series(team_id, "commits", start.date(), end.date(), interval)
+    return [
+        CommitActivity(date=bucket["date"], count=int(bucket["total"]), authors=bucket["authors"])
+        for bucket in series
+    ]
 
 
 @router.get("/pr_analytics", response_model=PRMetrics)
@@ -132,10 +173,23 @@ async def get_pr_velocity(
     end_date: str = Query(..., description="End date (ISO format)")
 ):
     """
-    Get PR velocity metric for a team
+    Get PR velocity metric for a team: merged PRs per week over the range
     """
     import random
     
+    if METRICS_SOURCE == "dynamodb":
+        try:
+            start, end = _parse_range(start_date, end_date)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
+        merged = get_rollup_service().total(team_id, "prs_merged", start.date(), end.date())
+        weeks = ((end.date() - start.date()).days + 1) / 7
+        return MetricData(
+            timestamp=datetime.now().isoformat(),
+            value=round(merged / weeks, 2),
+            label="PRs per week"
+        )
+    
     return MetricData(
         timestamp=datetime.now().isoformat(),
         value=round(random.uniform(5, 25), 2),
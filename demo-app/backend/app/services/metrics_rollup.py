@@ -0,0 +1,260 @@
+"""
+Metrics rollups for the dashboard API.
+
+Raw points in the metrics table ({name: <metric>, timestamp, team_id, value,
+author}) are aggregated into per-team daily, weekly and monthly rollups kept
+in the same table:
+
+    name      = "rollup#<team_id>#<metric>#<day|week|month>"
+    timestamp = period start ("YYYY-MM-DD"; weeks start on Monday)
+    total, points, authors
+
+Rollups are maintained from the table's DynamoDB stream (handle_stream), and
+can be rebuilt from raw points for a range (rebuild). Queries go through
+rollup_planner.plan_query, which covers a range with the coarsest rollups
+that fit, so a year of data costs tens of item reads instead of one per day
+or per point.
+"""
+
+import os
+import logging
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import boto3
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+
+from .rollup_planner import DAY, WEEK, MONTH, GRANULARITIES, period_start, period_end, plan_query, buckets
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PREFIX = "rollup#"
+
+# Metrics that get rollups; other raw points are ignored by the stream handler
+ROLLUP_METRICS = ("commits", "prs_opened", "prs_merged", "reviews")
+
+
+def rollup_key(team_id: str, metric: str, granularity: str) -> str:
+    return f"{ROLLUP_PREFIX}{team_id}#{metric}#{granularity}"
+
+
+def _parse_day(timestamp: str) -> date:
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).date()
+
+
+class MetricsRollupService:
+    """Maintains and queries per-team metric rollups in DynamoDB."""
+
+    def __init__(self, table=None):
+        self.table_name = os.environ.get("METRICS_TABLE_NAME", "DeveloperProductivityMetrics")
+        if table is None:
+            self.dynamodb = boto3.resource("dynamodb")
+            table = self.dynamodb.Table(self.table_name)
+        self.table = table
+
+    # ---- Maintenance ----
+
+    def apply_point(
+        self,
+        team_id: str,
+        metric: str,
+        timestamp: str,
+        value: float,
+        author: Optional[str] = None,
+        points: int = 1
+    ) -> None:
+        """
+        Add a raw point (or, with negative value/points, retract one) to the
+        day, week and month rollups containing it.
+
+        Authors are only ever added: a retracted point leaves its author in
+        the rollup until the range is rebuilt.
+        """
+        day = _parse_day(timestamp)
+        for granularity in GRANULARITIES:
+            update = "ADD #total :value, #points :points"
+            names = {"#total": "total", "#points": "points"}
+            values: Dict[str, Any] = {":value": Decimal(str(value)), ":points": points}
+            if author and points > 0:
+                update += ", #authors :authors"
+                names["#authors"] = "authors"
+                values[":authors"] = {author}
+            try:
+                self.table.update_item(
+                    Key={
+                        "name": rollup_key(team_id, metric, granularity),
+                        "timestamp": period_start(day, granularity).isoformat()
+                    },
+                    UpdateExpression=update,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+            except ClientError as e:
+                logger.error(f"Error updating {granularity} rollup of {metric} for {team_id}: {e}")
+                raise
+
+    def rebuild(self, team_id: str, metric: str, start: date, end: date) -> int:
+        """
+        Recompute the rollups of the whole months overlapping [start, end]
+        from raw points.
+
+        Returns:
+            Number of raw points read
+        """
+        month_start = period_start(start, MONTH)
+        month_end = period_end(period_start(end, MONTH), MONTH)
+        # Weeks straddling the months' edges are rebuilt whole, so read their days too
+        start, end = period_start(month_start, WEEK), period_end(period_start(month_end, WEEK), WEEK)
+
+        rollups: Dict[Tuple[str, date], Dict[str, Any]] = {}
+        for granularity, first, last in ((DAY, start, end), (WEEK, start, end), (MONTH, month_start, month_end)):
+            while first <= last:
+                rollups[(granularity, first)] = {"total": Decimal(0), "points": 0, "authors": set()}
+                first = period_end(first, granularity) + timedelta(days=1)
+
+        points = 0
+        for item in self._raw_points(team_id, metric, start, end):
+            day = _parse_day(item["timestamp"])
+            if not start <= day <= end:
+                continue
+            points += 1
+            for granularity in GRANULARITIES:
+                rollup = rollups.get((granularity, period_start(day, granularity)))
+                if rollup is None:
+                    continue
+                rollup["total"] += Decimal(str(item.get("value", 1)))
+                rollup["points"] += 1
+                if item.get("author"):
+                    rollup["authors"].add(item["author"])
+
+        with self.table.batch_writer() as batch:
+            for (granularity, first), rollup in rollups.items():
+                item = {
+                    "name": rollup_key(team_id, metric, granularity),
+                    "timestamp": first.isoformat(),
+                    "total": rollup["total"],
+                    "points": rollup["points"],
+                }
+                # DynamoDB rejects empty sets
+                if rollup["authors"]:
+                    item["authors"] = rollup["authors"]
+                batch.put_item(Item=item)
+        logger.info(f"Rebuilt {len(rollups)} rollups of {metric} for {team_id} from {points} points")
+        return points
+
+    def _raw_points(self, team_id: str, metric: str, start: date, end: date):
+        kwargs = {
+            "IndexName": "TeamIdIndex",
+            "KeyConditionExpression": Key("team_id").eq(team_id) & Key("timestamp").between(
+                start.isoformat(), (end + timedelta(days=1)).isoformat()
+            ),
+            "FilterExpression": Attr("name").eq(metric),
+        }
+        while True:
+            response = self.table.query(**kwargs)
+            yield from response.get("Items", [])
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # ---- Queries ----
+
+    def series(self, team_id: str, metric: str, start: date, end: date, interval: str = DAY) -> List[Dict[str, Any]]:
+        """
+        Metric totals per interval bucket over [start, end].
+
+        Each bucket is read from the coarsest rollups inside it (edge buckets
+        clipped to the range are assembled from finer ones).
+
+        Returns:
+            [{"date": bucket start (clipped to start), "total", "points", "authors"}]
+        """
+        series = {
+            first: {"date": first.isoformat(), "total": 0.0, "points": 0, "authors": set()}
+            for first, _ in buckets(start, end, interval)
+        }
+        starts = sorted(series)
+
+        for granularity, first, rollup in self._read(team_id, metric, plan_query(start, end, interval)):
+            bucket = series[starts[bisect_right(starts, first) - 1]]
+            bucket["total"] += float(rollup.get("total", 0))
+            bucket["points"] += int(rollup.get("points", 0))
+            bucket["authors"] |= set(rollup.get("authors", ()))
+
+        return [{**bucket, "authors": sorted(bucket["authors"])} for _, bucket in sorted(series.items())]
+
+    def total(self, team_id: str, metric: str, start: date, end: date) -> float:
+        """Metric total over [start, end] from the fewest rollups"""
+        return sum(
+            float(rollup.get("total", 0))
+            for _, _, rollup in self._read(team_id, metric, plan_query(start, end))
+        )
+
+    def _read(self, team_id: str, metric: str, plan: List[Tuple[str, date]]):
+        """Rollup items of a plan: one range query per run of same-granularity periods"""
+        runs: List[Tuple[str, date, date]] = []
+        for granularity, first in plan:
+            if runs and runs[-1][0] == granularity and \
+                    period_end(runs[-1][2], granularity) + timedelta(days=1) == first:
+                runs[-1] = (granularity, runs[-1][1], first)
+            else:
+                runs.append((granularity, first, first))
+
+        for granularity, first, last in runs:
+            kwargs = {
+                "KeyConditionExpression": Key("name").eq(rollup_key(team_id, metric, granularity))
+                & Key("timestamp").between(first.isoformat(), last.isoformat())
+            }
+            while True:
+                try:
+                    response = self.table.query(**kwargs)
+                except ClientError as e:
+                    logger.error(f"Error reading {granularity} rollups of {metric} for {team_id}: {e}")
+                    raise
+                for item in response.get("Items", []):
+                    yield granularity, date.fromisoformat(item["timestamp"]), item
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _stream_point(image: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Raw metric point from a stream image (DynamoDB JSON), or None for rollups and other items"""
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    item = {key: deserializer.deserialize(value) for key, value in image.items()}
+    if item.get("name") not in ROLLUP_METRICS or not item.get("team_id"):
+        return None
+    return item
+
+
+_service: Optional[MetricsRollupService] = None
+
+
+def handle_stream(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+    """
+    Lambda handler for the metrics table's stream: folds inserted, changed and
+    removed raw points into the rollups (rollup writes themselves are skipped).
+
+    Stream records can be redelivered; rebuild() restores exact rollups for a
+    range if a batch was applied twice.
+    """
+    global _service
+    if _service is None:
+        _service = MetricsRollupService()
+
+    applied = 0
+    for record in event.get("Records", []):
+        change = record.get("dynamodb", {})
+        new = _stream_point(change["NewImage"]) if "NewImage" in change else None
+        old = _stream_point(change["OldImage"]) if "OldImage" in change else None
+        if old:
+            _service.apply_point(old["team_id"], old["name"], old["timestamp"], -float(old.get("value", 1)), points=-1)
+            applied += 1
+        if new:
+            _service.apply_point(new["team_id"], new["name"], new["timestamp"], float(new.get("value", 1)), new.get("author"))
+            applied += 1
+    return {"applied": applied}
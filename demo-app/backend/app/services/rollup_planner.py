@@ -0,0 +1,92 @@
+"""
+Rollup periods and query planning for metrics rollups.
+
+Pure date arithmetic shared by the rollup service and the metrics API (also
+in mock mode, without DynamoDB).
+"""
+
+from typing import List, Tuple
+from datetime import date, timedelta
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+GRANULARITIES = (DAY, WEEK, MONTH)
+
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the day/week/month containing day"""
+    if granularity == DAY:
+        return day
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def period_end(start: date, granularity: str) -> date:
+    """Last day of the period starting at start"""
+    if granularity == DAY:
+        return start
+    if granularity == WEEK:
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def plan_query(start: date, end: date, max_granularity: str = MONTH) -> List[Tuple[str, date]]:
+    """
+    Cover [start, end] with the fewest rollup periods, coarsest first.
+
+    Months are used where a whole month lies in the range, weeks where a whole
+    week does (never straddling a month boundary when months are allowed, so
+    every period falls inside one month bucket), and days for the edges.
+
+    Args:
+        start: First day of the range
+        end: Last day of the range (inclusive)
+        max_granularity: Coarsest rollup to use (also the bucket size the
+            periods must not straddle)
+
+    Returns:
+        (granularity, period start) pairs in date order
+    """
+    allowed = GRANULARITIES[:GRANULARITIES.index(max_granularity) + 1]
+    segments = []
+    day = start
+    while day <= end:
+        if MONTH in allowed and day.day == 1 and period_end(day, MONTH) <= end:
+            segments.append((MONTH, day))
+            day = period_end(day, MONTH) + timedelta(days=1)
+        elif (
+            WEEK in allowed and day.weekday() == 0 and period_end(day, WEEK) <= end
+            and (MONTH not in allowed or period_start(period_end(day, WEEK), MONTH) == period_start(day, MONTH))
+        ):
+            segments.append((WEEK, day))
+            day += timedelta(days=7)
+        else:
+            segments.append((DAY, day))
+            day += timedelta(days=1)
+    return segments
+
+
+def choose_interval(start: date, end: date, max_points: int = 62) -> str:
+    """Finest bucket size that keeps a series over [start, end] within max_points"""
+    days = (end - start).days + 1
+    if days <= max_points:
+        return DAY
+    if days <= max_points * 7:
+        return WEEK
+    return MONTH
+
+
+def buckets(start: date, end: date, interval: str) -> List[Tuple[date, date]]:
+    """Interval buckets covering [start, end], the first and last clipped to the range"""
+    result = []
+    first = start
+    while first <= end:
+        last = min(period_end(period_start(first, interval), interval), end)
+        result.append((first, last))
+        first = last + timedelta(days=1)
+    return result
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Artifact Index Benchmark - Measure section-tree indexing on large artifacts
+
+Compares the legacy approach (each validator/extractor re-scanning the raw
+text) with a single memoised ArtifactIndex shared by all consumers.
+
+Usage:
+    python benchmarks/bench_artifact_index.py [--sizes 100,300,800] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.artifact_index import ArtifactIndex, get_artifact_index, clear_artifact_index_cache
+
+
+def build_artifact(target_kb: int) -> str:
+    """Build a synthetic IMPLEMENTATION_PLAN-like markdown document of ~target_kb"""
+    paragraph = (
+        "The component integrates with the authentication service and exposes a "
+        "REST API. Implementation follows the architecture strategy and approach "
+        "described in the system design, including edge cases and error handling.\n"
+    )
+    parts = ["# Implementation Plan\n\n## Executive Summary\n\n", paragraph * 5]
+    task_no = 0
+    while sum(len(p) for p in parts) < target_kb * 1024:
+        task_no += 1
+        parts.append(f"\n### Task {task_no}: Build module {task_no}\n\n")
+        parts.append(f"**Business Value**: Unlocks capability {task_no}\n\n")
+        parts.append(f"**Priority**: P{task_no % 3}\n\n")
+        parts.append("#### Implementation Details\n\n" + paragraph * 6)
+        parts.append("```python\ndef handler():\n    # ## not a heading\n    return 1\n```\n")
+        parts.append("```mermaid\ngraph TD; A-->B\n```\n")
+    parts.append("\n## Acceptance Criteria\n\n" + paragraph * 3)
+    parts.append("\n---\n\n## AI Generation Footprint\n\n**Generated By**: Planner AI\n")
+    return "".join(parts)
+
+
+def legacy_consumers(text: str) -> int:
+    """Replicates the pre-index validators/extractors, each doing its own pass"""
+    lower = text.lower()
+    checks = [
+        "executive summary" in lower or "scope" in lower,
+        "user flow" in lower or "user journey" in lower,
+        "functional requirement" in lower or "requirements" in lower,
+        "acceptance criteria" in lower or "success criteria" in lower,
+        "AI Generation Footprint" in text,
+    ]
+    words = len(text.split())
+
+    lower = text.lower()
+    checks += [
+        "high-level design" in lower or "architecture" in lower,
+        "```mermaid" in text or "diagram" in lower,
+        "```" in text,
+    ]
+    words += len(text.split())
+
+    tasks = 0
+    for line in text.split('\n'):
+        if line.startswith('### Task') or line.startswith('## Task'):
+            tasks += 1
+    return sum(checks) + words + tasks
+
+
+def indexed_consumers(text: str) -> int:
+    """Same checks served from the shared, memoised index"""
+    total = 0
+    for _ in range(3):  # requirements, architecture and planner consumers
+        index = get_artifact_index(text)
+        total += sum([
+            index.contains_any(["executive summary", "scope"]),
+            index.contains_any(["user flow", "user journey"]),
+            index.contains_any(["acceptance criteria", "success criteria"]),
+            index.has_section("AI Generation Footprint"),
+            index.has_code_block("mermaid"),
+        ])
+    index = get_artifact_index(text)
+    tasks = index.find_sections('Task', levels=(2, 3))
+    for task in tasks:
+        index.field_value(task, 'Business Value')
+    index.excerpt(1000)
+    return total + index.word_count + len(tasks)
+
+
+def time_it(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown artifact index")
+    parser.add_argument('--sizes', default='100,300,800', help='Artifact sizes in KB (comma separated)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per measurement (best is reported)')
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'sections':>9} {'build ms':>10} {'legacy ms':>10} {'cold ms':>9} {'warm ms':>9}")
+    for size_kb in [int(s) for s in args.sizes.split(',')]:
+        text = build_artifact(size_kb)
+        sections = len(ArtifactIndex(text).sections)
+
+        build_ms = time_it(lambda: ArtifactIndex(text), args.repeat)
+        legacy_ms = time_it(lambda: legacy_consumers(text), args.repeat)
+
+        def cold():
+            clear_artifact_index_cache()
+            indexed_consumers(text)
+
+        cold_ms = time_it(cold, args.repeat)
+        get_artifact_index(text)
+        warm_ms = time_it(lambda: indexed_consumers(text), args.repeat)
+
+        print(f"{size_kb:>6}KB {sections:>9} {build_ms:>10.2f} {legacy_ms:>10.2f} {cold_ms:>9.2f} {warm_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
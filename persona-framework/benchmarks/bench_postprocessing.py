@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Persona Post-processing Benchmark - Runtime and memory of response handling
+
+Measures the routines every persona runs on every model response:
+multi-part joining, fence stripping plus footprint append, ```filename:
+extraction, packed test splitting, extract_tasks, validate_output and
+closing a dangling fence. Synthetic outputs range from 1 KB to 10 MB in
+three shapes:
+
+    well_formed      every code fence closed
+    truncated        output cut off inside its last code block (one unterminated fence)
+    unclosed_fences  every code block and packed test file opened, none closed (malformed output)
+
+Each result is compared with a saved baseline; the script exits with status
+1 when a routine got slower or used more memory beyond the tolerance.
+Times are scaled by a calibration workload, so a baseline recorded on one
+machine stays usable on another. When the previous size suggests the next
+one would run past --max-seconds (quadratic regex backtracking), that size
+is skipped and reported as such.
+
+The personas are called for real (their modules need the packages in
+requirements.txt); only the model call is replaced by the synthetic output.
+
+Usage:
+    python benchmarks/bench_postprocessing.py [--sizes 1,10,100,1000,10000] [--repeat 3]
+    python benchmarks/bench_postprocessing.py --update-baseline
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from personas import architect_ai, unit_test_ai
+from personas.architect_ai import ArchitectAI
+from personas.developer_ai import DeveloperAI
+from personas.planner_ai import PlannerAI
+from personas.requirements_ai import RequirementsAI
+from personas.unit_test_ai import UnitTestAI, PACK_START, PACK_MARKER_END, PACK_END
+from utils.artifact_index import clear_artifact_index_cache
+from utils.continuation import close_fence
+from utils.llm import response_text
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'postprocessing.json')
+SHAPES = ('well_formed', 'truncated', 'unclosed_fences')
+
+# Differences below these are noise, whatever the tolerance
+MIN_TIME_DELTA_MS = 0.05
+MIN_MEMORY_DELTA_KB = 64
+
+PARAGRAPH = (
+    "The component integrates with the authentication service and exposes a "
+    "REST API. Implementation follows the architecture strategy and approach "
+    "described in the system design, including edge cases and error handling.\n"
+)
+CODE = (
+    "def handler(event, context):\n"
+    "    # Records arrive in batches of up to 500\n"
+    "    items = [transform(record) for record in event['records']]\n"
+    "    return {'status': 200, 'count': len(items)}\n"
+)
+
+
+# ---- Synthetic outputs ----
+
+def build_output(shape: str, target_kb: int) -> str:
+    """Markdown response of ~target_kb with tasks, code files and packed test files"""
+    target = target_kb * 1024
+    close = "" if shape == 'unclosed_fences' else "```\n"
+    parts = ["```markdown\n# Implementation Plan\n\n## Executive Summary\n\n", PARAGRAPH * 3,
+             "\n## Functional Requirements\n\n", PARAGRAPH * 2]
+    size = sum(len(p) for p in parts)
+    block = 0
+    while size < target:
+        block += 1
+        section = "".join([
+            f"\n### Task {block}: Build module {block}\n\n",
+            f"**Business Value**: Unlocks capability {block}\n\n",
+            f"**Priority**: P{block % 3}\n\n",
+            "#### Implementation Details\n\n", PARAGRAPH * 3,
+            f"```filename: src/module_{block}.py\n", CODE * 2, close,
+            f"{PACK_START}test_module_{block}.py{PACK_MARKER_END}\n", "def test_handler():\n    assert handler\n",
+            "" if shape == 'unclosed_fences' else f"{PACK_END}\n",
+        ])
+        parts.append(section)
+        size += len(section)
+
+    text = "".join(parts)
+    if shape == 'truncated':
+        # Cut off inside one last code block that never closes
+        half = len(text) // 2
+        text = text[:half] + "\n```filename: src/truncated.py\n" + CODE * max(1, (len(text) - half) // len(CODE))
+    else:
+        text += "\n## Acceptance Criteria\n\n" + PARAGRAPH + "```\n"
+    return text
+
+
+def multipart_response(text: str, part_chars: int = 1024):
+    """Response whose .text raises, as for multi-part candidates"""
+    parts = [SimpleNamespace(text=text[i:i + part_chars]) for i in range(0, len(text), part_chars)]
+
+    class MultiPartResponse:
+        candidates = [SimpleNamespace(content=SimpleNamespace(parts=parts))]
+
+        @property
+        def text(self):
+            raise ValueError("multiple parts")
+
+    return MultiPartResponse()
+
+
+# ---- Routines under test ----
+
+@contextmanager
+def model_output(module, text: str):
+    """Make module's generate_text return text instead of calling a model"""
+    original = module.generate_text
+    module.generate_text = lambda *args, **kwargs: text
+    try:
+        yield
+    finally:
+        module.generate_text = original
+
+
+def persona(cls):
+    """Persona instance without API setup"""
+    instance = cls.__new__(cls)
+    instance.persona_version = "bench"
+    instance.model = instance.fallback_model = None
+    return instance
+
+
+def build_routines():
+    """name -> (prepare(text) -> argument, run(argument))"""
+    architect = persona(ArchitectAI)
+    unit_tests = persona(UnitTestAI)
+
+    def fence_and_footprint(text):
+        with model_output(architect_ai, text):
+            return architect.design_architecture("# Requirements\n\nShort.")
+
+    # One pack of small files, as generate_test_files sends them
+    pack = {f"module_{i}.py": CODE for i in range(1, 7)}
+
+    def packed_tests(text):
+        with model_output(unit_test_ai, text):
+            return unit_tests._generate_packed_tests(list(pack), pack, "", "pytest")
+
+    def cold(fn):
+        # Index cache cleared first: each persona sees new output once
+        def run(text):
+            clear_artifact_index_cache()
+            return fn(None, text)
+        return run
+
+    return {
+        'response_text': (multipart_response, response_text),
+        'strip_fences': (str.strip, UnitTestAI._strip_fences),
+        'fence_and_footprint': (None, fence_and_footprint),
+        'extract_files': (None, lambda text: DeveloperAI._extract_files(None, text)),
+        'packed_tests': (None, packed_tests),
+        'extract_tasks': (None, cold(PlannerAI.extract_tasks)),
+        'validate_requirements': (None, cold(RequirementsAI.validate_output)),
+        'validate_architecture': (None, cold(ArchitectAI.validate_output)),
+        'close_fence': (None, close_fence),
+    }
+
+
+# ---- Measurement ----
+
+def time_it(fn, repeat: int, min_sample_seconds: float = 0.02) -> float:
+    """Best time per call in ms; fast calls are looped so each sample is measurable"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_seconds or loops >= 10000:
+            break
+        loops *= 10
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best * 1000
+
+
+def peak_memory_kb(fn) -> float:
+    """Peak memory allocated during one call, in KB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def calibrate(repeat: int) -> float:
+    """Time of a fixed regex/string workload, used to compare runs across machines"""
+    text = ("```python\n" + CODE * 4 + "```\n" + PARAGRAPH * 4) * 400
+
+    def workload():
+        re.findall(r'```python\n(.*?)```', text, re.DOTALL)
+        "\n".join(line.strip() for line in text.splitlines()).lower().count("fence")
+
+    return time_it(workload, max(repeat, 5))
+
+
+def predicted_ms(previous: list, size_kb: int) -> float:
+    """Extrapolate the next size's time from the growth between the last two sizes"""
+    if not previous:
+        return 0.0
+    if len(previous) == 1:
+        size, ms = previous[-1]
+        return ms * size_kb / size
+    (s1, t1), (s2, t2) = previous[-2:]
+    exponent = max(1.0, math.log(max(t2, 1e-6) / max(t1, 1e-6)) / math.log(s2 / s1))
+    return t2 * (size_kb / s2) ** exponent
+
+
+def run_benchmarks(sizes: list, repeat: int, max_seconds: float, only: list) -> dict:
+    routines = build_routines()
+    results = {}
+    print(f"{'routine':<22} {'shape':<16} {'size':>8} {'time ms':>11} {'peak KB':>10}")
+    for shape in SHAPES:
+        outputs = {size_kb: build_output(shape, size_kb) for size_kb in sizes}
+        for name, (prepare, run) in routines.items():
+            if only and name not in only:
+                continue
+            history = []
+            for size_kb in sizes:
+                key = f"{name}/{shape}/{size_kb}"
+                estimate = predicted_ms(history, size_kb)
+                if estimate > max_seconds * 1000:
+                    results[key] = {'skipped': True, 'predicted_ms': round(estimate, 1)}
+                    print(f"{name:<22} {shape:<16} {size_kb:>6}KB {'skipped':>11} "
+                          f"{'':>10}  (~{estimate / 1000:.0f}s predicted)")
+                    continue
+                argument = prepare(outputs[size_kb]) if prepare else outputs[size_kb]
+                ms = time_it(lambda: run(argument), repeat if estimate < 1000 else 1)
+                kb = peak_memory_kb(lambda: run(argument))
+                history.append((size_kb, ms))
+                results[key] = {'ms': round(ms, 4), 'peak_kb': round(kb, 1)}
+                print(f"{name:<22} {shape:<16} {size_kb:>6}KB {ms:>11.3f} {kb:>10.1f}")
+    return results
+
+
+def compare(results: dict, calibration_ms: float, baseline: dict, tolerance: float) -> list:
+    """Regressions against the baseline, as printable lines"""
+    scale = calibration_ms / baseline['calibration_ms']
+    regressions = []
+    for key, current in results.items():
+        previous = baseline['results'].get(key)
+        if previous is None:
+            continue
+        if current.get('skipped'):
+            if not previous.get('skipped'):
+                regressions.append(f"{key}: now predicted at {current['predicted_ms'] / 1000:.0f}s "
+                                   f"(was {previous['ms']:.3f} ms)")
+            continue
+        if previous.get('skipped'):
+            continue
+        allowed_ms = previous['ms'] * scale * (1 + tolerance) + MIN_TIME_DELTA_MS
+        if current['ms'] > allowed_ms:
+            regressions.append(f"{key}: {current['ms']:.3f} ms vs baseline {previous['ms'] * scale:.3f} ms "
+                               f"({current['ms'] / (previous['ms'] * scale):.1f}x)")
+        allowed_kb = previous['peak_kb'] * (1 + tolerance) + MIN_MEMORY_DELTA_KB
+        if current['peak_kb'] > allowed_kb:
+            regressions.append(f"{key}: peak {current['peak_kb']:.0f} KB vs baseline {previous['peak_kb']:.0f} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark persona response post-processing")
+    parser.add_argument('--sizes', default='1,10,100,1000,10000', help='Output sizes in KB (comma separated)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement (best is reported)')
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help='Skip sizes predicted to take longer than this per call')
+    parser.add_argument('--only', default='', help='Routines to run (comma separated, default all)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed slowdown/memory growth over the baseline (0.5 = 50%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the new baseline')
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+    only = [s for s in args.only.split(',') if s]
+    calibration_ms = calibrate(args.repeat)
+    print(f"Calibration workload: {calibration_ms:.2f} ms\n")
+    results = run_benchmarks(sizes, args.repeat, args.max_seconds, only)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'calibration_ms': round(calibration_ms, 4), 'results': results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️  No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, calibration_ms, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over the baseline (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"   - {line}")
+        sys.exit(1)
+    print(f"\n✅ No regressions over the baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 from datetime import datetime
 
+from context_bootstrap.repo_indexer import RepoIndexer
+
 class ContextBootstrap:
     """
     Bootstraps the .ai/ directory structure with context files
@@ -15,8 +17,9 @@ class ContextBootstrap:
         self.ai_dir = self.project_root / ".ai"
         self.rules_dir = self.ai_dir / "rules"
         self.workflow_dir = self.ai_dir / "workflow"
+        self.indexer = RepoIndexer(str(self.project_root), index_path=self.ai_dir / "repo_index.json")
         
-    def bootstrap(self, project_info: Dict[str, Any]) -> None:
+    def bootstrap(self, project_info: Dict[str, Any], index_repo: bool = True) -> None:
         """
         Create complete .ai/ directory structure with context files
         
@@ -27,6 +30,7 @@ class ContextBootstrap:
                 "tech_stack": ["Python", "FastAPI", "React"],
                 "architecture_type": "microservices|monolith|serverless"
             }
+            index_repo: Scan the actual codebase and generate CODEBASE_OVERVIEW.md
         """
         print("🚀 Bootstrapping Persona-Driven AI Framework context...")
         
@@ -37,11 +41,30 @@ class ContextBootstrap:
         self._generate_architecture_md(project_info)
         self._generate_coding_standards_md(project_info)
         self._generate_system_overview_md(project_info)
-        self._generate_global_coverage_json(project_info)
+
+        codebase = None
+        if index_repo:
+            codebase = self.index_repository()
+            self._generate_codebase_overview_md(project_info, codebase)
+
+        self._generate_global_coverage_json(project_info, codebase)
         
         print("✅ Context bootstrap complete!")
         print(f"📁 Created: {self.ai_dir}")
         
+    def index_repository(self) -> Dict[str, Any]:
+        """
+        Refresh the incremental repository index and return its summary.
+
+        Only files whose mtime or size changed since the last run are re-parsed.
+        """
+        stats = self.indexer.refresh()
+        print(f"🔎 Indexed {stats['files']} files "
+              f"({stats['parsed']} parsed, {stats['reused']} unchanged) in {stats['duration_seconds']}s")
+        summary = self.indexer.summary()
+        summary['stats'] = stats
+        return summary
+
     def _create_directories(self):
         """Create .ai/ directory structure"""
         dirs = [
@@ -191,7 +214,57 @@ This document defines coding standards and best practices for the {project_info[
 
         (self.rules_dir / "SYSTEM_OVERVIEW.md").write_text(content)
 
-    def _generate_global_coverage_json(self, project_info: Dict[str, Any]):
+    def _generate_codebase_overview_md(self, project_info: Dict[str, Any], codebase: Dict[str, Any]):
+        """Generate CODEBASE_OVERVIEW.md from the repository index"""
+        languages = "\n".join(
+            f"- {language}: {count} files" for language, count in sorted(codebase['languages'].items())
+        ) or "- No source files found"
+
+        modules = "\n".join(
+            f"- `{module['path']}`"
+            + (f" — classes: {', '.join(module['classes'][:8])}" if module['classes'] else "")
+            + (f" — functions: {', '.join(module['functions'][:8])}" if module['functions'] else "")
+            for module in codebase['modules'][:200]
+        ) or "- None"
+        if len(codebase['modules']) > 200:
+            modules += f"\n- ... and {len(codebase['modules']) - 200} more modules"
+
+        routes = "\n".join(
+            f"- `{route['method']} {route['path']}` ({route['file']})" for route in codebase['routes']
+        ) or "- None detected"
+
+        dependencies = "\n\n".join(
+            f"**{manifest}**\n" + "\n".join(f"- {dep}" for dep in deps)
+            for manifest, deps in codebase['dependencies'].items()
+        ) or "- None detected"
+
+        content = f"""# {project_info['name']} - Codebase Overview
+
+## Languages
+
+{languages}
+
+## Modules
+
+{modules}
+
+## API Routes
+
+{routes}
+
+## Dependencies
+
+{dependencies}
+
+---
+
+**Generated**: {datetime.utcnow().isoformat()}
+**Framework**: Persona-Driven AI Framework v1.0.0
+"""
+
+        (self.rules_dir / "CODEBASE_OVERVIEW.md").write_text(content)
+
+    def _generate_global_coverage_json(self, project_info: Dict[str, Any], codebase: Optional[Dict[str, Any]] = None):
         """Generate GLOBAL_COVERAGE.json metadata file"""
         coverage = {
             "contextBuilderAnalysis": {
@@ -213,13 +286,22 @@ This document defines coding standards and best practices for the {project_info[
             },
             "contextBuilderMetadata": {
                 "executionMode": "bootstrap",
-                "analysisDepth": "initial",
-                "scopeCoverage": "basic",
+                "analysisDepth": "indexed" if codebase else "initial",
+                "scopeCoverage": "repository" if codebase else "basic",
                 "validationStatus": "complete",
                 "generationTimestamp": datetime.utcnow().isoformat()
             }
         }
 
+        if codebase:
+            coverage["generatedFiles"]["coreFiles"].append("CODEBASE_OVERVIEW.md")
+            coverage["repositoryIndex"] = {
+                "indexFile": str(self.indexer.index_path.resolve().relative_to(self.indexer.project_root)),
+                "files": codebase['stats']['files'],
+                "languages": codebase['languages'],
+                "routes": len(codebase['routes']),
+            }
+
         (self.rules_dir / "GLOBAL_COVERAGE.json").write_text(
             json.dumps(coverage, indent=2)
         )
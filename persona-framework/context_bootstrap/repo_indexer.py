@@ -0,0 +1,291 @@
+import os
+import ast
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+INDEX_VERSION = 1
+
+SOURCE_EXTENSIONS = {
+    '.py': 'python',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+}
+
+MANIFEST_FILES = {'requirements.txt', 'package.json', 'pyproject.toml', 'Pipfile'}
+
+IGNORED_DIRS = {
+    '.git', '.hg', '.svn', '.ai', '.venv', 'venv', 'env', 'node_modules', '__pycache__',
+    '.pytest_cache', '.mypy_cache', 'dist', 'build', '.next', 'coverage', '.idea', '.vscode',
+}
+
+# Files above this size are recorded but not parsed (minified bundles, fixtures)
+MAX_PARSE_BYTES = 1024 * 1024
+
+# Below this many changed files a process pool costs more than it saves
+POOL_THRESHOLD = 64
+
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete', 'head', 'options', 'route', 'websocket')
+
+_JS_CLASS = re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)', re.M)
+_JS_FUNCTION = re.compile(
+    r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)'
+    r'|^\s*(?:export\s+)?const\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s*)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>',
+    re.M
+)
+_JS_ROUTE = re.compile(r'\b(?:app|router)\.(get|post|put|patch|delete)\(\s*[\'"`]([^\'"`]+)[\'"`]')
+_JS_IMPORT = re.compile(r'''(?:import\s[^'"]*?from\s*|import\s*\(?|require\()\s*['"]([^'"]+)['"]''')
+
+
+def _parse_python(source: str) -> Dict[str, Any]:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        return {'parse_error': str(e)}
+
+    classes, functions, routes, imports = [], [], [], set()
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            methods = [n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            classes.append({'name': node.name, 'line': node.lineno, 'methods': methods})
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append({'name': node.name, 'line': node.lineno})
+            for decorator in node.decorator_list:
+                route = _python_route(decorator)
+                if route:
+                    routes.append({**route, 'handler': node.name, 'line': node.lineno})
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            imports.add(node.module)
+
+    return {'classes': classes, 'functions': functions, 'routes': routes, 'imports': sorted(imports)}
+
+
+def _python_route(decorator: ast.AST) -> Optional[Dict[str, str]]:
+    """Recognise @app.get("/path") / @router.post("/path") style decorators"""
+    if not isinstance(decorator, ast.Call) or not isinstance(decorator.func, ast.Attribute):
+        return None
+    method = decorator.func.attr.lower()
+    if method not in HTTP_METHODS or not decorator.args:
+        return None
+    path = decorator.args[0]
+    if isinstance(path, ast.Constant) and isinstance(path.value, str):
+        return {'method': method.upper(), 'path': path.value}
+    return None
+
+
+def _parse_script(source: str) -> Dict[str, Any]:
+    functions = []
+    for match in _JS_FUNCTION.finditer(source):
+        name = match.group(1) or match.group(2)
+        functions.append({'name': name, 'line': source.count('\n', 0, match.start()) + 1})
+    return {
+        'classes': [
+            {'name': m.group(1), 'line': source.count('\n', 0, m.start()) + 1, 'methods': []}
+            for m in _JS_CLASS.finditer(source)
+        ],
+        'functions': functions,
+        'routes': [{'method': m.group(1).upper(), 'path': m.group(2)} for m in _JS_ROUTE.finditer(source)],
+        'imports': sorted(set(_JS_IMPORT.findall(source))),
+    }
+
+
+def _parse_manifest(name: str, source: str) -> Dict[str, Any]:
+    dependencies: List[str] = []
+    try:
+        if name == 'requirements.txt':
+            for line in source.splitlines():
+                line = line.split('#', 1)[0].strip()
+                if line and not line.startswith('-'):
+                    dependencies.append(line)
+        elif name == 'package.json':
+            data = json.loads(source)
+            for section in ('dependencies', 'devDependencies'):
+                dependencies.extend(f"{pkg}@{version}" for pkg, version in data.get(section, {}).items())
+        elif name == 'pyproject.toml' and tomllib:
+            data = tomllib.loads(source)
+            dependencies.extend(data.get('project', {}).get('dependencies', []))
+            poetry = data.get('tool', {}).get('poetry', {}).get('dependencies', {})
+            dependencies.extend(f"{pkg}{'' if isinstance(v, dict) else v}" for pkg, v in poetry.items())
+        elif name == 'Pipfile' and tomllib:
+            data = tomllib.loads(source)
+            dependencies.extend(data.get('packages', {}).keys())
+    except (ValueError, AttributeError) as e:
+        return {'manifest': True, 'dependencies': [], 'parse_error': str(e)}
+    return {'manifest': True, 'dependencies': dependencies}
+
+
+def parse_file(args: Tuple[str, str]) -> Tuple[str, Dict[str, Any]]:
+    """Parse one file. Module-level so it can run in a worker process."""
+    abs_path, rel_path = args
+    name = os.path.basename(rel_path)
+    try:
+        with open(abs_path, 'r', encoding='utf-8', errors='replace') as f:
+            source = f.read()
+    except OSError as e:
+        return rel_path, {'parse_error': str(e)}
+
+    if name in MANIFEST_FILES:
+        return rel_path, _parse_manifest(name, source)
+
+    language = SOURCE_EXTENSIONS.get(os.path.splitext(name)[1])
+    if language == 'python':
+        entry = _parse_python(source)
+    else:
+        entry = _parse_script(source)
+    entry['language'] = language
+    entry['lines'] = source.count('\n') + 1
+    return rel_path, entry
+
+
+class RepoIndexer:
+    """
+    Incremental index of a target repository's code structure.
+
+    The index is persisted under .ai/ and keyed by path + mtime + size, so a
+    refresh only re-parses files that actually changed.
+    """
+
+    def __init__(self, project_root: str, index_path: Optional[Path] = None, max_workers: Optional[int] = None):
+        self.project_root = Path(project_root).resolve()
+        self.index_path = Path(index_path) if index_path else self.project_root / ".ai" / "repo_index.json"
+        self.max_workers = max_workers
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION and data.get('root') == str(self.project_root):
+            self.files = data.get('files', {})
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'version': INDEX_VERSION,
+            'root': str(self.project_root),
+            'updated_at': time.time(),
+            'files': self.files,
+        }), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    def _walk(self) -> Dict[str, Tuple[str, int, int]]:
+        """Return {rel_path: (abs_path, mtime_ns, size)} for indexable files"""
+        found = {}
+        stack = [str(self.project_root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORED_DIRS:
+                            stack.append(entry.path)
+                        continue
+                    name = entry.name
+                    if name not in MANIFEST_FILES and os.path.splitext(name)[1] not in SOURCE_EXTENSIONS:
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    rel_path = os.path.relpath(entry.path, self.project_root).replace(os.sep, '/')
+                    found[rel_path] = (entry.path, stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the working tree.
+
+        Returns:
+            Stats: {'files', 'parsed', 'reused', 'removed', 'duration_seconds'}
+        """
+        started = time.perf_counter()
+        current = self._walk()
+
+        to_parse = []
+        reused = 0
+        for rel_path, (abs_path, mtime_ns, size) in current.items():
+            existing = self.files.get(rel_path)
+            if existing and existing.get('mtime_ns') == mtime_ns and existing.get('size') == size:
+                reused += 1
+                continue
+            if size > MAX_PARSE_BYTES:
+                self.files[rel_path] = {'mtime_ns': mtime_ns, 'size': size, 'skipped': 'too large'}
+                continue
+            to_parse.append((abs_path, rel_path))
+
+        removed = [path for path in self.files if path not in current]
+        for path in removed:
+            del self.files[path]
+
+        if len(to_parse) >= POOL_THRESHOLD:
+            workers = self.max_workers or min(8, os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(parse_file, to_parse, chunksize=max(1, len(to_parse) // (workers * 4))))
+        else:
+            parsed = [parse_file(item) for item in to_parse]
+
+        for rel_path, entry in parsed:
+            _, mtime_ns, size = current[rel_path]
+            entry['mtime_ns'] = mtime_ns
+            entry['size'] = size
+            self.files[rel_path] = entry
+
+        if to_parse or removed or not self.index_path.exists():
+            self._save()
+
+        return {
+            'files': len(current),
+            'parsed': len(to_parse),
+            'reused': reused,
+            'removed': len(removed),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate view of the index for context files and persona prompts"""
+        languages: Dict[str, int] = {}
+        modules, routes, dependencies = [], [], {}
+        for rel_path, entry in sorted(self.files.items()):
+            if entry.get('manifest'):
+                dependencies[rel_path] = entry.get('dependencies', [])
+                continue
+            language = entry.get('language')
+            if not language:
+                continue
+            languages[language] = languages.get(language, 0) + 1
+            modules.append({
+                'path': rel_path,
+                'classes': [c['name'] for c in entry.get('classes', [])],
+                'functions': [f['name'] for f in entry.get('functions', [])],
+            })
+            for route in entry.get('routes', []):
+                routes.append({**route, 'file': rel_path})
+        return {
+            'languages': languages,
+            'modules': modules,
+            'routes': routes,
+            'dependencies': dependencies,
+        }
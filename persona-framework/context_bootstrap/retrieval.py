@@ -0,0 +1,334 @@
+import os
+import ast
+import json
+import math
+import re
+import heapq
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from context_bootstrap.repo_indexer import IGNORED_DIRS, SOURCE_EXTENSIONS, MAX_PARSE_BYTES
+from utils.artifact_index import ArtifactIndex
+
+INDEX_VERSION = 1
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+WINDOW_LINES = 40
+MAX_CHUNK_LINES = 120
+
+_TOKEN = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+_CAMEL = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'was', 'not', 'but', 'you',
+    'all', 'can', 'has', 'have', 'will', 'into', 'its', 'our', 'def', 'self', 'return', 'import',
+    'none', 'true', 'false', 'const', 'let', 'var', 'function', 'class', 'export', 'str', 'int',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms, with snake_case and camelCase identifiers split into parts"""
+    terms = []
+    for token in _TOKEN.findall(text):
+        parts = _CAMEL.findall(token)
+        if len(parts) > 1:
+            terms.append(token.lower())
+        for part in parts:
+            part = part.lower()
+            if len(part) > 1 and part not in STOPWORDS:
+                terms.append(part)
+    return terms
+
+
+def _window_chunks(lines: List[str]) -> List[Tuple[int, int]]:
+    return [(start + 1, min(len(lines), start + WINDOW_LINES)) for start in range(0, len(lines), WINDOW_LINES)]
+
+
+def _python_chunks(source: str, lines: List[str]) -> List[Tuple[int, int]]:
+    """One chunk per top-level definition (large classes split per method)"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return _window_chunks(lines)
+
+    chunks = []
+    covered_until = 0
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        end = getattr(node, 'end_lineno', node.lineno)
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if covered_until < start - 1:
+            chunks.append((covered_until + 1, start - 1))  # module-level code between definitions
+        if isinstance(node, ast.ClassDef) and end - start > MAX_CHUNK_LINES:
+            body_start = node.body[0].lineno if node.body else end
+            chunks.append((start, body_start - 1 if body_start > start else start))
+            for child in node.body:
+                child_start = min([child.lineno] + [d.lineno for d in getattr(child, 'decorator_list', [])])
+                chunks.append((child_start, getattr(child, 'end_lineno', child.lineno)))
+        else:
+            chunks.append((start, end))
+        covered_until = end
+    if covered_until < len(lines):
+        chunks.append((covered_until + 1, len(lines)))
+
+    result = []
+    for start, end in chunks:
+        if end - start >= MAX_CHUNK_LINES:
+            result.extend((s + start - 1, e + start - 1) for s, e in _window_chunks(lines[start - 1:end]))
+        elif end >= start:
+            result.append((start, end))
+    return result
+
+
+def _markdown_chunks(source: str) -> List[Tuple[int, int]]:
+    """One chunk per markdown section (heading + text up to its first subsection)"""
+    index = ArtifactIndex(source)
+    if not index.sections:
+        return _window_chunks(source.splitlines())
+    chunks = []
+    first = index.sections[0].start
+    if first > 0:
+        chunks.append((1, source.count('\n', 0, first)))
+    for section in index.sections:
+        own_end = section.children[0].start if section.children else section.end
+        start_line = source.count('\n', 0, section.start) + 1
+        end_line = max(start_line, source.count('\n', 0, max(section.start, own_end - 1)) + 1)
+        chunks.append((start_line, end_line))
+    return chunks
+
+
+def chunk_file(rel_path: str, source: str) -> List[Dict[str, Any]]:
+    """Split a file into snippet chunks with term frequencies"""
+    lines = source.splitlines()
+    if rel_path.endswith('.md'):
+        spans = _markdown_chunks(source)
+    elif rel_path.endswith('.py'):
+        spans = _python_chunks(source, lines)
+    else:
+        spans = _window_chunks(lines)
+
+    chunks = []
+    path_terms = tokenize(rel_path)
+    for start, end in spans:
+        text = "\n".join(lines[start - 1:end])
+        if not text.strip():
+            continue
+        terms = tokenize(text) + path_terms
+        chunks.append({'start': start, 'end': end, 'length': len(terms), 'tf': dict(Counter(terms))})
+    return chunks
+
+
+class CodeSearchIndex:
+    """
+    Local BM25 index over a project's source files and .ai/rules/*.md.
+
+    The index is persisted under .ai/ and updated incrementally (path + mtime +
+    size), postings are held in memory, and snippet text is read from disk
+    only for the top-k hits. No external service is involved.
+
+    One index is shared by a project's concurrent workflows (e.g. epic
+    children): refresh() reads and chunks changed files without the lock and
+    applies them under it, and search() scores under it, so queries never see
+    half-updated postings.
+    """
+
+    def __init__(self, project_root: str, index_path: Optional[Path] = None):
+        self.project_root = Path(project_root).resolve()
+        self.index_path = Path(index_path) if index_path else self.project_root / ".ai" / "search_index.json"
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[Tuple[str, int], int]] = {}
+        self.total_length = 0
+        self.chunk_count = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    # ---- Persistence ----
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION or data.get('root') != str(self.project_root):
+            return
+        for rel_path, entry in data.get('files', {}).items():
+            self._add_file(rel_path, entry)
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'version': INDEX_VERSION,
+            'root': str(self.project_root),
+            'files': self.files,
+        }), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    # ---- Incremental maintenance ----
+
+    def _add_file(self, rel_path: str, entry: Dict[str, Any]) -> None:
+        self.files[rel_path] = entry
+        for chunk_no, chunk in enumerate(entry['chunks']):
+            key = (rel_path, chunk_no)
+            for term, tf in chunk['tf'].items():
+                self.postings.setdefault(term, {})[key] = tf
+            self.total_length += chunk['length']
+            self.chunk_count += 1
+
+    def _remove_file(self, rel_path: str) -> None:
+        entry = self.files.pop(rel_path)
+        for chunk_no, chunk in enumerate(entry['chunks']):
+            key = (rel_path, chunk_no)
+            for term in chunk['tf']:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(key, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= chunk['length']
+            self.chunk_count -= 1
+
+    def _walk(self) -> Dict[str, Tuple[str, int, int]]:
+        found = {}
+        roots = [(str(self.project_root), True)]
+        rules_dir = self.project_root / ".ai" / "rules"
+        if rules_dir.is_dir():
+            roots.append((str(rules_dir), False))
+
+        while roots:
+            directory, is_source = roots.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not is_source or entry.name not in IGNORED_DIRS:
+                            roots.append((entry.path, is_source))
+                        continue
+                    ext = os.path.splitext(entry.name)[1]
+                    if (is_source and ext not in SOURCE_EXTENSIONS) or (not is_source and ext != '.md'):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.st_size > MAX_PARSE_BYTES:
+                        continue
+                    rel_path = os.path.relpath(entry.path, self.project_root).replace(os.sep, '/')
+                    found[rel_path] = (entry.path, stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def refresh(self) -> Dict[str, Any]:
+        """Re-index only files that were added, changed or removed"""
+        started = time.perf_counter()
+        current = self._walk()
+
+        with self._lock:
+            removed = [p for p in self.files if p not in current]
+            stale = [
+                (rel_path, found) for rel_path, found in current.items()
+                if rel_path not in self.files
+                or (self.files[rel_path]['mtime_ns'], self.files[rel_path]['size']) != found[1:]
+            ]
+
+        # Reading and chunking are the slow part; searches proceed meanwhile
+        updated = {}
+        for rel_path, (abs_path, mtime_ns, size) in stale:
+            try:
+                source = Path(abs_path).read_text(encoding='utf-8', errors='replace')
+            except OSError:
+                continue
+            updated[rel_path] = {
+                'mtime_ns': mtime_ns,
+                'size': size,
+                'chunks': chunk_file(rel_path, source),
+            }
+
+        with self._lock:
+            # A concurrent refresh may have applied the same changes already
+            for rel_path in removed:
+                if rel_path in self.files:
+                    self._remove_file(rel_path)
+            for rel_path, entry in updated.items():
+                if rel_path in self.files:
+                    self._remove_file(rel_path)
+                self._add_file(rel_path, entry)
+            changed = len(removed) + len(updated)
+            if changed or not self.index_path.exists():
+                self._save()
+            files, chunks = len(self.files), self.chunk_count
+
+        return {
+            'files': files,
+            'chunks': chunks,
+            'changed': changed,
+            'duration_seconds': round(time.perf_counter() - started, 3),
+        }
+
+    # ---- Querying ----
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Return the top-k chunks for query ranked by BM25"""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self.chunk_count:
+                return []
+            avg_length = self.total_length / self.chunk_count
+            scores: Dict[Tuple[str, int], float] = {}
+
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (self.chunk_count - df + 0.5) / (df + 0.5))
+                for key, tf in postings.items():
+                    length = self.files[key[0]]['chunks'][key[1]]['length']
+                    norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                    scores[key] = scores.get(key, 0.0) + idf * norm
+
+            hits = []
+            for (rel_path, chunk_no), score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+                chunk = self.files[rel_path]['chunks'][chunk_no]
+                hits.append({'path': rel_path, 'start': chunk['start'], 'end': chunk['end'], 'score': round(score, 4)})
+        return hits
+
+    def retrieve_context(self, query: str, token_budget: int = 1500, k: int = 8) -> str:
+        """
+        Format the most relevant snippets for a prompt, within a token budget.
+
+        Tokens are estimated at ~4 characters each.
+        """
+        char_budget = token_budget * 4
+        sections = []
+        file_lines: Dict[str, List[str]] = {}
+
+        for hit in self.search(query, k=k):
+            if hit['path'] not in file_lines:
+                try:
+                    file_lines[hit['path']] = (self.project_root / hit['path']).read_text(
+                        encoding='utf-8', errors='replace'
+                    ).splitlines()
+                except OSError:
+                    continue
+            snippet = "\n".join(file_lines[hit['path']][hit['start'] - 1:hit['end']])
+            block = f"### {hit['path']} (lines {hit['start']}-{hit['end']})\n```\n{snippet}\n```"
+            if len(block) > char_budget:
+                if not sections and char_budget > 200:
+                    sections.append(block[:char_budget - 4] + "\n```")
+                break
+            sections.append(block)
+            char_budget -= len(block) + 2
+
+        return "\n\n".join(sections)
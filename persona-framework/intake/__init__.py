@@ -0,0 +1,2 @@
+# Ticket Intake Package
+
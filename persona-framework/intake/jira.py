@@ -0,0 +1,445 @@
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import base64
+import csv
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+SEARCH_FIELDS = [
+    'summary', 'description', 'status', 'issuetype', 'priority', 'labels',
+    'components', 'parent', 'updated',
+]
+
+# CSV export column names (Jira "Export Excel CSV (all fields)")
+CSV_COLUMNS = {
+    'key': ('Issue key', 'Key', 'key'),
+    'summary': ('Summary', 'summary'),
+    'description': ('Description', 'description'),
+    'status': ('Status', 'status'),
+    'issuetype': ('Issue Type', 'issuetype'),
+    'priority': ('Priority', 'priority'),
+    'labels': ('Labels', 'labels'),
+    'components': ('Component/s', 'Components', 'components'),
+    'parent': ('Parent', 'Parent id', 'Epic Link', 'parent'),
+    'updated': ('Updated', 'updated'),
+}
+
+UPDATED_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S.%f%z',   # REST: 2024-01-15T10:20:30.000+0000
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%d/%b/%y %I:%M %p',        # CSV export: 15/Jan/24 10:20 AM
+    '%Y-%m-%d %H:%M',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_key    TEXT PRIMARY KEY,
+    updated       TEXT,
+    content_hash  TEXT NOT NULL,
+    synced_at     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    source         TEXT PRIMARY KEY,
+    updated_since  TEXT,
+    synced_at      TEXT NOT NULL
+);
+"""
+
+
+# ---- Normalisation ----
+
+def parse_updated(value: Optional[str]) -> Optional[str]:
+    """Normalise a Jira 'updated' timestamp to a UTC ISO string (None if unparseable)"""
+    if not value:
+        return None
+    for fmt in UPDATED_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    return None
+
+
+def _name(value: Any) -> str:
+    if isinstance(value, dict):
+        return value.get('name') or value.get('value') or value.get('key') or ''
+    return '' if value is None else str(value)
+
+
+def normalize_issue(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a REST issue ({'key', 'fields'}) or a flat export row to one ticket shape"""
+    if 'fields' in raw:
+        fields = raw['fields'] or {}
+        key = raw.get('key')
+    else:
+        fields = {
+            name: next((raw[c] for c in columns if raw.get(c) not in (None, '')), None)
+            for name, columns in CSV_COLUMNS.items()
+        }
+        key = fields.pop('key')
+
+    labels = fields.get('labels') or []
+    if isinstance(labels, str):
+        labels = labels.replace(',', ' ').split()
+    components = fields.get('components') or []
+    if isinstance(components, str):
+        components = [c.strip() for c in components.split(',') if c.strip()]
+
+    return {
+        'key': key,
+        'summary': fields.get('summary') or '',
+        'description': fields.get('description') or '',
+        'status': _name(fields.get('status')),
+        'issuetype': _name(fields.get('issuetype')),
+        'priority': _name(fields.get('priority')),
+        'labels': [_name(label) for label in labels],
+        'components': [_name(component) for component in components],
+        'parent': _name(fields.get('parent')),
+        'updated': parse_updated(fields.get('updated')),
+    }
+
+
+def ticket_to_requirements(ticket: Dict[str, Any]) -> str:
+    """Render a ticket as the markdown requirements document a workflow starts from"""
+    lines = [f"# {ticket['key']}: {ticket['summary']}", ""]
+    details = [
+        ("Type", ticket['issuetype']),
+        ("Priority", ticket['priority']),
+        ("Epic / Parent", ticket['parent']),
+        ("Components", ", ".join(ticket['components'])),
+        ("Labels", ", ".join(ticket['labels'])),
+    ]
+    for label, value in details:
+        if value:
+            lines.append(f"**{label}**: {value}")
+    lines += ["", "## Description", "", ticket['description'].strip() or "_No description provided._", ""]
+    return "\n".join(lines)
+
+
+def ticket_hash(ticket: Dict[str, Any]) -> str:
+    """Hash of the fields that feed the workflow; status/updated churn alone does not re-enqueue"""
+    return hashlib.sha256(ticket_to_requirements(ticket).encode('utf-8')).hexdigest()
+
+
+# ---- Export files ----
+
+def _iter_json_array(f, block_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Stream the items of a JSON export without loading the whole file.
+
+    Accepts a top-level array or an object with an "issues" array.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(block_size)
+
+    def more() -> bool:
+        nonlocal buf
+        block = f.read(block_size)
+        if not block:
+            return False
+        buf += block
+        return True
+
+    # Locate the opening bracket of the issue array
+    while True:
+        stripped = buf.lstrip()
+        if stripped.startswith('['):
+            pos = buf.index('[') + 1
+            break
+        marker = buf.find('"issues"')
+        if marker != -1:
+            bracket = buf.find('[', marker)
+            if bracket != -1:
+                pos = bracket + 1
+                break
+        if not more():
+            raise ValueError("JSON export must be an array or contain an \"issues\" array")
+
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise ValueError("Unexpected end of JSON export")
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not more():
+                raise
+            continue
+        yield item
+        buf, pos = buf[end:], 0
+
+
+def iter_export(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream normalised tickets from a .json, .jsonl or .csv Jira export"""
+    suffix = Path(path).suffix.lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if suffix == '.csv':
+            rows: Iterable[Dict[str, Any]] = csv.DictReader(f)
+        elif suffix in ('.jsonl', '.ndjson'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = _iter_json_array(f)
+        for row in rows:
+            ticket = normalize_issue(row)
+            if ticket['key']:
+                yield ticket
+
+
+# ---- REST ----
+
+class JiraRestClient:
+    """
+    Minimal Jira REST (v2 search) client with concurrent paging.
+
+    base_url can point at Jira Cloud/Server or at the local stub server
+    (python -m intake.jira_stub).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        email: Optional[str] = None,
+        api_token: Optional[str] = None,
+        page_size: int = 100,
+        max_workers: int = 8,
+        timeout_seconds: float = 30.0,
+        retries: int = 3
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.retries = retries
+        self._headers = {'Accept': 'application/json'}
+        if email and api_token:
+            credentials = base64.b64encode(f"{email}:{api_token}".encode('utf-8')).decode('ascii')
+            self._headers['Authorization'] = f"Basic {credentials}"
+
+    def search_page(self, jql: str, start_at: int) -> Dict[str, Any]:
+        query = urllib.parse.urlencode({
+            'jql': jql,
+            'startAt': start_at,
+            'maxResults': self.page_size,
+            'fields': ",".join(SEARCH_FIELDS),
+        })
+        request = urllib.request.Request(f"{self.base_url}/rest/api/2/search?{query}", headers=self._headers)
+        for attempt in range(self.retries + 1):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout_seconds) as response:
+                    return json.loads(response.read().decode('utf-8'))
+            except urllib.error.HTTPError as e:
+                if e.code not in (429, 500, 502, 503, 504) or attempt == self.retries:
+                    raise
+                delay = float(e.headers.get('Retry-After') or 2 ** attempt)
+            except urllib.error.URLError:
+                if attempt == self.retries:
+                    raise
+                delay = 2 ** attempt
+            time.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def iter_pages(self, jql: str) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield pages of normalised tickets matching jql.
+
+        The first page gives the total; the remaining pages are fetched
+        concurrently and yielded in order.
+        """
+        first = self.search_page(jql, 0)
+        yield [normalize_issue(issue) for issue in first.get('issues', [])]
+
+        total = first.get('total', 0)
+        page_size = first.get('maxResults') or self.page_size
+        starts = list(range(page_size, total, page_size))
+        if not starts:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(starts))) as pool:
+            for page in pool.map(lambda start: self.search_page(jql, start), starts):
+                yield [normalize_issue(issue) for issue in page.get('issues', [])]
+
+
+# ---- Sync ----
+
+EnqueueFn = Callable[[List[Tuple[str, Dict[str, Any]]]], Any]
+
+
+class JiraIntake:
+    """
+    Bulk ticket intake with an incremental updated-since cursor.
+
+    Each sync walks an export file or a REST search, skips tickets that are
+    older than the source's cursor or whose content hash is unchanged, and
+    enqueues the new or changed ones as workflow jobs.
+    """
+
+    def __init__(
+        self,
+        enqueue: EnqueueFn,
+        db_path: str = ".ai/state/jira_intake.db",
+        cursor_overlap_minutes: int = 24 * 60,
+        batch_size: int = 500
+    ):
+        self.enqueue = enqueue
+        self.db_path = str(db_path)
+        # Jira filters on the user's timezone at minute precision, so re-read a
+        # window before the cursor and rely on content hashes to drop repeats
+        self.cursor_overlap = timedelta(minutes=cursor_overlap_minutes)
+        self.batch_size = batch_size
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    # ---- Cursor ----
+
+    def get_cursor(self, source: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT updated_since FROM cursors WHERE source = ?", (source,)).fetchone()
+        return row['updated_since'] if row else None
+
+    def reset_cursor(self, source: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cursors WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def _save_cursor(self, source: str, updated_since: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cursors (source, updated_since, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET "
+                "updated_since = COALESCE(MAX(excluded.updated_since, cursors.updated_since), "
+                "excluded.updated_since, cursors.updated_since), synced_at = excluded.synced_at",
+                (source, updated_since, datetime.utcnow().isoformat())
+            )
+            self._conn.commit()
+
+    # ---- Sync ----
+
+    def sync_export(self, path: str, full: bool = False) -> Dict[str, Any]:
+        """Ingest a JSON/JSONL/CSV export file"""
+        source = f"file:{Path(path).resolve()}"
+        return self._sync(source, self._batched(iter_export(path)), full)
+
+    def sync_rest(
+        self,
+        client: JiraRestClient,
+        project: Optional[str] = None,
+        jql: Optional[str] = None,
+        full: bool = False
+    ) -> Dict[str, Any]:
+        """Ingest tickets from a Jira search, only fetching changes since the last sync"""
+        if not project and not jql:
+            raise ValueError("Either project or jql is required")
+        base_jql = jql or f'project = "{project}"'
+        source = f"rest:{client.base_url}:{base_jql}"
+
+        cursor = None if full else self.get_cursor(source)
+        query = base_jql
+        if cursor:
+            since = datetime.fromisoformat(cursor) - self.cursor_overlap
+            query = f'({base_jql}) AND updated >= "{since.strftime("%Y/%m/%d %H:%M")}"'
+        return self._sync(source, client.iter_pages(f"{query} ORDER BY updated ASC, key ASC"), full)
+
+    def _batched(self, tickets: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        for ticket in tickets:
+            batch.append(ticket)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _sync(self, source: str, pages: Iterable[List[Dict[str, Any]]], full: bool) -> Dict[str, Any]:
+        started = time.perf_counter()
+        cursor = None if full else self.get_cursor(source)
+        threshold = None
+        if cursor:
+            threshold = (datetime.fromisoformat(cursor) - self.cursor_overlap).isoformat()
+
+        stats = {'source': source, 'seen': 0, 'skipped_by_cursor': 0, 'unchanged': 0, 'new': 0, 'changed': 0}
+        newest = cursor
+        for page in pages:
+            stats['seen'] += len(page)
+            candidates = []
+            for ticket in page:
+                updated = ticket['updated']
+                if updated and (newest is None or updated > newest):
+                    newest = updated
+                if threshold and updated and updated < threshold:
+                    stats['skipped_by_cursor'] += 1
+                else:
+                    candidates.append(ticket)
+            self._process_page(candidates, stats)
+
+        self._save_cursor(source, newest)
+        stats['cursor'] = newest
+        stats['enqueued'] = stats['new'] + stats['changed']
+        stats['duration_seconds'] = round(time.perf_counter() - started, 3)
+        print(f"📥 Jira sync {source}: {stats['seen']} seen, {stats['new']} new, "
+              f"{stats['changed']} changed, {stats['unchanged']} unchanged ({stats['duration_seconds']}s)")
+        return stats
+
+    def _process_page(self, tickets: List[Dict[str, Any]], stats: Dict[str, Any]) -> None:
+        """Compare a page against stored hashes in one query and enqueue the differences"""
+        if not tickets:
+            return
+        hashes = {ticket['key']: ticket_hash(ticket) for ticket in tickets}
+        keys = list(hashes)
+        with self._lock:
+            known: Dict[str, str] = {}
+            for i in range(0, len(keys), 900):  # stay under SQLite's host parameter limit
+                part = keys[i:i + 900]
+                rows = self._conn.execute(
+                    f"SELECT ticket_key, content_hash FROM tickets WHERE ticket_key IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                known.update({r['ticket_key']: r['content_hash'] for r in rows})
+
+        jobs, rows, now = [], [], datetime.utcnow().isoformat()
+        for ticket in tickets:
+            key = ticket['key']
+            previous = known.get(key)
+            if previous == hashes[key]:
+                stats['unchanged'] += 1
+                continue
+            stats['changed' if previous else 'new'] += 1
+            jobs.append((key, {
+                'ticket_id': key,
+                'requirements': ticket_to_requirements(ticket),
+                'context': {'jira': {k: ticket[k] for k in ('issuetype', 'priority', 'parent', 'labels', 'components', 'status')}},
+            }))
+            rows.append((key, ticket['updated'], hashes[key], now))
+
+        if jobs:
+            # Enqueue first: a crash between the two steps re-enqueues rather than drops
+            self.enqueue(jobs)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT INTO tickets (ticket_key, updated, content_hash, synced_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(ticket_key) DO UPDATE SET updated = excluded.updated, "
+                    "content_hash = excluded.content_hash, synced_at = excluded.synced_at",
+                    rows
+                )
+                self._conn.commit()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Local Jira stub - serves /rest/api/2/search from an export file
+
+Usage:
+    python -m intake.jira_stub export.json --port 8089
+
+Supports the subset of JQL the intake adapter sends:
+`project = "X"` and `updated >= "yyyy/MM/dd HH:mm"`, with startAt/maxResults paging.
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List
+from datetime import datetime
+import argparse
+import json
+import re
+import urllib.parse
+
+from intake.jira import iter_export
+
+PROJECT_RE = re.compile(r'project\s*=\s*"?([A-Za-z0-9_]+)"?')
+UPDATED_RE = re.compile(r'updated\s*>=\s*"([^"]+)"')
+MAX_RESULTS = 100
+
+
+def load_issues(path: str) -> List[Dict[str, Any]]:
+    """Load an export as REST-shaped issues, sorted by (updated, key)"""
+    issues = []
+    for ticket in iter_export(path):
+        fields = {k: v for k, v in ticket.items() if k != 'key'}
+        if fields['updated']:
+            fields['updated'] = fields['updated'] + '+0000'
+        issues.append({'key': ticket['key'], 'fields': fields})
+    issues.sort(key=lambda issue: (issue['fields']['updated'] or '', issue['key']))
+    return issues
+
+
+def make_handler(issues: List[Dict[str, Any]]):
+
+    class JiraStubHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            if url.path != '/rest/api/2/search':
+                self.send_error(404)
+                return
+            params = urllib.parse.parse_qs(url.query)
+            jql = params.get('jql', [''])[0]
+            start_at = int(params.get('startAt', ['0'])[0])
+            max_results = min(int(params.get('maxResults', [str(MAX_RESULTS)])[0]), MAX_RESULTS)
+
+            matches = issues
+            project = PROJECT_RE.search(jql)
+            if project:
+                prefix = project.group(1) + '-'
+                matches = [i for i in matches if i['key'].startswith(prefix)]
+            updated = UPDATED_RE.search(jql)
+            if updated:
+                since = datetime.strptime(updated.group(1), '%Y/%m/%d %H:%M').isoformat()
+                matches = [i for i in matches if (i['fields']['updated'] or '') >= since]
+
+            body = json.dumps({
+                'startAt': start_at,
+                'maxResults': max_results,
+                'total': len(matches),
+                'issues': matches[start_at:start_at + max_results],
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return JiraStubHandler
+
+
+def serve(path: str, host: str = '127.0.0.1', port: int = 8089) -> ThreadingHTTPServer:
+    """Create (but do not start) a stub server for the export at path"""
+    return ThreadingHTTPServer((host, port), make_handler(load_issues(path)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a Jira export as a REST search endpoint")
+    parser.add_argument('export', help="JSON, JSONL or CSV Jira export")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+
+    server = serve(args.export, args.host, args.port)
+    print(f"🧪 Jira stub serving {args.export} on http://{args.host}:{args.port}")
+    server.serve_forever()
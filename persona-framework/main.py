@@ -1,12 +1,25 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import json
 import os
+import socket
+from pathlib import Path
 from dotenv import load_dotenv
 
-from workflow_engine.orchestrator import WorkflowOrchestrator, ApprovalStatus
+from workflow_engine.orchestrator import WorkflowOrchestrator, ApprovalStatus, WorkflowQuotaExceeded
+from workflow_engine.project_registry import OrchestratorRegistry
+from workflow_engine.job_queue import QueueWorker, create_job_queue, AWAITING_APPROVAL
+from workflow_engine.artifact_files import CODE_DIR, TESTS_DIR, iter_zip
+from workflow_engine.status_hub import TERMINAL_STATUSES
 from context_bootstrap.bootstrap import ContextBootstrap
+from intake.jira import JiraIntake, JiraRestClient
+from utils.concurrency import get_llm_limiter
+from utils.model_router import get_model_router
+from utils.continuation import get_continuation_stats
 
 load_dotenv()
 
@@ -25,17 +38,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize orchestrator
-orchestrator = WorkflowOrchestrator(
-    project_id=os.getenv('GOOGLE_CLOUD_PROJECT', 'local-project'),
-    bucket_name=os.getenv('STORAGE_BUCKET', 'local-bucket')
-)
+# Per-project orchestrators (PROJECTS_FILE), created on first use and evicted when idle
+registry = OrchestratorRegistry.from_env()
+
+def project_orchestrator(
+    project: Optional[str] = Query(None),
+    x_project: Optional[str] = Header(None)
+):
+    """Orchestrator of the request's project (?project= or X-Project header; default project otherwise)"""
+    key = project or x_project
+    if not registry.has_project(key):
+        raise HTTPException(status_code=404, detail=f"Unknown project: {key}")
+    with registry.lease(key) as orchestrator:
+        yield orchestrator
+
+# Workflow job queue fed by bulk intake
+# Shared with standalone workers (python -m workflow_engine.worker) on other processes/nodes
+job_queue = create_job_queue()
+jira_intake = JiraIntake(enqueue=lambda jobs: job_queue.enqueue_many(jobs, source='jira'))
+queue_workers = []
+
+def _auto_approve(stage: str, artifact_url: str) -> ApprovalStatus:
+    print(f"🤖 Auto-approving {stage} stage")
+    return ApprovalStatus.APPROVED
+
+def _is_definition_name(name: str) -> bool:
+    return name.replace('_', '').replace('-', '').isalnum()
+
+def _policy_context(context: Optional[Dict[str, Any]], approval_policy: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Context with the requested approval policy; policies are chosen by name, never by path"""
+    if approval_policy:
+        context = {**(context or {}), 'approval_policy': approval_policy}
+    policy = (context or {}).get('approval_policy')
+    if policy and not _is_definition_name(str(policy)):
+        raise HTTPException(status_code=400, detail="approval_policy must be a policy name, not a path")
+    return context
+
+@app.on_event("startup")
+def start_queue_workers():
+    """Start QUEUE_WORKERS background workers (default 0: jobs wait for a worker)"""
+    auto_approve = os.getenv('QUEUE_AUTO_APPROVE', 'false').lower() == 'true'
+    for i in range(int(os.getenv('QUEUE_WORKERS', '0'))):
+        worker = QueueWorker(
+            job_queue,
+            registry,
+            worker_id=f"{socket.gethostname()}-{os.getpid()}-{i}",
+            approval_callback=_auto_approve if auto_approve else None
+        )
+        worker.start()
+        queue_workers.append(worker)
+
+@app.on_event("shutdown")
+def stop_queue_workers():
+    for worker in queue_workers:
+        worker.stop(timeout=1)
+    registry.shutdown()
 
 class WorkflowRequest(BaseModel):
     ticket_id: str
     requirements: str
     context: Optional[Dict[str, Any]] = None
     auto_approve: bool = False
+    cassette_mode: Optional[str] = None  # "record" | "replay"
+    replay_latency: bool = False
+    pipeline: Optional[str] = None      # name of a definition in workflow_engine/pipelines
+    approval_policy: Optional[str] = None   # name of a policy in workflow_engine/policies
+
+class EpicTicket(BaseModel):
+    ticket_id: str
+    requirements: str
+
+class EpicRequest(BaseModel):
+    epic_id: str
+    requirements: str
+    tickets: List[EpicTicket]
+    context: Optional[Dict[str, Any]] = None
+    auto_approve: bool = False
+    max_parallel: Optional[int] = None
+    refresh_design: bool = False
+    approval_policy: Optional[str] = None
+
+class SimilarWorkflowsRequest(BaseModel):
+    requirements: str
+    k: int = 3
+    min_similarity: Optional[float] = None
+
+class JiraSyncRequest(BaseModel):
+    export_path: Optional[str] = None   # JSON/JSONL/CSV export under JIRA_EXPORT_DIR; otherwise REST
+    project: Optional[str] = None
+    jql: Optional[str] = None
+    full: bool = False                  # ignore the updated-since cursor
+
+class JobReviewRequest(BaseModel):
+    stage: Optional[str] = None         # the held stage; refused if the job is held at another
+    reason: Optional[str] = None
 
 class BootstrapRequest(BaseModel):
     project_name: str
@@ -53,41 +149,353 @@ async def root():
     }
 
 @app.post("/api/v1/workflow/execute")
-async def execute_workflow(request: WorkflowRequest):
+def execute_workflow(request: WorkflowRequest, orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)):
     """
     Execute complete AI workflow: Requirements → Architecture → Planning → Code → Tests
+
+    Runs in the server's thread pool so other requests (status, cancel) are
+    served while the workflow runs.
     """
+    if request.cassette_mode not in (None, "record", "replay"):
+        raise HTTPException(status_code=400, detail="cassette_mode must be 'record' or 'replay'")
+    if request.pipeline and not _is_definition_name(request.pipeline):
+        raise HTTPException(status_code=400, detail="pipeline must be a definition name, not a path")
+    context = _policy_context(request.context, request.approval_policy)
     try:
-        # Auto-approve callback if requested
-        def auto_approve_callback(stage: str, artifact_url: str) -> ApprovalStatus:
-            print(f"🤖 Auto-approving {stage} stage")
-            return ApprovalStatus.APPROVED
-        
-        results = orchestrator.execute_workflow_with_gates(
-            ticket_id=request.ticket_id,
-            requirements_doc=request.requirements,
-            context=request.context,
-            approval_callback=auto_approve_callback if request.auto_approve else None
-        )
+        with orchestrator.workflow_slot():
+            results = orchestrator.execute_workflow_with_gates(
+                ticket_id=request.ticket_id,
+                requirements_doc=request.requirements,
+                context=context,
+                approval_callback=_auto_approve if request.auto_approve else None,
+                cassette_mode=request.cassette_mode,
+                replay_latency=request.replay_latency,
+                pipeline=request.pipeline
+            )
         return results
+    except WorkflowQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/epic/execute")
+def execute_epic(request: EpicRequest, orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)):
+    """
+    Epic mode: Requirements → Architecture once for the epic (cached once
+    approved), then Planning → Code → Tests per child ticket in parallel
+    """
+    if not request.tickets:
+        raise HTTPException(status_code=400, detail="An epic needs at least one child ticket")
+    context = _policy_context(request.context, request.approval_policy)
+    try:
+        # An epic takes one slot of the project's quota; its children share it
+        with orchestrator.workflow_slot():
+            return orchestrator.execute_epic(
+                epic_id=request.epic_id,
+                epic_requirements=request.requirements,
+                tickets=[ticket.dict() for ticket in request.tickets],
+                context=context,
+                approval_callback=_auto_approve if request.auto_approve else None,
+                max_parallel=request.max_parallel,
+                refresh_design=request.refresh_design
+            )
+    except WorkflowQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/workflow/{ticket_id}/status")
-async def get_workflow_status(ticket_id: str):
+async def get_workflow_status(ticket_id: str, orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)):
     """Get status of a workflow execution"""
     status = orchestrator.get_workflow_status(ticket_id)
     if 'error' in status:
         raise HTTPException(status_code=404, detail=status['error'])
     return status
 
+def _sse(event: Dict[str, Any]) -> str:
+    return f"id: {event.get('sequence', 0)}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/api/v1/workflow/{ticket_id}/events")
+async def workflow_events(
+    ticket_id: str,
+    until_done: bool = True,
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """
+    Server-sent events of a workflow's state transitions (workflow status,
+    stage start/finish, approvals, artifacts), each with the workflow's new
+    snapshot. Starts with the current snapshot and, with until_done, ends
+    once the workflow reaches a final status.
+
+    Watchers of one workflow share one upstream subscription, so dashboards
+    can drop polling of /status.
+    """
+    hub = orchestrator.status_hub
+    subscription = hub.subscribe(ticket_id)
+    latest = hub.latest(ticket_id)
+    snapshot = latest['workflow'] if latest else orchestrator.state_store.get_workflow(ticket_id)
+    if snapshot is None and not orchestrator.db:
+        hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail=f"Workflow {ticket_id} not found")
+
+    keepalive_seconds = float(os.getenv('STATUS_KEEPALIVE_SECONDS', '15'))
+
+    async def stream():
+        try:
+            if snapshot is not None:
+                yield _sse({'type': 'snapshot', 'ticket_id': ticket_id, 'workflow': snapshot})
+                if until_done and snapshot.get('status') in TERMINAL_STATUSES:
+                    return
+            while True:
+                event = await subscription.get(timeout=keepalive_seconds)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+                if until_done and event['type'] == 'workflow' and event.get('status') in TERMINAL_STATUSES:
+                    return
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/v1/workflow/{ticket_id}/audit")
+async def get_approval_audit(
+    ticket_id: str,
+    limit: int = Query(200, ge=1, le=1000),
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """Every gate decision for a ticket: approved/rejected, by policy, callback or console, and why"""
+    return {"ticket_id": ticket_id, "decisions": orchestrator.approval_audit(ticket_id, limit=limit)}
+
+@app.get("/api/v1/workflow/{ticket_id}/trace")
+async def get_workflow_trace(ticket_id: str, orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)):
+    """
+    Download a workflow's timeline (stages, LLM calls, retries, gates, artifact
+    writes) as Chrome trace JSON; open it in chrome://tracing or ui.perfetto.dev
+    """
+    path = orchestrator.trace_path(ticket_id) if os.path.basename(ticket_id) == ticket_id else None
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No trace for {ticket_id}")
+    return FileResponse(path, media_type="application/json", filename=f"{ticket_id}-trace.json")
+
+@app.get("/api/v1/workflow/{ticket_id}/download")
+def download_workflow_files(
+    ticket_id: str,
+    parts: List[str] = Query([CODE_DIR, TESTS_DIR]),
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """
+    Download a workflow's generated code and/or tests as a zip, streamed from
+    disk file by file (the archive is never held in memory)
+    """
+    unknown = [part for part in parts if part not in (CODE_DIR, TESTS_DIR)]
+    if unknown or os.path.basename(ticket_id) != ticket_id:
+        raise HTTPException(status_code=400, detail=f"parts must be '{CODE_DIR}' and/or '{TESTS_DIR}'")
+    entries = orchestrator.workflow_files(ticket_id, tuple(parts))
+    if not entries:
+        raise HTTPException(status_code=404, detail=f"No generated files for {ticket_id}")
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{ticket_id}.zip"'}
+    )
+
+@app.post("/api/v1/workflow/{ticket_id}/cancel")
+async def cancel_workflow(
+    ticket_id: str,
+    reason: str = "cancelled via API",
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """
+    Cancel a workflow: stop it if running (in-flight model calls are abandoned
+    and their concurrency slots released) and drop its pending queue job
+    """
+    cancelled_running = orchestrator.cancel_workflow(ticket_id, reason)
+    cancelled_jobs = job_queue.cancel_pending(ticket_id)
+    if not cancelled_running and not cancelled_jobs:
+        raise HTTPException(status_code=404, detail=f"No running or queued workflow for {ticket_id}")
+    return {
+        "ticket_id": ticket_id,
+        "cancelled_running": cancelled_running,
+        "cancelled_jobs": cancelled_jobs,
+        "reason": reason
+    }
+
+@app.get("/api/v1/workflows")
+async def list_workflows(
+    status: Optional[str] = None,
+    ticket_prefix: Optional[str] = None,
+    started_after: Optional[str] = None,
+    started_before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """List workflows with optional status/ticket/time filters and pagination"""
+    return orchestrator.list_workflows(
+        status=status,
+        ticket_prefix=ticket_prefix,
+        started_after=started_after,
+        started_before=started_before,
+        limit=limit,
+        offset=offset
+    )
+
+@app.post("/api/v1/workflows/similar")
+async def similar_workflows(
+    request: SimilarWorkflowsRequest,
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
+    """Find completed workflows with near-duplicate requirements"""
+    return {
+        "matches": orchestrator.find_similar_workflows(
+            request.requirements,
+            k=request.k,
+            min_similarity=request.min_similarity
+        )
+    }
+
+@app.get("/api/v1/projects")
+async def list_projects():
+    """Configured projects and the orchestrators currently cached for them"""
+    return {
+        "projects": [
+            {
+                "project": key,
+                "project_root": registry.config(key).project_root,
+                "max_concurrent_workflows": registry.config(key).max_concurrent_workflows
+            }
+            for key in registry.project_keys()
+        ],
+        "registry": registry.snapshot()
+    }
+
+@app.get("/api/v1/metrics/llm")
+async def llm_metrics():
+    """Adaptive LLM concurrency limiter state, per-stage model routing and continuation statistics"""
+    return {
+        "concurrency": get_llm_limiter().snapshot(),
+        "routing": get_model_router().snapshot(),
+        "continuation": get_continuation_stats().snapshot()
+    }
+
+def _jira_export_path(export_path: str) -> str:
+    """Resolve an export file name inside JIRA_EXPORT_DIR; anything outside it is rejected"""
+    export_dir = Path(os.getenv('JIRA_EXPORT_DIR', '.ai/intake')).resolve()
+    path = (export_dir / export_path).resolve()
+    if not path.is_relative_to(export_dir):
+        raise HTTPException(status_code=400, detail="export_path must be a file under JIRA_EXPORT_DIR")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Export not found: {export_path}")
+    return str(path)
+
+@app.post("/api/v1/intake/jira/sync")
+def sync_jira(request: JiraSyncRequest):
+    """
+    Ingest Jira tickets in bulk and enqueue new or changed ones as workflow jobs
+    """
+    try:
+        if request.export_path:
+            return jira_intake.sync_export(_jira_export_path(request.export_path), full=request.full)
+
+        # Only the configured host ever receives the Jira credentials
+        base_url = os.getenv('JIRA_BASE_URL')
+        if not base_url:
+            raise HTTPException(status_code=400, detail="export_path is required when JIRA_BASE_URL is not set")
+        if not request.project and not request.jql:
+            raise HTTPException(status_code=400, detail="project or jql is required for REST sync")
+        client = JiraRestClient(
+            base_url,
+            email=os.getenv('JIRA_EMAIL'),
+            api_token=os.getenv('JIRA_API_TOKEN'),
+            max_workers=int(os.getenv('JIRA_SYNC_WORKERS', '8'))
+        )
+        return jira_intake.sync_rest(client, project=request.project, jql=request.jql, full=request.full)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/queue")
+async def queue_status(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Workflow job queue counts and recent jobs"""
+    return {
+        "counts": job_queue.stats(),
+        "workers": len(queue_workers),
+        "jobs": job_queue.list_jobs(status=status, limit=limit, offset=offset)
+    }
+
+def _held_job(job_id: str, stage: Optional[str]) -> Dict[str, Any]:
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No queue job {job_id}")
+    if job['status'] != AWAITING_APPROVAL:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}, not awaiting approval")
+    if stage and stage != job['held_stage']:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is held at {job['held_stage']}, not {stage}")
+    return job
+
+def _record_job_review(job: Dict[str, Any], status: ApprovalStatus, reason: Optional[str]) -> None:
+    """Record the reviewer's decision in the audit log of the job's project"""
+    project = job['payload'].get('project')
+    if not registry.has_project(project):
+        return
+    with registry.lease(project) as orchestrator:
+        orchestrator.record_review(
+            job['payload'].get('ticket_id', job['ticket_id']),
+            job['held_stage'],
+            status,
+            reasons=[reason] if reason else None
+        )
+
+@app.post("/api/v1/queue/jobs/{job_id}/approve")
+def approve_queue_job(job_id: str, request: Optional[JobReviewRequest] = None):
+    """
+    Approve the gate a queued workflow is held at and queue the job again;
+    a worker resumes it after the approved stage
+    """
+    request = request or JobReviewRequest()
+    job = _held_job(job_id, request.stage)
+    _record_job_review(job, ApprovalStatus.APPROVED, request.reason)
+    try:
+        approved = job_queue.approve(job_id, job['held_stage'])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not approved:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is no longer awaiting approval")
+    return {"job_id": job_id, "ticket_id": job['ticket_id'], "approved_stage": job['held_stage'], "status": "PENDING"}
+
+@app.post("/api/v1/queue/jobs/{job_id}/reject")
+def reject_queue_job(job_id: str, request: Optional[JobReviewRequest] = None):
+    """Reject the gate a queued workflow is held at; the job fails"""
+    request = request or JobReviewRequest()
+    job = _held_job(job_id, request.stage)
+    _record_job_review(job, ApprovalStatus.REJECTED, request.reason)
+    if not job_queue.reject(job_id, request.reason):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is no longer awaiting approval")
+    return {"job_id": job_id, "ticket_id": job['ticket_id'], "rejected_stage": job['held_stage'], "status": "FAILED"}
+
 @app.post("/api/v1/bootstrap")
-async def bootstrap_project(request: BootstrapRequest):
+async def bootstrap_project(
+    request: BootstrapRequest,
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
+):
     """
-    Bootstrap .ai/ directory structure for a new project
+    Bootstrap .ai/ directory structure in the project's codebase (its project_root)
     """
+    if not orchestrator.project_root:
+        raise HTTPException(status_code=400, detail="The project has no project_root to bootstrap")
     try:
-        bootstrap = ContextBootstrap(project_root="./demo-app")
+        bootstrap = ContextBootstrap(project_root=orchestrator.project_root)
         
         project_info = {
             "name": request.project_name,
@@ -110,29 +518,32 @@ async def bootstrap_project(request: BootstrapRequest):
 async def upload_requirements(
     ticket_id: str,
     file: UploadFile = File(...),
-    auto_approve: bool = False
+    auto_approve: bool = False,
+    orchestrator: WorkflowOrchestrator = Depends(project_orchestrator)
 ):
     """
     Upload requirements document and execute workflow
+
+    The workflow runs in the server's thread pool, like /workflow/execute, so
+    status, events and cancel requests are served while it runs.
     """
     try:
-        # Read uploaded file
+        # The whole document is needed as text; large ones are analyzed in chunks (map-reduce)
         content = await file.read()
         requirements_text = content.decode('utf-8')
         
-        # Auto-approve callback if requested
-        def auto_approve_callback(stage: str, artifact_url: str) -> ApprovalStatus:
-            print(f"🤖 Auto-approving {stage} stage")
-            return ApprovalStatus.APPROVED
-        
         # Execute workflow
-        results = orchestrator.execute_workflow_with_gates(
-            ticket_id=ticket_id,
-            requirements_doc=requirements_text,
-            approval_callback=auto_approve_callback if auto_approve else None
-        )
+        def run_workflow() -> Dict[str, Any]:
+            with orchestrator.workflow_slot():
+                return orchestrator.execute_workflow_with_gates(
+                    ticket_id=ticket_id,
+                    requirements_doc=requirements_text,
+                    approval_callback=_auto_approve if auto_approve else None
+                )
         
-        return results
+        return await run_in_threadpool(run_workflow)
+    except WorkflowQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
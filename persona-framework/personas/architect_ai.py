@@ -3,6 +3,9 @@ from typing import Dict, Any
 import os
 from datetime import datetime
 
+from utils.artifact_index import get_artifact_index
+from utils.llm import generate_text
+
 class ArchitectAI:
     """
     Architect AI Persona - Generates system design and architecture
@@ -18,13 +21,14 @@ class ArchitectAI:
         self.fallback_model = genai.GenerativeModel('models/gemini-1.5-flash')  # Lighter fallback
         self.persona_version = "v1.0.0"
         
-    def design_architecture(self, requirements: str, context: Dict[str, Any] = None) -> str:
+    def design_architecture(self, requirements: str, context: Dict[str, Any] = None, reference: str = None) -> str:
         """
         Generate SYSTEM_DESIGN.md from requirements
         
         Args:
             requirements: FEATURE_REQUIREMENTS.md content
             context: Project architecture context
+            reference: Approved design of a similar ticket, used as a few-shot seed
         
         Returns:
             Formatted SYSTEM_DESIGN.md content
@@ -73,8 +77,11 @@ file following this structure:
 ## Context:
 {f"Architecture Context: {context}" if context else "No additional context provided"}
 
+## Reference From a Similar Approved Ticket:
+{reference if reference else "No similar approved ticket found"}
+
 ## Requirements Document (Summary):
-{requirements[:1000]}...
+{get_artifact_index(requirements).excerpt(1000)}...
 
 Generate a detailed SYSTEM_DESIGN.md with:
 - Mermaid diagrams for architecture visualization
@@ -93,34 +100,9 @@ Keep the response focused and concise. Prioritize clarity over length.
             'max_output_tokens': 4096,
         }
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            else:
-                raise
-
-        # Handle multi-part responses
-        try:
-            output = response.text.strip()
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            output = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        output += part.text
-            output = output.strip()
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        output = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="architecture",
+                               accept=lambda text: self.validate_output(text)["is_valid"]).strip()
 
         # Strip markdown code fences if present
         if output.startswith('```markdown'):
@@ -143,19 +125,15 @@ Keep the response focused and concise. Prioritize clarity over length.
     
     def validate_output(self, output: str) -> Dict[str, Any]:
         """Validate architecture design quality"""
-        output_lower = output.lower()
+        index = get_artifact_index(output)
 
         validation = {
-            "has_hld": ("high-level design" in output_lower or "hld" in output_lower or
-                       "architecture" in output_lower or "system design" in output_lower),
-            "has_lld": ("low-level design" in output_lower or "lld" in output_lower or
-                       "component" in output_lower or "implementation" in output_lower),
-            "has_diagrams": "```mermaid" in output or "diagram" in output_lower,
-            "has_code_examples": "```" in output,
-            "has_implementation_strategy": ("implementation" in output_lower or
-                                           "strategy" in output_lower or
-                                           "approach" in output_lower),
-            "word_count": len(output.split()),
+            "has_hld": index.contains_any(["high-level design", "hld", "architecture", "system design"]),
+            "has_lld": index.contains_any(["low-level design", "lld", "component", "implementation"]),
+            "has_diagrams": index.has_code_block("mermaid") or index.contains("diagram"),
+            "has_code_examples": index.has_code_block(),
+            "has_implementation_strategy": index.contains_any(["implementation", "strategy", "approach"]),
+            "word_count": index.word_count,
         }
         validation["is_valid"] = all([
             validation["has_hld"] or validation["has_lld"],  # At least one design section
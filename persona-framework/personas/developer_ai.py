@@ -4,6 +4,9 @@ import os
 from datetime import datetime
 import re
 
+from utils.artifact_index import get_artifact_index
+from utils.llm import generate_text
+
 class DeveloperAI:
     """
     Developer AI Persona - Generates code scaffolding and implementations
@@ -23,7 +26,8 @@ class DeveloperAI:
         self, 
         task: Dict[str, str],
         architecture: str,
-        coding_standards: str = None
+        coding_standards: str = None,
+        code_context: str = None
     ) -> Dict[str, str]:
         """
         Generate code for a specific task
@@ -32,6 +36,7 @@ class DeveloperAI:
             task: Task details from implementation plan
             architecture: SYSTEM_DESIGN.md content
             coding_standards: Optional coding standards
+            code_context: Relevant snippets retrieved from the existing codebase
         
         Returns:
             Dictionary of {filename: code_content}
@@ -46,11 +51,14 @@ Your task is to generate production-ready code for the following task:
 {task}
 
 ## Architecture Context:
-{architecture[:800]}...
+{get_artifact_index(architecture).excerpt(800)}...
 
 ## Coding Standards:
 {coding_standards if coding_standards else "Follow Python PEP 8 / TypeScript best practices"}
 
+## Relevant Existing Code:
+{code_context if code_context else "No existing code provided"}
+
 Generate:
 1. All necessary files (Python/TypeScript/JavaScript)
 2. Complete implementations (not just stubs)
@@ -66,6 +74,7 @@ For each file, use this structure:
 ```
 
 Generate complete, working code that follows the architecture and coding standards.
+Extend and reuse the existing code shown above instead of duplicating it.
 Keep the code focused and concise.
 """
 
@@ -77,52 +86,11 @@ Keep the code focused and concise.
             'max_output_tokens': 4096,
         }
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            else:
-                raise
-        
-        # Parse response to extract files
-        files = {}
-
-        # Handle multi-part responses
-        try:
-            content = response.text
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            content = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        content += part.text
-        
-        # Simple parsing - look for ```filename: pattern
-        pattern = r'```filename:\s*(.+?)\n(.*?)```'
-        matches = re.findall(pattern, content, re.DOTALL)
-        
-        for filename, code in matches:
-            files[filename.strip()] = code.strip()
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        content = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="code_generation",
+                                accept=lambda text: bool(self._extract_files(text)))
         
-        # If no files found with filename pattern, try generic code blocks
-        if not files:
-            generic_pattern = r'```(?:python|typescript|javascript|tsx|jsx)?\n(.*?)```'
-            generic_matches = re.findall(generic_pattern, content, re.DOTALL)
-            for i, code in enumerate(generic_matches):
-                files[f'generated_code_{i}.py'] = code.strip()
-        
-        return files
+        return self._extract_files(content)
     
     def generate_code_scaffolding(
         self,
@@ -150,13 +118,13 @@ You are a Developer AI persona (v{self.persona_version}) - an expert Software De
 Your task is to generate production-ready code scaffolding based on the following:
 
 ## Requirements:
-{requirements[:1000]}...
+{get_artifact_index(requirements).excerpt(1000)}...
 
 ## Architecture:
-{architecture[:1000]}...
+{get_artifact_index(architecture).excerpt(1000)}...
 
 ## Implementation Plan:
-{plan[:1000]}...
+{get_artifact_index(plan).excerpt(1000)}...
 
 ## Coding Standards:
 {coding_standards if coding_standards else "Follow Python PEP 8 / TypeScript best practices"}
@@ -187,36 +155,83 @@ Keep the code focused and concise.
             'max_output_tokens': 4096,
         }
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            else:
-                raise
-
-        # Parse response to extract files
-        files = {}
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        content = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="code_generation",
+                                accept=lambda text: bool(self._extract_files(text)))
+
+        return self._extract_files(content)
+
+    def fix_files(
+        self,
+        failures: Dict[str, Dict[str, Any]],
+        files: Dict[str, str],
+        architecture: str,
+        coding_standards: str = None
+    ) -> Dict[str, str]:
+        """
+        Regenerate only the files that failed automatic verification
+
+        Args:
+            failures: {filename: verification result} for files that failed
+            files: Current {filename: code_content} for all generated files
+            architecture: SYSTEM_DESIGN.md content
+            coding_standards: Optional coding standards
+
+        Returns:
+            Dictionary of {filename: fixed_code_content} for the failed files
+        """
+
+        failing_sections = "\n\n".join(
+            f"### {filename}\n"
+            f"Error: {result.get('error')} (line {result.get('line')})\n"
+            f"```\n{files.get(filename, '')}\n```"
+            for filename, result in failures.items()
+        )
+        other_files = [name for name in files if name not in failures]
+
+        prompt = f"""
+You are a Developer AI persona (v{self.persona_version}) - an expert Software Developer.
+
+The following generated files failed automatic syntax verification. Fix ONLY these files.
+Keep their public interfaces unchanged so the other generated files still work.
+
+## Failing Files:
+{failing_sections}
+
+## Other Generated Files (unchanged, for reference):
+{chr(10).join(f"- {name}" for name in other_files) if other_files else "None"}
 
-        # Handle multi-part responses
-        try:
-            content = response.text
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            content = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        content += part.text
+## Architecture Context:
+{get_artifact_index(architecture).excerpt(800)}...
+
+## Coding Standards:
+{coding_standards if coding_standards else "Follow Python PEP 8 / TypeScript best practices"}
+
+Output format:
+For each fixed file, use this structure with the SAME path:
+```filename: path/to/file.py
+[complete corrected code content]
+```
+"""
+
+        generation_config = {
+            'temperature': 0.2,
+            'top_p': 0.95,
+            'top_k': 40,
+            'max_output_tokens': 4096,
+        }
+
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        content = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="code_generation",
+                                accept=lambda text: bool(self._extract_files(text)))
+
+        # Only accept files that were asked for
+        fixed = self._extract_files(content)
+        return {name: code for name, code in fixed.items() if name in failures}
+
+    def _extract_files(self, content: str) -> Dict[str, str]:
+        """Parse ```filename: blocks (or generic code blocks) out of a response"""
+        files = {}
 
         # Simple parsing - look for ```filename: pattern
         pattern = r'```filename:\s*(.+?)\n(.*?)```'
@@ -256,26 +271,6 @@ Include:
 Return complete, production-ready code.
 """
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(prompt)
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(prompt)
-            else:
-                raise
-
-        # Handle multi-part responses
-        try:
-            return response.text
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            content = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        content += part.text
-            return content
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        return generate_text(self.model, self.fallback_model, prompt, stage="code_generation")
 
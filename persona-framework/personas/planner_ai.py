@@ -4,6 +4,9 @@ import os
 from datetime import datetime
 import re
 
+from utils.artifact_index import get_artifact_index
+from utils.llm import generate_text
+
 class PlannerAI:
     """
     Planner AI Persona - Creates detailed implementation plans
@@ -23,7 +26,8 @@ class PlannerAI:
         self, 
         requirements: str, 
         architecture: str,
-        context: Dict[str, Any] = None
+        context: Dict[str, Any] = None,
+        reference: str = None
     ) -> str:
         """
         Generate IMPLEMENTATION_PLAN.md from requirements and architecture
@@ -32,6 +36,7 @@ class PlannerAI:
             requirements: FEATURE_REQUIREMENTS.md content
             architecture: SYSTEM_DESIGN.md content
             context: Project context
+            reference: Approved plan of a similar ticket, used as a few-shot seed
         
         Returns:
             Formatted IMPLEMENTATION_PLAN.md content
@@ -90,11 +95,14 @@ documents following this structure:
 ## Context:
 {f"Project Context: {context}" if context else "No additional context provided"}
 
+## Reference From a Similar Approved Ticket:
+{reference if reference else "No similar approved ticket found"}
+
 ## Requirements Document (excerpt):
-{requirements[:1000]}...
+{get_artifact_index(requirements).excerpt(1000)}...
 
 ## Architecture Document (excerpt):
-{architecture[:1000]}...
+{get_artifact_index(architecture).excerpt(1000)}...
 
 Generate a detailed, actionable IMPLEMENTATION_PLAN.md.
 Keep the response focused and concise.
@@ -108,34 +116,8 @@ Keep the response focused and concise.
             'max_output_tokens': 4096,
         }
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            else:
-                raise
-
-        # Handle multi-part responses
-        try:
-            output = response.text.strip()
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            output = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        output += part.text
-            output = output.strip()
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        output = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="planning").strip()
 
         # Strip markdown code fences if present
         if output.startswith('```markdown'):
@@ -158,23 +140,17 @@ Keep the response focused and concise.
     
     def extract_tasks(self, plan: str) -> List[Dict[str, str]]:
         """Extract individual tasks from implementation plan"""
+        index = get_artifact_index(plan)
         tasks = []
-        lines = plan.split('\n')
-        current_task = None
-        
-        for line in lines:
-            if line.startswith('### Task') or line.startswith('## Task'):
-                if current_task:
-                    tasks.append(current_task)
-                current_task = {"name": line.replace('###', '').replace('##', '').replace('Task', '').strip()}
-            elif current_task:
-                if '**Business Value**:' in line:
-                    current_task['business_value'] = line.split('**Business Value**:')[1].strip()
-                elif '**Priority**:' in line:
-                    current_task['priority'] = line.split('**Priority**:')[1].strip()
-        
-        if current_task:
-            tasks.append(current_task)
-        
-        return tasks
 
+        for section in index.find_sections('Task', levels=(2, 3)):
+            task = {"name": section.title.replace('Task', '', 1).strip()}
+            business_value = index.field_value(section, 'Business Value')
+            if business_value is not None:
+                task['business_value'] = business_value
+            priority = index.field_value(section, 'Priority')
+            if priority is not None:
+                task['priority'] = priority
+            tasks.append(task)
+
+        return tasks
@@ -1,8 +1,17 @@
 import google.generativeai as genai
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import contextvars
+import hashlib
+import json
 import os
 from datetime import datetime
 
+from utils.artifact_index import get_artifact_index, ArtifactIndex
+from utils.llm import generate_text
+from utils.tracing import span
+
 class RequirementsAI:
     """
     Requirements AI Persona - Analyzes product requirements and generates
@@ -18,14 +27,17 @@ class RequirementsAI:
         self.model = genai.GenerativeModel('models/gemini-2.5-flash')
         self.fallback_model = genai.GenerativeModel('models/gemini-1.5-flash')  # Lighter fallback
         self.persona_version = "v1.0.0"
+        self.chunk_chars = int(os.getenv('REQUIREMENTS_CHUNK_CHARS', '24000'))
+        self.map_workers = int(os.getenv('REQUIREMENTS_MAP_WORKERS', '8'))
         
-    def analyze_requirements(self, input_doc: str, context: Dict[str, Any] = None) -> str:
+    def analyze_requirements(self, input_doc: str, context: Dict[str, Any] = None, reference: str = None) -> str:
         """
         Analyze input requirements and generate FEATURE_REQUIREMENTS.md
         
         Args:
             input_doc: Raw requirements document (markdown)
             context: Optional context about the project (architecture, coding standards)
+            reference: Approved requirements of a similar ticket, used as a few-shot seed
         
         Returns:
             Formatted FEATURE_REQUIREMENTS.md content
@@ -69,6 +81,9 @@ FEATURE_REQUIREMENTS.md file following this structure:
 ## Context:
 {f"Project Context: {context}" if context else "No additional context provided"}
 
+## Reference From a Similar Approved Ticket:
+{reference if reference else "No similar approved ticket found"}
+
 ## Input Requirements Document:
 {input_doc}
 
@@ -86,34 +101,9 @@ Keep the response focused and concise.
             'max_output_tokens': 4096,
         }
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            else:
-                raise
-
-        # Handle multi-part responses
-        try:
-            output = response.text.strip()
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            output = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        output += part.text
-            output = output.strip()
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        output = generate_text(self.model, self.fallback_model, prompt, generation_config, stage="requirements",
+                               accept=lambda text: self.validate_output(text)["is_valid"]).strip()
 
         # Strip markdown code fences if present
         if output.startswith('```markdown'):
@@ -134,17 +124,173 @@ Keep the response focused and concise.
         
         return output
     
+    def analyze_large_requirements(
+        self,
+        input_doc: str,
+        context: Dict[str, Any] = None,
+        cache_dir: str = ".ai/cache/requirements_chunks",
+        reference: str = None
+    ) -> str:
+        """
+        Analyze a requirements document of any size and generate FEATURE_REQUIREMENTS.md
+
+        Documents that fit in one chunk go straight to analyze_requirements.
+        Larger ones are split on section boundaries and each chunk is condensed
+        to requirement notes concurrently (map); the notes are then merged and
+        analyzed as one document (reduce). Chunk notes are cached by hash, so
+        re-running on an edited document only re-analyzes changed chunks.
+
+        Args:
+            input_doc: Raw requirements document (markdown)
+            context: Optional context about the project
+            cache_dir: Directory for cached chunk notes
+            reference: Approved requirements of a similar ticket, used as a few-shot seed
+
+        Returns:
+            Formatted FEATURE_REQUIREMENTS.md content
+        """
+        if len(input_doc) <= self.chunk_chars:
+            return self.analyze_requirements(input_doc, context, reference)
+
+        chunks = ArtifactIndex(input_doc).chunks(self.chunk_chars)
+        print(f"   📚 Large document ({len(input_doc)} chars): analyzing {len(chunks)} chunks")
+
+        notes = self._map_chunks(chunks, context, Path(cache_dir))
+
+        # Merge notes in groups until they fit into one analysis prompt
+        while len(notes) > 1 and sum(len(n) for n in notes) > self.chunk_chars:
+            groups = self._group_notes(notes)
+            if len(groups) == len(notes):
+                break
+            print(f"   🔗 Merging {len(notes)} chunk notes into {len(groups)}")
+            notes = self._run_concurrently(self._merge_notes, [(group, context) for group in groups])
+
+        merged = "\n\n".join(notes)
+        return self.analyze_requirements(merged, context, reference)
+
+    def _map_chunks(self, chunks: List[Dict[str, str]], context: Optional[Dict[str, Any]], cache_dir: Path) -> List[str]:
+        """
+        Condense every chunk to requirement notes, serving unchanged chunks from cache.
+        Notes are cached without their "Part n/total" header, which depends on
+        the chunk's position, and get it after lookup.
+        """
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        context_key = json.dumps(context, sort_keys=True, default=str) if context else ""
+
+        notes: List[Optional[str]] = [None] * len(chunks)
+        pending = []
+        for i, chunk in enumerate(chunks):
+            key = hashlib.sha256(
+                f"{self.persona_version}\0bare\0{context_key}\0{chunk['heading_path']}\0{chunk['text']}".encode('utf-8')
+            ).hexdigest()
+            cache_file = cache_dir / f"{key}.md"
+            if cache_file.exists():
+                notes[i] = cache_file.read_text(encoding='utf-8')
+            else:
+                pending.append((i, cache_file))
+
+        print(f"   🗂️  Chunk cache: {len(chunks) - len(pending)} hit(s), {len(pending)} to analyze")
+        with span("map requirement chunks", 'persona', chunks=len(chunks), cache_hits=len(chunks) - len(pending)):
+            results = self._run_concurrently(
+                self._analyze_chunk,
+                [(chunks[i], i + 1, len(chunks), context) for i, _ in pending]
+            )
+        for (i, cache_file), result in zip(pending, results):
+            cache_file.write_text(result, encoding='utf-8')
+            notes[i] = result
+        return [
+            f"<!-- Part {i + 1}/{len(chunks)}: {chunk['heading_path'] or 'Preamble'} -->\n{note}"
+            for i, (chunk, note) in enumerate(zip(chunks, notes))
+        ]
+
+    def _run_concurrently(self, fn, arg_list: List[tuple]) -> List[str]:
+        """Run fn over arg_list on a thread pool, keeping the caller's cassette/budget context"""
+        if len(arg_list) <= 1:
+            return [fn(*args) for args in arg_list]
+        with ThreadPoolExecutor(max_workers=min(self.map_workers, len(arg_list))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, fn, *args) for args in arg_list]
+            return [f.result() for f in futures]
+
+    def _group_notes(self, notes: List[str]) -> List[List[str]]:
+        groups: List[List[str]] = [[]]
+        size = 0
+        for note in notes:
+            if groups[-1] and size + len(note) > self.chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(note)
+            size += len(note)
+        return groups
+
+    def _analyze_chunk(self, chunk: Dict[str, str], number: int, total: int, context: Optional[Dict[str, Any]]) -> str:
+        """Map step: extract requirement notes from one chunk of a large document"""
+        prompt = f"""
+You are a Requirements AI persona (v{self.persona_version}) - an expert Business Analyst and Requirements Engineer.
+
+The following is part {number} of {total} of a large product requirement document.
+{f"It starts in section: {chunk['heading_path']}" if chunk['heading_path'] else "It is the start of the document."}
+
+Extract everything relevant to the final feature requirements as concise markdown notes, grouped under:
+- Scope & Business Objectives
+- User Flows (including edge cases and error scenarios)
+- Functional Requirements (frontend, backend, integration)
+- Non-Functional Requirements (performance, security, accessibility)
+- Acceptance Criteria
+- Success Metrics
+- Open Questions
+
+Only include what is stated or clearly implied in this part; omit empty groups.
+Keep original identifiers, numbers, limits and names exactly as written.
+
+## Context:
+{f"Project Context: {context}" if context else "No additional context provided"}
+
+## Document Part {number}/{total}:
+{chunk['text']}
+"""
+        generation_config = {
+            'temperature': 0.3,
+            'top_p': 0.95,
+            'top_k': 40,
+            'max_output_tokens': 2048,
+        }
+        return generate_text(self.model, self.fallback_model, prompt, generation_config, stage="requirements").strip()
+
+    def _merge_notes(self, notes: List[str], context: Optional[Dict[str, Any]]) -> str:
+        """Reduce step: merge several chunk notes into one deduplicated set of notes"""
+        joined = "\n\n".join(notes)
+        prompt = f"""
+You are a Requirements AI persona (v{self.persona_version}) - an expert Business Analyst and Requirements Engineer.
+
+Merge the following requirement notes, extracted from consecutive parts of one large document,
+into a single consolidated set of notes with the same groups.
+Remove duplicates, keep every distinct requirement, and keep identifiers, numbers and names exactly as written.
+
+## Context:
+{f"Project Context: {context}" if context else "No additional context provided"}
+
+## Notes:
+{joined}
+"""
+        generation_config = {
+            'temperature': 0.3,
+            'top_p': 0.95,
+            'top_k': 40,
+            'max_output_tokens': 4096,
+        }
+        return generate_text(self.model, self.fallback_model, prompt, generation_config, stage="requirements").strip()
+
     def validate_output(self, output: str) -> Dict[str, Any]:
         """Validate that generated requirements meet quality standards"""
-        output_lower = output.lower()
+        index = get_artifact_index(output)
 
         validation = {
-            "has_executive_summary": "executive summary" in output_lower or "scope" in output_lower,
-            "has_user_flows": "user flow" in output_lower or "user journey" in output_lower,
-            "has_functional_requirements": "functional requirement" in output_lower or "requirements" in output_lower,
-            "has_acceptance_criteria": "acceptance criteria" in output_lower or "success criteria" in output_lower,
-            "has_ai_footprint": "AI Generation Footprint" in output,
-            "word_count": len(output.split()),
+            "has_executive_summary": index.contains_any(["executive summary", "scope"]),
+            "has_user_flows": index.contains_any(["user flow", "user journey"]),
+            "has_functional_requirements": index.contains_any(["functional requirement", "requirements"]),
+            "has_acceptance_criteria": index.contains_any(["acceptance criteria", "success criteria"]),
+            "has_ai_footprint": index.has_section("AI Generation Footprint"),
+            "word_count": index.word_count,
         }
         validation["is_valid"] = all([
             validation["has_executive_summary"],
@@ -1,8 +1,19 @@
 import google.generativeai as genai
 from typing import Dict, Any, List
 import os
+import re
 from datetime import datetime
 
+from utils.artifact_index import get_artifact_index
+from utils.llm import generate_text
+from utils.model_router import estimate_tokens
+from utils.tracing import span
+
+PACK_START = "=== TEST FILE: "
+PACK_MARKER_END = " ==="
+PACK_END = "=== END TEST FILE ==="
+PACKED_TEST_RE = re.compile(r"^=== TEST FILE: (.+?) ===[ \t]*\n(.*?)^=== END TEST FILE ===", re.S | re.M)
+
 class UnitTestAI:
     """
     Unit Test AI Persona - Generates comprehensive unit tests
@@ -17,6 +28,10 @@ class UnitTestAI:
         self.model = genai.GenerativeModel('models/gemini-2.5-flash')
         self.fallback_model = genai.GenerativeModel('models/gemini-1.5-flash')  # Lighter fallback
         self.persona_version = "v1.0.0"
+        # Request packing: files up to small_file_tokens share requests of up to pack_tokens
+        self.small_file_tokens = int(os.getenv('UNIT_TEST_SMALL_FILE_TOKENS', '1500'))
+        self.pack_tokens = int(os.getenv('UNIT_TEST_PACK_TOKENS', '6000'))
+        self.max_files_per_pack = int(os.getenv('UNIT_TEST_MAX_FILES_PER_PACK', '6'))
 
     def generate_unit_tests(
         self,
@@ -43,10 +58,101 @@ class UnitTestAI:
         if not code_files:
             return "No code files provided for test generation."
 
+        test_files = self.generate_test_files(
+            architecture=architecture,
+            code_files=code_files,
+            coding_standards=coding_standards,
+            test_framework=test_framework
+        )
+
+        # Generate and return test summary
+        return self.generate_test_summary(test_files)
+
+    def generate_test_files(
+        self,
+        architecture: str = None,
+        code_files: Dict[str, str] = None,
+        coding_standards: str = None,
+        test_framework: str = "pytest",
+        max_requests: int = 3
+    ) -> Dict[str, str]:
+        """
+        Generate unit test files for the given code files
+
+        Small files are packed several to a request (see _pack_files), so
+        changes touching many small files need far fewer model calls.
+
+        Args:
+            architecture: SYSTEM_DESIGN.md content for context
+            code_files: Dictionary of {filename: code_content}
+            coding_standards: Optional coding standards
+            test_framework: Testing framework (pytest, jest, unittest)
+            max_requests: Maximum number of generation requests (packs)
+
+        Returns:
+            Dictionary of {test_filename: test_code}
+        """
+
+        if not code_files:
+            return {}
+
         test_files = {}
+        architecture_excerpt = get_artifact_index(architecture).excerpt(1000)
+
+        for number, batch in enumerate(self._pack_files(code_files)[:max_requests], 1):
+            with span(f"test pack {number}", 'persona', files=len(batch)) as pack_span:
+                if len(batch) > 1:
+                    packed = self._generate_packed_tests(batch, code_files, architecture_excerpt, test_framework)
+                    test_files.update(packed)
+                    # Anything the model skipped gets its own request
+                    batch = [f for f in batch if self._test_filename(f) not in packed]
+                    if batch:
+                        print(f"   ↩️  {len(batch)} file(s) missing from packed response, generating individually")
+                    pack_span.set(unpacked=len(batch))
+
+                for filename in batch:
+                    test_files[self._test_filename(filename)] = self._generate_file_tests(
+                        filename, code_files[filename], architecture_excerpt, test_framework
+                    )
 
-        for filename, code in list(code_files.items())[:3]:  # Limit to first 3 files
-            prompt = f"""
+        return test_files
+
+    def _pack_files(self, code_files: Dict[str, str]) -> List[List[str]]:
+        """
+        Group files into requests: large files alone, small files bin-packed
+        (first-fit decreasing) under the pack token budget, in original order
+        of their first file.
+        """
+        packs: List[List[str]] = []
+        sizes: List[int] = []
+        small = []
+        for filename, code in code_files.items():
+            tokens = estimate_tokens(code)
+            if tokens > self.small_file_tokens:
+                packs.append([filename])
+                sizes.append(tokens)
+            else:
+                small.append((tokens, filename))
+
+        order = {filename: i for i, filename in enumerate(code_files)}
+        small_packs: List[List[str]] = []
+        small_sizes: List[int] = []
+        for tokens, filename in sorted(small, key=lambda item: -item[0]):
+            for i, pack in enumerate(small_packs):
+                if small_sizes[i] + tokens <= self.pack_tokens and len(pack) < self.max_files_per_pack:
+                    pack.append(filename)
+                    small_sizes[i] += tokens
+                    break
+            else:
+                small_packs.append([filename])
+                small_sizes.append(tokens)
+
+        packs.extend(sorted(pack, key=order.get) for pack in small_packs)
+        return sorted(packs, key=lambda pack: order[pack[0]])
+
+    def _generate_file_tests(self, filename: str, code: str, architecture_excerpt: str, test_framework: str) -> str:
+        """Generate the test file for a single code file"""
+        prompt = f"""
 You are a Unit Test AI persona (v{self.persona_version}) - an expert QA Engineer and Test Developer.
 
 Your task is to generate comprehensive unit tests for the following code file.
@@ -57,9 +163,66 @@ Your task is to generate comprehensive unit tests for the following code file.
 ```
 
 ## Architecture Context:
-{architecture[:1000]}...
+{architecture_excerpt}...
 
-## Testing Requirements:
+{self._testing_guidelines(test_framework)}
+Output the complete test file code.
+Keep the tests focused and concise.
+"""
+
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        test_code = generate_text(self.model, self.fallback_model, prompt, self._generation_config(), stage="unit_tests",
+                                  accept=lambda text: self.validate_tests(text)["is_valid"])
+        return self._strip_fences(test_code.strip())
+
+    def _generate_packed_tests(
+        self,
+        filenames: List[str],
+        code_files: Dict[str, str],
+        architecture_excerpt: str,
+        test_framework: str
+    ) -> Dict[str, str]:
+        """Generate tests for several small files in one request, split by delimiter"""
+        sections = "\n".join(
+            f"## Code File: {filename} (tests go in {self._test_filename(filename)})\n```\n{code_files[filename]}\n```\n"
+            for filename in filenames
+        )
+        prompt = f"""
+You are a Unit Test AI persona (v{self.persona_version}) - an expert QA Engineer and Test Developer.
+
+Your task is to generate comprehensive unit tests for EACH of the following {len(filenames)} small code files.
+
+{sections}
+## Architecture Context:
+{architecture_excerpt}...
+
+{self._testing_guidelines(test_framework)}
+## Output Format:
+Output one complete test file per code file, each wrapped exactly like this
+(no markdown fences, nothing between blocks):
+
+{PACK_START}<test file name>{PACK_MARKER_END}
+<complete test file code>
+{PACK_END}
+
+Keep the tests focused and concise.
+"""
+
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        content = generate_text(self.model, self.fallback_model, prompt, self._generation_config(), stage="unit_tests",
+                                accept=lambda text: bool(PACKED_TEST_RE.search(text)))
+
+        expected = {self._test_filename(filename) for filename in filenames}
+        test_files = {}
+        for match in PACKED_TEST_RE.finditer(content):
+            test_filename = match.group(1).strip()
+            if test_filename in expected:
+                test_files[test_filename] = self._strip_fences(match.group(2).strip())
+        return test_files
+
+    @staticmethod
+    def _testing_guidelines(test_framework: str) -> str:
+        return f"""## Testing Requirements:
 - Framework: {test_framework}
 - Coverage: Aim for >80% code coverage
 - Test all functions/methods
@@ -82,75 +245,62 @@ Generate complete, runnable unit tests with:
 - Clear assertions
 - Mocking where appropriate
 - Comments explaining complex test scenarios
-
-Output the complete test file code.
-Keep the tests focused and concise.
 """
 
-            # Configure generation settings
-            generation_config = {
-                'temperature': 0.7,
-                'top_p': 0.95,
-                'top_k': 40,
-                'max_output_tokens': 4096,
-            }
-
-            # Try primary model, fallback to lighter model if overloaded
-            try:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-            except Exception as e:
-                error_str = str(e).lower()
-                if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                    print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                    response = self.fallback_model.generate_content(
-                        prompt,
-                        generation_config=generation_config
-                    )
-                else:
-                    raise
-
-            # Handle multi-part responses
-            try:
-                test_code = response.text.strip()
-            except ValueError:
-                # Response has multiple parts, concatenate them
-                test_code = ""
-                for candidate in response.candidates:
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text'):
-                            test_code += part.text
-                test_code = test_code.strip()
-
-            # Strip markdown code fences if present
-            if test_code.startswith('```python'):
-                test_code = test_code[len('```python'):].strip()
-            elif test_code.startswith('```typescript') or test_code.startswith('```ts'):
-                test_code = test_code[test_code.find('\n')+1:].strip()
-            if test_code.startswith('```'):
-                test_code = test_code[3:].strip()
-            if test_code.endswith('```'):
-                test_code = test_code[:-3].strip()
-
-            # Determine test filename
-            if filename.endswith('.py'):
-                test_filename = filename.replace('.py', '_test.py')
-                if not test_filename.startswith('test_'):
-                    test_filename = 'test_' + test_filename
-            elif filename.endswith('.ts') or filename.endswith('.tsx'):
-                test_filename = filename.replace('.ts', '.test.ts').replace('.tsx', '.test.tsx')
-            else:
-                test_filename = f"test_{filename}"
-
-            test_files[test_filename] = test_code
+    @staticmethod
+    def _generation_config() -> Dict[str, Any]:
+        return {
+            'temperature': 0.7,
+            'top_p': 0.95,
+            'top_k': 40,
+            'max_output_tokens': 4096,
+        }
 
-        # Generate and return test summary
-        return self.generate_test_summary(test_files)
+    @staticmethod
+    def _strip_fences(test_code: str) -> str:
+        """Strip markdown code fences if present"""
+        if test_code.startswith('```python'):
+            test_code = test_code[len('```python'):].strip()
+        elif test_code.startswith('```typescript') or test_code.startswith('```ts'):
+            test_code = test_code[test_code.find('\n')+1:].strip()
+        if test_code.startswith('```'):
+            test_code = test_code[3:].strip()
+        if test_code.endswith('```'):
+            test_code = test_code[:-3].strip()
+        return test_code
+
+    @staticmethod
+    def _test_filename(filename: str) -> str:
+        """Determine test filename"""
+        if filename.endswith('.py'):
+            test_filename = filename.replace('.py', '_test.py')
+            if not test_filename.startswith('test_'):
+                test_filename = 'test_' + test_filename
+        elif filename.endswith('.ts') or filename.endswith('.tsx'):
+            test_filename = filename.replace('.ts', '.test.ts').replace('.tsx', '.test.tsx')
+        else:
+            test_filename = f"test_{filename}"
+        return test_filename
     
-    def generate_test_summary(self, test_files: Dict[str, str]) -> str:
-        """Generate TEST_SUMMARY.md documenting test coverage"""
+    def generate_test_summary(
+        self,
+        test_files: Dict[str, str],
+        test_results: Dict[str, Any] = None
+    ) -> str:
+        """Generate TEST_SUMMARY.md documenting test coverage (and execution results if available)"""
+
+        if test_results:
+            execution_lines = [
+                f"- {name}: {result.get('status')} "
+                f"(passed {result.get('passed', 0)}, failed {result.get('failed', 0)}, "
+                f"errors {result.get('errors', 0)}"
+                + (f", coverage {result['coverage_percent']}%" if result.get('coverage_percent') is not None else "")
+                + ")"
+                for name, result in test_results.get('results', {}).items()
+            ]
+            execution_section = "## Execution Results (actual run):\n" + "\n".join(execution_lines)
+        else:
+            execution_section = "## Execution Results:\nTests have not been executed yet."
         
         prompt = f"""
 Generate a comprehensive TEST_SUMMARY.md document that includes:
@@ -158,7 +308,7 @@ Generate a comprehensive TEST_SUMMARY.md document that includes:
 1. **Test Coverage Overview**
    - Total test files: {len(test_files)}
    - Test categories covered
-   - Estimated code coverage percentage
+   - Code coverage percentage (use the actual execution results when provided)
 
 2. **Test Files Summary**
    For each test file, provide:
@@ -181,31 +331,13 @@ Generate a comprehensive TEST_SUMMARY.md document that includes:
 ## Test Files:
 {chr(10).join([f"- {filename}" for filename in test_files.keys()])}
 
+{execution_section}
+
 Generate a professional TEST_SUMMARY.md document.
 """
 
-        # Try primary model, fallback to lighter model if overloaded
-        try:
-            response = self.model.generate_content(prompt)
-        except Exception as e:
-            error_str = str(e).lower()
-            if "503" in str(e) or "overloaded" in error_str or "unavailable" in error_str:
-                print("   ⚠️  Primary model overloaded, trying fallback model (gemini-1.5-flash)...")
-                response = self.fallback_model.generate_content(prompt)
-            else:
-                raise
-
-        # Handle multi-part responses
-        try:
-            output = response.text.strip()
-        except ValueError:
-            # Response has multiple parts, concatenate them
-            output = ""
-            for candidate in response.candidates:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text'):
-                        output += part.text
-            output = output.strip()
+        # Try primary model, fallback to lighter model if overloaded; continue truncated output
+        output = generate_text(self.model, self.fallback_model, prompt, stage="test_summary").strip()
 
         # Strip markdown code fences if present
         if output.startswith('```markdown'):
@@ -221,6 +353,9 @@ Generate a professional TEST_SUMMARY.md document.
         output += f"**Framework Version**: {self.persona_version}\n\n"
         output += f"**Generation Date**: {datetime.utcnow().isoformat()} UTC\n\n"
         output += f"**Test Files Generated**: {len(test_files)}\n\n"
+        if test_results:
+            output += (f"**Test Execution**: {test_results['passed']} passed, "
+                       f"{test_results['failed']} failed, {test_results['errors']} errors\n\n")
         output += f"---\n\n"
         output += f"Co-authored by Unit Test AI using Persona-Driven AI Framework {self.persona_version}\n"
         
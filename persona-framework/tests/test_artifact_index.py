@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.artifact_index import ArtifactIndex, get_artifact_index, clear_artifact_index_cache
+
+PLAN = """# Implementation Plan
+
+Intro paragraph.
+
+## Task 1: Cart totals
+**Priority**: High
+**Business Value**: Correct checkout amounts
+
+```python
+# not a heading
+total = sum(items)
+```
+
+## Task 2: Coupons
+**Priority**: Medium
+
+### Notes
+Codes are case-insensitive.
+"""
+
+
+def test_sections_tree_and_lookups():
+    index = ArtifactIndex(PLAN)
+
+    assert index.heading_paths() == [
+        "Implementation Plan",
+        "Implementation Plan > Task 1: Cart totals",
+        "Implementation Plan > Task 2: Coupons",
+        "Implementation Plan > Task 2: Coupons > Notes",
+    ]
+    tasks = index.find_sections('Task', levels=(2,))
+    assert [t.title for t in tasks] == ["Task 1: Cart totals", "Task 2: Coupons"]
+    assert index.field_value(tasks[0], 'Business Value') == "Correct checkout amounts"
+    assert index.field_value(tasks[1], 'Business Value') is None
+    assert "Codes are case-insensitive." in index.section_text(tasks[1])
+    assert index.has_code_block('python') and not index.has_code_block('mermaid')
+    assert index.contains("COUPONS") and not index.contains("COUPONS", case_sensitive=True)
+
+
+def test_chunks_keep_section_boundaries_and_cover_the_text():
+    text = "".join(f"## Section {i}\n" + f"Line {i} of the requirements.\n" * 20 for i in range(6))
+    chunks = ArtifactIndex(text).chunks(1500)
+
+    assert len(chunks) > 1
+    assert "".join(c['text'] for c in chunks) == text
+    for chunk in chunks:
+        assert len(chunk['text']) <= 1500
+        assert chunk['text'].startswith("## Section ")
+        assert chunk['heading_path'] == chunk['text'].splitlines()[0][3:]
+
+
+def test_oversized_section_is_split_at_paragraphs():
+    text = "## Huge\n" + "".join(f"Paragraph {i} " + "word " * 40 + "\n\n" for i in range(10))
+    chunks = ArtifactIndex(text).chunks(600)
+
+    assert "".join(c['text'] for c in chunks) == text
+    assert all(len(c['text']) <= 600 and c['heading_path'] == "Huge" for c in chunks)
+
+
+def test_index_is_memoised_by_content():
+    clear_artifact_index_cache()
+    index = get_artifact_index(PLAN)
+    assert get_artifact_index(PLAN) is index
+    assert get_artifact_index("".join(PLAN)) is index
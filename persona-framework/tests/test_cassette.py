@@ -0,0 +1,115 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.artifact_index import ArtifactIndex
+from utils.cassette import Cassette, CassetteMissError, RECORD, REPLAY
+
+
+def footprint(generated_at):
+    return (
+        "\n\n---\n\n## AI Generation Footprint\n\n"
+        "**Generated By**: Requirements AI\n\n"
+        f"**Generation Date**: {generated_at} UTC\n\n"
+        "---\n\nCo-authored by Requirements AI\n"
+    )
+
+
+def test_call_key_ignores_timestamps_and_measured_durations():
+    first = Cassette.call_key("Built 2024-05-01T10:00:00.123456 in 1.42s", {'temperature': 0.7})
+    second = Cassette.call_key("Built 2025-11-30T23:59:59.000001 in 0.07s", {'temperature': 0.7})
+    assert first == second
+    assert Cassette.call_key("Retry after 10 seconds", None) != Cassette.call_key("Retry after 30 seconds", None)
+    assert first != Cassette.call_key("Built 2024-05-01T10:00:00.123456 in 1.42s", {'temperature': 0.2})
+
+
+def test_excerpt_leaves_out_generation_footprint():
+    body = "# Feature\n\n## Overview\n\nCart coupons.\n\n## Scope\n\nCart page only.\n"
+    short = ArtifactIndex(body + footprint("2024-05-01T10:00:00"))
+    assert short.excerpt(1000) == body.rstrip()
+
+    long_text = body + "\n".join(f"Detail line {i}." for i in range(200)) + footprint("2024-05-01T10:00:00")
+    excerpt = ArtifactIndex(long_text).excerpt(300)
+    assert "## Overview" in excerpt and "## Scope" in excerpt
+    assert "Footprint" not in excerpt and "Generation Date" not in excerpt
+
+
+def test_replay_serves_prompts_recorded_with_other_timestamps(tmp_path):
+    path = tmp_path / 'cassette.jsonl.gz'
+    recorder = Cassette(path, mode=RECORD)
+    recorder.record(f"Design from:\n**Generated**: {datetime(2024, 5, 1).isoformat()}", None, 'model', 0.5, text='design')
+
+    player = Cassette(path, mode=REPLAY)
+    assert player.replay(f"Design from:\n**Generated**: {datetime(2025, 1, 2, 3, 4, 5).isoformat()}", None).text == 'design'
+    with pytest.raises(CassetteMissError):
+        player.replay("Something else", None)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.finish_reason = 'STOP'
+        self.candidates = []
+
+
+# Enough prose to pass the personas' minimum word counts
+FILLER = "\n\n".join("The cart keeps a running total of item prices and quantities." for _ in range(60))
+
+
+def fake_model_output(prompt):
+    prompt = str(prompt)
+    if 'Unit Test AI persona' in prompt:
+        return "```filename: tests/test_app.py\nfrom app import total\n\ndef test_total():\n    assert total([1, 2]) == 3\n```"
+    if 'Developer AI persona' in prompt:
+        return "```filename: app.py\ndef total(values):\n    return sum(values)\n```"
+    if 'Planner AI persona' in prompt:
+        return "# Implementation Plan\n\n## Task 1: Add totals\n\n**Priority**: High\n\n**Business Value**: Totals\n\n" + FILLER
+    if 'Architect AI persona' in prompt:
+        return "# System Design\n\n## Executive Summary\n\nA totals helper.\n\n## High-Level Design\n\n" + FILLER
+    return ("# Feature Requirements\n\n## Executive Summary\n\nSum cart values.\n\n## Functional Requirements\n\n"
+            + FILLER + "\n\n## Acceptance Criteria\n\n- Totals are exact\n")
+
+
+def test_recorded_workflow_replays_offline(tmp_path, monkeypatch):
+    orchestrator_module = pytest.importorskip("workflow_engine.orchestrator")
+    import google.generativeai as genai
+
+    monkeypatch.setenv('GEMINI_API_KEY', 'test')
+    monkeypatch.chdir(tmp_path)
+    approve = lambda stage, artifact_url: orchestrator_module.ApprovalStatus.APPROVED
+
+    live_calls = []
+
+    def live(self, prompt, **kwargs):
+        live_calls.append(prompt)
+        return FakeResponse(fake_model_output(prompt))
+
+    def offline(self, prompt, **kwargs):
+        raise AssertionError("replay made a live model call")
+
+    def run(mode):
+        orchestrator = orchestrator_module.WorkflowOrchestrator(
+            'test-project', 'test-bucket', state_dir=str(tmp_path / 'state')
+        )
+        return orchestrator.execute_workflow_with_gates(
+            ticket_id='CART-1',
+            requirements_doc='Show the cart total',
+            approval_callback=approve,
+            output_dir=str(tmp_path / 'out'),
+            cassette_mode=mode
+        )
+
+    monkeypatch.setattr(genai.GenerativeModel, 'generate_content', live, raising=False)
+    recorded = run('record')
+    assert not recorded['errors']
+    assert recorded['cassette']['calls'] == len(live_calls) >= 5
+
+    # The footprints of the replayed artifacts carry new generation dates
+    monkeypatch.setattr(genai.GenerativeModel, 'generate_content', offline, raising=False)
+    replayed = run('replay')
+    assert not replayed['errors']
+    assert replayed['cassette']['calls'] == recorded['cassette']['calls']
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine.code_verifier import CodeVerifier, verify_source, POOL_THRESHOLD
+
+
+@pytest.mark.parametrize("code", [
+    "const re = /[)}\\]]+/g;\nconst x = (a, b) => a / b;\n",
+    "function f(s) {\n  return /^\\d+$/.test(s) ? 1 : 2 / 3;\n}\n",
+    "const t = `total: ${items.map(i => `${i.price}`).join(', ')}`;\n",
+    "// comment with ( and '\n/* block { */\nlet a = [1, 2];\n",
+])
+def test_valid_scripts(code):
+    assert verify_source('app.ts', code)['ok']
+
+
+@pytest.mark.parametrize("code, error", [
+    ("function f() {\n  return 1;\n", "Unclosed '{'"),
+    ("const a = [1, 2);\n", "Unexpected ')'"),
+    ("const s = 'open;\n", "Unterminated string literal"),
+    ("const t = `open ${x}\n", "Unterminated template literal"),
+    ("/* never closed\n", "Unterminated block comment"),
+])
+def test_invalid_scripts(code, error):
+    result = verify_source('app.js', code)
+    assert not result['ok'] and result['error'] == error
+
+
+def test_jsx_tolerates_apostrophes_in_text():
+    code = "export const A = () => <p>Don't panic</p>;\n"
+    assert verify_source('A.tsx', code)['ok']
+    assert not verify_source('A.ts', code)['ok']
+
+
+def test_python_syntax_and_imports():
+    result = verify_source('app.py', "import os\nfrom cart.totals import total\n")
+    assert result['ok'] and result['imports'] == ['cart', 'os']
+    broken = verify_source('app.py', "def f(:\n    pass\n")
+    assert not broken['ok'] and broken['line'] == 1
+    assert verify_source('README.md', "# anything (")['skipped']
+
+
+def test_verify_files_caches_results_and_flags_unresolved_imports(tmp_path):
+    cache_file = tmp_path / 'verify.json'
+    files = {
+        'cart/totals.py': "def total(items):\n    return sum(items)\n",
+        'app.py': "import requests\nfrom cart.totals import total\n",
+        'bad.js': "function f() {\n",
+    }
+    report = CodeVerifier(cache_file).verify_files(files)
+    assert not report['is_valid'] and report['failed'] == ['bad.js']
+    assert report['warnings'] == {'app.py': ['requests']}
+    assert report['cache_hits'] == 0
+
+    # A new verifier reuses the persisted results
+    assert CodeVerifier(cache_file).verify_files(files)['cache_hits'] == len(files)
+
+
+def test_large_batches_use_the_process_pool():
+    files = {f"m{i}.py": f"x = {i}\n" for i in range(POOL_THRESHOLD)}
+    files['broken.py'] = "def (\n"
+    report = CodeVerifier(max_workers=2).verify_files(files)
+    assert report['failed'] == ['broken.py']
+    assert len(report['results']) == POOL_THRESHOLD + 1
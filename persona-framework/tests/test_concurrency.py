@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.budget import WorkflowCancelled
+from utils.concurrency import AIMDLimiter, is_throttle_error
+
+
+def test_limit_does_not_grow_under_light_traffic():
+    limiter = AIMDLimiter(initial_limit=4)
+    for _ in range(20):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 4 and limiter.snapshot()['successes'] == 20
+
+
+def test_limit_grows_additively_while_saturated():
+    limiter = AIMDLimiter(initial_limit=2, max_limit=3)
+    for _ in range(6):
+        held = [limiter.acquire(), limiter.acquire()]
+        for acquired_at in held:
+            limiter.release(acquired_at, 'success')
+        if limiter.limit >= 3:
+            break
+    # Each saturated release adds increase / limit, so one window adds about one slot
+    assert limiter.limit == 3
+
+
+def test_throttle_halves_the_limit_once_per_window():
+    limiter = AIMDLimiter(initial_limit=8, min_limit=1)
+    in_flight = [limiter.acquire() for _ in range(4)]
+    for acquired_at in in_flight:
+        limiter.release(acquired_at, 'throttle')
+    # The three other requests were already running under the old limit
+    assert limiter.limit == 4 and limiter.snapshot()['decreases'] == 1
+
+    for _ in range(5):
+        limiter.release(limiter.acquire(), 'throttle')
+    assert limiter.limit == 1
+
+
+def test_slow_success_counts_as_backoff_and_errors_do_not_adapt():
+    limiter = AIMDLimiter(initial_limit=4, latency_target_seconds=0)
+    limiter.release(limiter.acquire() - 1, 'success')
+    assert limiter.limit == 2
+
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("bad request")
+    with pytest.raises(WorkflowCancelled):
+        with limiter.slot():
+            raise WorkflowCancelled("cancelled")
+    assert limiter.limit == 2
+    assert limiter.snapshot()['errors'] == 1 and limiter.snapshot()['cancelled'] == 1
+
+
+def test_acquire_waits_for_a_free_slot():
+    limiter = AIMDLimiter(initial_limit=1)
+    held = limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.05)
+
+    threading.Timer(0.05, limiter.release, args=(held, 'success')).start()
+    limiter.release(limiter.acquire(timeout=5), 'success')
+    assert limiter.in_flight == 0
+
+
+def test_throttle_errors_are_classified():
+    assert is_throttle_error(Exception("429 Resource exhausted"))
+    assert is_throttle_error(TimeoutError())
+    assert not is_throttle_error(ValueError("invalid argument"))
+    assert not is_throttle_error(WorkflowCancelled("deadline exceeded"))
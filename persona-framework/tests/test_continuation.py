@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.continuation import stitch, close_fence, is_truncated
+
+
+def test_exact_overlap_is_removed():
+    assert stitch("def total(x):\n    return x +", "return x + 1\n") == "def total(x):\n    return x + 1\n"
+
+
+def test_restated_partial_line_replaces_the_original():
+    output = "def run():\n  value = compute_total("
+    assert stitch(output, "      value = compute_total(items)\n") == "def run():\n  value = compute_total(items)\n"
+
+
+def test_closing_brace_on_a_new_line_is_kept():
+    assert stitch("..\n  }", "\n}\n") == "..\n  }\n}\n"
+
+
+def test_list_item_that_looks_restated_is_kept():
+    assert stitch("items:\n- a", "\n- a second\n") == "items:\n- a\n- a second\n"
+
+
+def test_short_last_line_is_not_treated_as_restated():
+    assert stitch("if x:\n  }", "} else {\n") == "if x:\n  }} else {\n"
+
+
+def test_reopened_fence_is_dropped_inside_a_code_block():
+    output = "Code:\n```python\nx = 1\n"
+    assert stitch(output, "```python\ny = 2\n```\n") == "Code:\n```python\nx = 1\ny = 2\n```\n"
+
+
+def test_unrelated_continuation_is_appended():
+    assert stitch("First part.", " Second part.") == "First part. Second part."
+
+
+def test_close_fence_and_truncation_reasons():
+    assert close_fence("```python\nx = 1") == "```python\nx = 1\n```\n"
+    assert close_fence("done\n") == "done\n"
+    assert is_truncated("FinishReason.MAX_TOKENS") and is_truncated("2")
+    assert not is_truncated("STOP") and not is_truncated(None)
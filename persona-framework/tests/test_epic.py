@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+orchestrator_module = pytest.importorskip("workflow_engine.orchestrator")
+
+
+class FakePersona:
+    """Persona stand-in that records the requirements each planner call receives"""
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def create_implementation_plan(self, requirements, architecture, context=None, reference=None):
+        self.calls.append(requirements)
+        return f"plan for:\n{requirements}"
+
+    def __getattr__(self, attr):
+        def call(*args, **kwargs):
+            if attr == 'validate_output':
+                return {'is_valid': True}
+            if attr == 'extract_tasks':
+                return [{'name': 'task'}]
+            if attr == 'generate_code':
+                return {'app.py': 'x = 1\n'}
+            if attr == 'generate_test_files':
+                return {'test_app.py': 'def test_x():\n    assert True\n'}
+            return f"{self.name} {attr} output"
+        return call
+
+
+def test_epic_children_plan_their_own_requirements(tmp_path, monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', 'test')
+    monkeypatch.chdir(tmp_path)
+    ApprovalStatus = orchestrator_module.ApprovalStatus
+
+    orchestrator = orchestrator_module.WorkflowOrchestrator('test-project', 'test-bucket', state_dir=str(tmp_path / 'state'))
+    planner_calls = []
+    for name in ('requirements_ai', 'architect_ai', 'planner_ai', 'developer_ai', 'unit_test_ai'):
+        setattr(orchestrator, name, FakePersona(name, planner_calls))
+
+    results = orchestrator.execute_epic(
+        epic_id='EPIC-1',
+        epic_requirements='Checkout revamp',
+        tickets=[
+            {'ticket_id': 'EPIC-1-A', 'requirements': 'Add a coupon field to the cart page'},
+            {'ticket_id': 'EPIC-1-B', 'requirements': 'Email a receipt after payment'},
+        ],
+        approval_callback=lambda stage, artifact_url: ApprovalStatus.APPROVED,
+        max_parallel=1
+    )
+
+    assert set(results['tickets']) == {'EPIC-1-A', 'EPIC-1-B'}
+    assert len(planner_calls) == 2
+    assert planner_calls[0] != planner_calls[1]
+    coupon = [call for call in planner_calls if 'coupon field' in call]
+    receipt = [call for call in planner_calls if 'receipt after payment' in call]
+    assert len(coupon) == 1 and len(receipt) == 1
+    assert 'Email a receipt' not in coupon[0]
@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intake.jira import JiraIntake, iter_export, _iter_json_array
+
+
+def issue(key, summary, updated, description="As a shopper I want totals"):
+    return {'key': key, 'fields': {
+        'summary': summary, 'description': description, 'status': {'name': 'To Do'},
+        'issuetype': {'name': 'Story'}, 'priority': {'name': 'High'}, 'labels': ['cart'],
+        'components': [{'name': 'web'}], 'parent': {'key': 'EPIC-1'}, 'updated': updated,
+    }}
+
+
+def test_json_array_is_streamed_across_block_boundaries():
+    issues = [issue(f"SHOP-{i}", f"Story {i} with [brackets], \"quotes\" and {{braces}}",
+                    "2024-01-15T10:20:30.000+0000") for i in range(20)]
+    for payload in (issues, {'total': 20, 'issues': issues}):
+        streamed = list(_iter_json_array(io.StringIO(json.dumps(payload, indent=1)), block_size=7))
+        assert streamed == issues
+
+
+def test_iter_export_normalises_json_jsonl_and_csv(tmp_path):
+    (tmp_path / 'export.json').write_text(json.dumps([issue('SHOP-1', 'Totals', "2024-01-15T10:20:00.000+0100")]))
+    (tmp_path / 'export.jsonl').write_text(json.dumps(issue('SHOP-1', 'Totals', "2024-01-15T10:20:00.000+0100")) + "\n\n")
+    (tmp_path / 'export.csv').write_text(
+        "Issue key,Summary,Description,Status,Issue Type,Priority,Labels,Component/s,Parent,Updated\n"
+        "SHOP-1,Totals,As a shopper I want totals,To Do,Story,High,cart,web,EPIC-1,15/Jan/24 9:20 AM\n"
+        ",No key,,,,,,,,\n"
+    )
+
+    tickets = [list(iter_export(str(tmp_path / name))) for name in ('export.json', 'export.jsonl', 'export.csv')]
+    assert tickets[0] == tickets[1] == tickets[2]
+    assert tickets[0][0] == {
+        'key': 'SHOP-1', 'summary': 'Totals', 'description': 'As a shopper I want totals', 'status': 'To Do',
+        'issuetype': 'Story', 'priority': 'High', 'labels': ['cart'], 'components': ['web'],
+        'parent': 'EPIC-1', 'updated': '2024-01-15T09:20:00',
+    }
+
+
+def test_sync_export_enqueues_only_new_or_changed_tickets(tmp_path):
+    enqueued = []
+    intake = JiraIntake(enqueued.extend, db_path=str(tmp_path / 'intake.db'), cursor_overlap_minutes=60, batch_size=2)
+    export = tmp_path / 'export.jsonl'
+
+    def write_export(issues):
+        export.write_text("".join(json.dumps(i) + "\n" for i in issues))
+
+    write_export([issue(f"SHOP-{i}", f"Story {i}", f"2024-03-0{i}T10:00:00.000+0000") for i in range(1, 4)])
+    stats = intake.sync_export(str(export))
+    assert (stats['new'], stats['enqueued']) == (3, 3)
+    assert [key for key, _ in enqueued] == ['SHOP-1', 'SHOP-2', 'SHOP-3']
+    assert enqueued[0][1]['requirements'].startswith("# SHOP-1: Story 1")
+    assert intake.get_cursor(stats['source']) == '2024-03-03T10:00:00'
+
+    # Unchanged tickets inside the overlap window are hashed and skipped
+    enqueued.clear()
+    stats = intake.sync_export(str(export))
+    assert (stats['skipped_by_cursor'], stats['unchanged'], stats['enqueued']) == (2, 1, 0)
+
+    write_export([
+        issue('SHOP-1', 'Story 1', "2024-03-01T10:00:00.000+0000"),
+        issue('SHOP-3', 'Story 3 (edited)', "2024-03-04T10:00:00.000+0000"),
+        issue('SHOP-4', 'Story 4', "2024-03-04T11:00:00.000+0000"),
+    ])
+    stats = intake.sync_export(str(export))
+    assert (stats['skipped_by_cursor'], stats['changed'], stats['new']) == (1, 1, 1)
+    assert [key for key, _ in enqueued] == ['SHOP-3', 'SHOP-4']
+
+    # A full sync ignores the cursor but still drops unchanged content
+    enqueued.clear()
+    stats = intake.sync_export(str(export), full=True)
+    assert (stats['skipped_by_cursor'], stats['unchanged'], stats['enqueued']) == (0, 3, 0)
@@ -0,0 +1,105 @@
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine.job_queue import JobQueue, QueueWorker, AWAITING_APPROVAL, PENDING, DONE, FAILED
+from workflow_engine.pipeline import StageOutcome
+
+STAGES = ('requirements', 'architecture', 'planning')
+
+
+class FakeOrchestrator:
+    """Runs STAGES in order, skipping seeded ones; a gate that is not approved holds the workflow"""
+
+    def __init__(self, fail_times=0):
+        self.runs = []
+        self.statuses = {}
+        self.fail_times = fail_times
+        self.state_store = self
+
+    def get_workflow(self, ticket_id):
+        return {'status': self.statuses[ticket_id]}
+
+    @contextmanager
+    def workflow_slot(self, wait=False):
+        yield
+
+    def cancel_workflow(self, ticket_id, reason):
+        return True
+
+    def execute_workflow_with_gates(self, ticket_id, requirements_doc, context=None, approval_callback=None,
+                                    seed=None, checkpoint=None):
+        seed = seed or {}
+        self.runs.append(sorted(seed))
+        results = {'errors': []}
+        if self.fail_times:
+            self.fail_times -= 1
+            self.statuses[ticket_id] = 'FAILED'
+            results['errors'].append('model unavailable')
+            return results
+        for stage in STAGES:
+            if stage in seed:
+                assert seed[stage].outputs == {'text': f"{stage} of {requirements_doc}"}
+                continue
+            outcome = StageOutcome({'text': f"{stage} of {requirements_doc}"}, f"/artifacts/{stage}.md")
+            if approval_callback(stage, outcome.artifact_url) != 'APPROVED':
+                results['held'] = {'stage': stage, 'outputs': outcome.outputs, 'artifact_url': outcome.artifact_url}
+                self.statuses[ticket_id] = 'PENDING'
+                return results
+            checkpoint(stage, outcome)
+        self.statuses[ticket_id] = 'COMPLETED'
+        return results
+
+
+def hold_every_gate(stage, artifact_url):
+    return 'PENDING'
+
+
+def test_held_job_waits_for_approval_and_resumes_after_the_approved_stage(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    orchestrator = FakeOrchestrator()
+    worker = QueueWorker(queue, orchestrator, 'w1', approval_callback=hold_every_gate)
+    queue.enqueue('T-1', {'ticket_id': 'T-1', 'requirements': 'cart totals'})
+
+    for stage in STAGES:
+        job_id = worker.run_once()['job_id']
+        job = queue.get_job(job_id)
+        assert job['status'] == AWAITING_APPROVAL and job['held_stage'] == stage
+        # Nothing to claim while the job waits for a reviewer
+        assert worker.run_once() is None
+        assert stage not in queue.load_checkpoints(job_id)
+        assert not queue.approve(job_id, stage='unknown')
+        assert queue.approve(job_id, stage=stage)
+        assert queue.get_job(job_id)['status'] == PENDING
+
+    worker.run_once()
+    assert queue.get_job(job_id)['status'] == DONE
+    assert orchestrator.runs == [[], ['requirements'], ['architecture', 'requirements'], sorted(STAGES)]
+
+
+def test_rejected_job_fails(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    worker = QueueWorker(queue, FakeOrchestrator(), 'w1', approval_callback=hold_every_gate)
+    queue.enqueue('T-1', {'ticket_id': 'T-1', 'requirements': 'cart totals'})
+    job_id = worker.run_once()['job_id']
+
+    assert queue.reject(job_id, 'wrong scope')
+    job = queue.get_job(job_id)
+    assert job['status'] == FAILED and job['error'] == 'rejected at requirements: wrong scope'
+    assert not queue.approve(job_id)
+
+
+def test_failed_workflow_is_retried_then_completes(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), max_attempts=3)
+    worker = QueueWorker(queue, FakeOrchestrator(fail_times=1), 'w1',
+                         approval_callback=lambda stage, url: 'APPROVED', retry_delay_seconds=0)
+    queue.enqueue('T-1', {'ticket_id': 'T-1', 'requirements': 'cart totals'})
+
+    job_id = worker.run_once()['job_id']
+    assert queue.get_job(job_id)['status'] == 'RUNNING'
+    worker.run_once()
+    job = queue.get_job(job_id)
+    assert job['status'] == DONE and job['attempts'] == 2
+    assert queue.stats()[DONE] == 1 and queue.stats()[AWAITING_APPROVAL] == 0
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.llm import generate_text
+from utils.model_router import ModelRouter, LIGHT_MODEL, STRONG_MODEL
+
+
+class FakeResponse:
+    def __init__(self, text, finish_reason='STOP'):
+        self.text = text
+        self.finish_reason = finish_reason
+
+
+class FakeModel:
+    def __init__(self, model_name, *answers):
+        self.model_name = model_name
+        self.answers = list(answers)
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return FakeResponse(self.answers.pop(0))
+
+
+def test_escalation_picks_the_next_costlier_candidate():
+    router = ModelRouter()
+    assert router.escalation('test_summary', LIGHT_MODEL) == STRONG_MODEL
+    assert router.escalation('test_summary', STRONG_MODEL) is None
+
+
+def test_light_model_answer_is_kept_when_usable():
+    light, strong = FakeModel(LIGHT_MODEL, "# Test Summary"), FakeModel(STRONG_MODEL)
+    assert generate_text(strong, light, "summarise", stage="test_summary") == "# Test Summary"
+    assert strong.prompts == []
+
+
+def test_empty_light_model_answer_escalates_to_the_strong_model():
+    light, strong = FakeModel(LIGHT_MODEL, "  \n"), FakeModel(STRONG_MODEL, "# Test Summary")
+    assert generate_text(strong, light, "summarise", stage="test_summary") == "# Test Summary"
+    assert light.prompts == strong.prompts == ["summarise"]
+
+
+def test_answer_rejected_by_accept_escalates_once():
+    light = FakeModel(LIGHT_MODEL, "no files here")
+    strong = FakeModel(STRONG_MODEL, "still no files")
+    output = generate_text(strong, light, "summarise", stage="test_summary",
+                           accept=lambda text: "```" in text)
+    # The strong model's answer is final even when it is rejected too
+    assert output == "still no files"
+    assert len(light.prompts) == len(strong.prompts) == 1
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine.project_registry import OrchestratorRegistry, ProjectConfig, UnknownProject, DEFAULT_PROJECT
+from workflow_engine.state_store import WorkflowStateStore
+
+
+class FakeOrchestrator:
+    """Keeps its state where a real orchestrator would: under the project's state_dir"""
+
+    def __init__(self, config):
+        self.config = config
+        self.state_store = WorkflowStateStore(str(Path(config.state_dir) / "workflows.db"))
+        self.busy = False
+        self.closed = False
+
+    def is_idle(self):
+        return not self.busy
+
+    def shutdown(self):
+        self.closed = True
+        self.state_store.close()
+
+
+def make_registry(tmp_path, keys, max_size=8):
+    default = ProjectConfig(DEFAULT_PROJECT, 'gcp', 'bucket', state_dir=str(tmp_path / DEFAULT_PROJECT))
+    projects = {DEFAULT_PROJECT: default}
+    for key in keys:
+        projects[key] = ProjectConfig.from_dict(key, {'state_dir': str(tmp_path / key)}, default)
+    return OrchestratorRegistry(projects, max_size=max_size, factory=FakeOrchestrator)
+
+
+def test_projects_get_their_own_state(tmp_path):
+    registry = make_registry(tmp_path, ['shop', 'billing'])
+
+    with registry.lease('shop') as shop, registry.lease('billing') as billing:
+        assert shop is not billing
+        shop.state_store.create_workflow('T-1', current_step='requirements')
+        assert shop.state_store.get_workflow('T-1') is not None
+        assert billing.state_store.get_workflow('T-1') is None
+
+    assert registry.get('shop') is shop
+    assert registry.get(None) is registry.get(DEFAULT_PROJECT)
+    with pytest.raises(UnknownProject):
+        registry.config('unknown')
+
+
+def test_idle_orchestrators_are_evicted_but_leased_ones_are_kept(tmp_path):
+    registry = make_registry(tmp_path, ['a', 'b', 'c'], max_size=2)
+
+    with registry.lease('a') as a:
+        first_b = registry.get('b')
+        first_b.state_store.create_workflow('T-9', current_step='planning')
+        registry.get('c')
+        # 'a' is leased, so the least recently used idle one goes
+        assert [entry['project'] for entry in registry.snapshot()['cached']] == ['a', 'c']
+        assert first_b.closed and not a.closed
+
+    b = registry.get('b')
+    assert registry.snapshot()['evicted'] == 2 and a.closed
+    # A re-created orchestrator sees the state its project persisted before
+    assert b is not first_b and b.state_store.get_workflow('T-9')['current_step'] == 'planning'
+
+
+def test_config_defaults_and_validation(tmp_path):
+    default = ProjectConfig(DEFAULT_PROJECT, 'gcp', 'bucket')
+    config = ProjectConfig.from_dict('shop', {'project_root': '/srv/shop', 'context': {'stack': 'django'}}, default)
+    assert config.state_dir == str(Path('.ai') / 'projects' / 'shop')
+    assert (config.gcp_project_id, config.bucket_name) == ('gcp', 'bucket')
+    with pytest.raises(ValueError):
+        ProjectConfig.from_dict('shop', {'bucket': 'typo'}, default)
+
+
+def test_from_env_reads_the_projects_file(tmp_path, monkeypatch):
+    projects_file = tmp_path / 'projects.json'
+    projects_file.write_text(json.dumps({'shop': {'max_concurrent_workflows': 2}, DEFAULT_PROJECT: {}}))
+    monkeypatch.setenv('PROJECTS_FILE', str(projects_file))
+    monkeypatch.setenv('PROJECT_CACHE_SIZE', '3')
+
+    registry = OrchestratorRegistry.from_env()
+    assert registry.project_keys() == [DEFAULT_PROJECT, 'shop'] and registry.max_size == 3
+    assert registry.config('shop').max_concurrent_workflows == 2
+    # The default project keeps the shared single-project paths
+    assert registry.config().state_dir is None
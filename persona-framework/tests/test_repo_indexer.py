@@ -0,0 +1,75 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_bootstrap.repo_indexer import RepoIndexer
+
+API = '''from fastapi import FastAPI
+from cart.totals import total
+
+app = FastAPI()
+
+
+class CartService:
+    def add(self, item):
+        pass
+
+
+@app.get("/cart")
+def read_cart():
+    return total([])
+'''
+
+SCRIPT = '''import { total } from './totals';
+
+export class Checkout {}
+
+export async function pay(cart) {
+  return total(cart);
+}
+
+router.post('/pay', pay);
+'''
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def test_refresh_only_reparses_changed_files(tmp_path):
+    write(tmp_path / 'api.py', API)
+    write(tmp_path / 'web' / 'checkout.ts', SCRIPT)
+    write(tmp_path / 'requirements.txt', "fastapi==0.110  # web\n-e .\n")
+    write(tmp_path / 'node_modules' / 'dep' / 'index.js', "export const x = 1;\n")
+    write(tmp_path / 'notes.txt', "not indexed\n")
+    indexer = RepoIndexer(str(tmp_path))
+
+    stats = indexer.refresh()
+    assert (stats['files'], stats['parsed'], stats['reused']) == (3, 3, 0)
+
+    summary = indexer.summary()
+    assert summary['languages'] == {'python': 1, 'typescript': 1}
+    assert summary['dependencies'] == {'requirements.txt': ['fastapi==0.110']}
+    assert {'path': 'api.py', 'classes': ['CartService'], 'functions': ['read_cart']} in summary['modules']
+    assert {'method': 'GET', 'path': '/cart', 'handler': 'read_cart', 'line': 13, 'file': 'api.py'} in summary['routes']
+    assert {'method': 'POST', 'path': '/pay', 'file': 'web/checkout.ts'} in summary['routes']
+
+    assert indexer.refresh()['parsed'] == 0
+
+    write(tmp_path / 'api.py', API + "\n\ndef healthz():\n    return 'ok'\n")
+    (tmp_path / 'web' / 'checkout.ts').unlink()
+    stats = indexer.refresh()
+    assert (stats['parsed'], stats['reused'], stats['removed']) == (1, 1, 1)
+    assert indexer.files['api.py']['functions'][-1]['name'] == 'healthz'
+
+    # A new indexer picks up the persisted index
+    assert RepoIndexer(str(tmp_path)).refresh()['parsed'] == 0
+
+
+def test_syntax_errors_are_recorded_not_raised(tmp_path):
+    write(tmp_path / 'broken.py', "def broken(:\n")
+    indexer = RepoIndexer(str(tmp_path))
+    indexer.refresh()
+    assert 'parse_error' in indexer.files['broken.py']
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+requirements_module = pytest.importorskip("personas.requirements_ai")
+
+
+def make_persona(analyzed):
+    persona = requirements_module.RequirementsAI.__new__(requirements_module.RequirementsAI)
+    persona.persona_version = "v1.0.0"
+    persona.map_workers = 1
+
+    def analyze_chunk(chunk, number, total, context):
+        analyzed.append(chunk['heading_path'])
+        return f"notes on {chunk['heading_path']}"
+
+    persona._analyze_chunk = analyze_chunk
+    return persona
+
+
+def chunk(heading):
+    return {'heading_path': heading, 'text': f"# {heading}\n\nDetails of {heading}."}
+
+
+def test_cached_chunk_notes_get_the_header_of_their_new_position(tmp_path):
+    analyzed = []
+    persona = make_persona(analyzed)
+
+    notes = persona._map_chunks([chunk('Cart'), chunk('Checkout')], None, tmp_path)
+    assert notes == ["<!-- Part 1/2: Cart -->\nnotes on Cart", "<!-- Part 2/2: Checkout -->\nnotes on Checkout"]
+
+    # A section inserted before them shifts both cached chunks
+    notes = persona._map_chunks([chunk('Login'), chunk('Cart'), chunk('Checkout')], None, tmp_path)
+    assert analyzed == ['Cart', 'Checkout', 'Login']
+    assert notes == [
+        "<!-- Part 1/3: Login -->\nnotes on Login",
+        "<!-- Part 2/3: Cart -->\nnotes on Cart",
+        "<!-- Part 3/3: Checkout -->\nnotes on Checkout",
+    ]
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_bootstrap.retrieval import CodeSearchIndex, tokenize
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("def applyCouponCode(cart_total):") == ['applycouponcode', 'apply', 'coupon', 'code', 'cart', 'total']
+
+
+def test_search_ranks_matching_chunks_and_refresh_is_incremental(tmp_path):
+    write(tmp_path / 'cart.py', "def apply_coupon(cart, code):\n    return cart.discount(code)\n")
+    write(tmp_path / 'mail.py', "def send_receipt(order):\n    return mailer.send(order.email)\n")
+    write(tmp_path / '.ai' / 'rules' / 'style.md', "# Coupons\n\nCoupon codes are case-insensitive.\n")
+    index = CodeSearchIndex(str(tmp_path))
+
+    assert index.refresh()['changed'] == 3
+    assert index.search("coupon code")[0]['path'] in ('cart.py', '.ai/rules/style.md')
+    assert index.search("receipt email")[0]['path'] == 'mail.py'
+    assert index.refresh()['changed'] == 0
+
+    (tmp_path / 'mail.py').unlink()
+    write(tmp_path / 'refund.py', "def refund_order(order):\n    return payments.refund(order)\n")
+    assert index.refresh()['changed'] == 2
+    assert index.search("receipt email") == []
+    assert index.search("refund")[0]['path'] == 'refund.py'
+
+    # A new instance loads the persisted index
+    assert CodeSearchIndex(str(tmp_path)).refresh()['changed'] == 0
+
+
+def test_concurrent_refresh_and_search(tmp_path):
+    for i in range(40):
+        write(tmp_path / f"module_{i}.py", f"def handler_{i}(request):\n    return cart_total_{i}(request)\n")
+    index = CodeSearchIndex(str(tmp_path))
+    index.refresh()
+    errors = []
+    stop = threading.Event()
+
+    def searcher():
+        try:
+            while not stop.is_set():
+                for hit in index.search("handler request cart total", k=10):
+                    assert hit['path'].startswith('module_')
+        except Exception as e:
+            errors.append(e)
+
+    def refresher(offset):
+        try:
+            for round_no in range(15):
+                for i in range(offset, 40, 2):
+                    write(tmp_path / f"module_{i}.py",
+                          f"def handler_{i}(request):\n    return cart_total_{i}(request, {round_no})\n" * (round_no % 3 + 1))
+                index.refresh()
+        except Exception as e:
+            errors.append(e)
+
+    searchers = [threading.Thread(target=searcher) for _ in range(3)]
+    refreshers = [threading.Thread(target=refresher, args=(offset,)) for offset in (0, 1)]
+    for thread in searchers + refreshers:
+        thread.start()
+    for thread in refreshers:
+        thread.join()
+    stop.set()
+    for thread in searchers:
+        thread.join()
+
+    assert errors == []
+    index.refresh()
+    # Postings and totals match a clean rebuild
+    fresh = CodeSearchIndex(str(tmp_path), index_path=tmp_path / 'fresh.json')
+    fresh.refresh()
+    assert index.chunk_count == fresh.chunk_count and index.total_length == fresh.total_length
+    assert index.postings == fresh.postings
@@ -0,0 +1,28 @@
+import gc
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine.state_store import WorkflowStateStore
+
+
+def test_exited_threads_release_their_connections(tmp_path):
+    store = WorkflowStateStore(str(tmp_path / 'workflows.db'))
+
+    def work(i):
+        store.create_workflow(f"T-{i}", current_step='requirements')
+        assert store.get_workflow(f"T-{i}")['status']
+
+    for i in range(50):
+        thread = threading.Thread(target=work, args=(i,))
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    # Only the creating thread's connection is still alive
+    assert len(store._connections) == 1
+    assert store.list_workflows(limit=100)['total'] == 50
+    store.close()
+    assert len(store._connections) == 0
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine.test_runner import TestRunner
+
+CODE = {'cart/totals.py': "def total(items):\n    return sum(items)\n"}
+
+PASSING = "from cart.totals import total\n\ndef test_total():\n    assert total([1, 2]) == 3\n"
+FAILING = "from cart.totals import total\n\ndef test_total():\n    assert total([1, 2]) == 4\n"
+HANGING = "import time\n\ndef test_hangs():\n    time.sleep(30)\n"
+
+
+def test_pass_and_fail_are_reported_and_cached(tmp_path):
+    cache_file = tmp_path / 'runs.json'
+    runner = TestRunner(cache_file, timeout_seconds=60)
+    tests = {'tests/test_pass.py': PASSING, 'tests/test_fail.py': FAILING}
+
+    report = runner.run(CODE, tests)
+    assert report['results']['tests/test_pass.py']['status'] == 'passed'
+    assert report['results']['tests/test_fail.py']['status'] == 'failed'
+    assert (report['passed'], report['failed']) == (1, 1)
+    assert not report['all_passed'] and report['cache_hits'] == 0
+
+    # A new runner serves both from the persisted cache
+    again = TestRunner(cache_file).run(CODE, tests)
+    assert again['cache_hits'] == 2 and again['results']['tests/test_pass.py']['cached']
+
+    # Changing the code under test invalidates the cache
+    changed = TestRunner(cache_file).run({'cart/totals.py': "def total(items):\n    return 4\n"}, tests)
+    assert changed['cache_hits'] == 0
+    assert changed['results']['tests/test_fail.py']['status'] == 'passed'
+
+
+def test_timeout_is_reported_and_not_cached(tmp_path):
+    runner = TestRunner(tmp_path / 'runs.json', timeout_seconds=3)
+    tests = {'test_hang.py': HANGING}
+
+    report = runner.run(CODE, tests)
+    result = report['results']['test_hang.py']
+    assert result['status'] == 'timeout' and result['errors'] == 1
+    assert not report['all_passed']
+    assert runner.run(CODE, tests)['cache_hits'] == 0
+
+
+def test_unsafe_and_non_python_test_files_are_not_executed():
+    report = TestRunner().run(CODE, {'../escape_test.py': PASSING, 'cart.test.ts': "it('x', () => {})"})
+    assert {r['status'] for r in report['results'].values()} == {'unsupported'}
@@ -0,0 +1,2 @@
+# Shared Utilities Package
+
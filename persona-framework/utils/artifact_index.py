@@ -0,0 +1,328 @@
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import threading
+
+# Generated metadata appended to artifacts (persona, version, generation date).
+# It describes the run rather than the content, so excerpts leave it out.
+METADATA_SECTIONS = ("AI Generation Footprint",)
+
+
+@dataclass
+class Section:
+    """A markdown heading and the span of text it owns (including subsections)"""
+    title: str
+    level: int
+    path: Tuple[str, ...]
+    start: int          # offset of the heading line
+    body_start: int     # offset just after the heading line
+    end: int            # offset where the next heading of the same or higher level begins
+    word_count: int = 0
+    children: List["Section"] = field(default_factory=list)
+
+    @property
+    def heading_path(self) -> str:
+        return " > ".join(self.path)
+
+
+class ArtifactIndex:
+    """
+    Parsed section tree of a markdown artifact.
+
+    Built in a single pass over the text so that validators, extractors and
+    prompt packing can share one representation instead of each re-scanning
+    the raw string.
+    """
+
+    def __init__(self, text: str, text_hash: Optional[str] = None):
+        self.text = text
+        self.content_hash = text_hash or content_hash(text)
+        self.lower = text.lower()
+        self.sections: List[Section] = []
+        self.roots: List[Section] = []
+        self.code_languages: List[str] = []
+        self.word_count = 0
+        self._by_title: Dict[str, List[Section]] = {}
+        self._term_cache: Dict[Tuple[str, bool], bool] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        """Walk the text once, collecting headings, code fences and word counts"""
+        stack: List[Section] = []
+        in_fence = False
+        offset = 0
+        preamble_words = 0
+
+        for line in self.text.splitlines(keepends=True):
+            stripped = line.strip()
+            words = len(line.split())
+            self.word_count += words
+
+            if stripped.startswith('```'):
+                if not in_fence:
+                    self.code_languages.append(stripped[3:].strip().lower())
+                in_fence = not in_fence
+            elif not in_fence and stripped.startswith('#'):
+                level = len(stripped) - len(stripped.lstrip('#'))
+                title = stripped[level:].strip()
+                if level <= 6 and title and stripped[level:level + 1] in (' ', '\t'):
+                    while stack and stack[-1].level >= level:
+                        stack.pop().end = offset
+                    section = Section(
+                        title=title,
+                        level=level,
+                        path=tuple(s.title for s in stack) + (title,),
+                        start=offset,
+                        body_start=offset + len(line),
+                        end=len(self.text),
+                    )
+                    if stack:
+                        stack[-1].children.append(section)
+                    else:
+                        self.roots.append(section)
+                    self.sections.append(section)
+                    self._by_title.setdefault(title.lower(), []).append(section)
+                    stack.append(section)
+                    offset += len(line)
+                    continue
+
+            # Words belong to every open section (a section spans its subsections)
+            if stack:
+                for open_section in stack:
+                    open_section.word_count += words
+            else:
+                preamble_words += words
+            offset += len(line)
+
+        for open_section in stack:
+            open_section.end = len(self.text)
+        self.preamble_word_count = preamble_words
+        self.content_end = self._content_end()
+
+    def _content_end(self) -> int:
+        """Offset where trailing generated metadata (and its --- separator) begins"""
+        end = len(self.text)
+        for title in METADATA_SECTIONS:
+            section = self.get_section(title)
+            if section is not None and section.start < end:
+                end = section.start
+        if end == len(self.text):
+            return end
+        content = self.text[:end].rstrip()
+        if content.endswith('---'):
+            content = content[:-3].rstrip()
+        return len(content)
+
+    # ---- Lookups ----
+
+    def contains(self, term: str, case_sensitive: bool = False) -> bool:
+        """Substring check against the cached (lowercased) text, memoised per term"""
+        key = (term, case_sensitive)
+        found = self._term_cache.get(key)
+        if found is None:
+            found = term in self.text if case_sensitive else term.lower() in self.lower
+            self._term_cache[key] = found
+        return found
+
+    def contains_any(self, terms: Iterable[str], case_sensitive: bool = False) -> bool:
+        return any(self.contains(term, case_sensitive) for term in terms)
+
+    def has_code_block(self, language: Optional[str] = None) -> bool:
+        if language is None:
+            return bool(self.code_languages)
+        return language.lower() in self.code_languages
+
+    def heading_paths(self) -> List[str]:
+        return [s.heading_path for s in self.sections]
+
+    def find_sections(self, title_prefix: str, levels: Optional[Iterable[int]] = None) -> List[Section]:
+        """Return sections whose title starts with title_prefix (case-insensitive)"""
+        prefix = title_prefix.lower()
+        allowed = set(levels) if levels is not None else None
+        return [
+            s for s in self.sections
+            if s.title.lower().startswith(prefix) and (allowed is None or s.level in allowed)
+        ]
+
+    def get_section(self, title: str) -> Optional[Section]:
+        """Return the first section with an exact (case-insensitive) title match"""
+        matches = self._by_title.get(title.lower())
+        return matches[0] if matches else None
+
+    def has_section(self, title: str) -> bool:
+        return self.get_section(title) is not None
+
+    def section_text(self, section: Section, include_heading: bool = False) -> str:
+        start = section.start if include_heading else section.body_start
+        return self.text[start:section.end]
+
+    def field_value(self, section: Section, label: str) -> Optional[str]:
+        """Return the value of a `**Label**: value` line inside a section"""
+        marker = f"**{label}**:"
+        body = self.text[section.body_start:section.end]
+        pos = body.find(marker)
+        if pos == -1:
+            return None
+        line_end = body.find('\n', pos)
+        if line_end == -1:
+            line_end = len(body)
+        return body[pos + len(marker):line_end].strip()
+
+    # ---- Prompt packing ----
+
+    def excerpt(self, max_chars: int) -> str:
+        """
+        Return an excerpt of at most max_chars that keeps the document outline.
+
+        Every top-level section contributes its heading and a share of its
+        leading text, so downstream prompts see the whole structure instead of
+        just the first max_chars characters. Generated metadata (the AI
+        Generation Footprint) is left out: it changes on every run, and would
+        make otherwise identical downstream prompts differ.
+        """
+        content_end = self.content_end
+        if content_end <= max_chars:
+            return self.text[:content_end]
+
+        # Skip single-child wrappers such as a lone "# Title" heading
+        units = [s for s in self.roots if s.start < content_end]
+        while len(units) == 1 and units[0].children:
+            children = [s for s in units[0].children if s.start < content_end]
+            if not children:
+                break
+            units = children
+        if not units:
+            return self.text[:max_chars]
+
+        preamble = self.text[:units[0].start].strip()
+        parts: List[str] = []
+        budget = max_chars
+        if preamble:
+            head = preamble[:max_chars // 4]
+            parts.append(head)
+            budget -= len(head) + 2
+
+        headings = [self.text[s.start:s.body_start].strip() for s in units]
+        budget -= sum(len(h) + 2 for h in headings)
+        share = max(0, budget // len(units))
+
+        for section, heading in zip(units, headings):
+            body = self.text[section.body_start:min(section.end, content_end)].strip()
+            chunk = heading if share == 0 else f"{heading}\n{body[:share]}".rstrip()
+            parts.append(chunk)
+
+        return "\n\n".join(parts)[:max_chars]
+
+    def chunks(self, max_chars: int) -> List[Dict[str, str]]:
+        """
+        Split the document on section boundaries into chunks of at most max_chars.
+
+        Sections that fit are kept whole and packed together in document order;
+        larger sections are split at their subsections, then at paragraphs.
+        Each chunk records the heading path it starts in.
+
+        Returns:
+            List of {'heading_path': ..., 'text': ...}
+        """
+        units: List[Tuple[str, str]] = []
+
+        def add_span(path: str, start: int, end: int) -> None:
+            text = self.text[start:end]
+            if not text.strip():
+                return
+            if len(text) <= max_chars:
+                units.append((path, text))
+                return
+            # Oversized leaf text: split at blank lines, then hard-split long paragraphs
+            for paragraph in _split_paragraphs(text):
+                for i in range(0, len(paragraph), max_chars):
+                    units.append((path, paragraph[i:i + max_chars]))
+
+        def add_section(section: Section) -> None:
+            if section.end - section.start <= max_chars or not section.children:
+                add_span(section.heading_path, section.start, section.end)
+                return
+            add_span(section.heading_path, section.start, section.children[0].start)
+            for child in section.children:
+                add_section(child)
+
+        add_span("", 0, self.roots[0].start if self.roots else len(self.text))
+        for root in self.roots:
+            add_section(root)
+
+        chunks: List[Dict[str, str]] = []
+        for path, text in units:
+            if chunks and len(chunks[-1]['text']) + len(text) <= max_chars:
+                chunks[-1]['text'] += text
+            else:
+                chunks.append({'heading_path': path, 'text': text})
+        return chunks
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "content_hash": self.content_hash,
+            "word_count": self.word_count,
+            "section_count": len(self.sections),
+            "code_blocks": len(self.code_languages),
+            "heading_paths": self.heading_paths(),
+        }
+
+
+def _split_paragraphs(text: str) -> List[str]:
+    """Split text after blank lines, keeping the separators with the preceding paragraph"""
+    paragraphs: List[str] = []
+    current: List[str] = []
+    for line in text.splitlines(keepends=True):
+        current.append(line)
+        if not line.strip():
+            paragraphs.append("".join(current))
+            current = []
+    if current:
+        paragraphs.append("".join(current))
+    return paragraphs
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+_INDEX_CACHE: "OrderedDict[str, ArtifactIndex]" = OrderedDict()
+_INDEX_CACHE_SIZE = 64
+_INDEX_LOCK = threading.Lock()
+
+
+def get_artifact_index(text: str) -> ArtifactIndex:
+    """
+    Return the ArtifactIndex for text, memoised by content hash.
+
+    Artifacts are passed between several stages (validation, extraction,
+    downstream prompts), so the same document is usually indexed once and then
+    served from the cache.
+    """
+    # Fast path: the same string object is usually passed straight through
+    # from one consumer to the next, so skip re-hashing it
+    with _INDEX_LOCK:
+        for index in reversed(_INDEX_CACHE.values()):
+            if index.text is text:
+                return index
+
+    key = content_hash(text)
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(key)
+            return index
+
+    index = ArtifactIndex(text, key)
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = index
+        _INDEX_CACHE.move_to_end(key)
+        while len(_INDEX_CACHE) > _INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+    return index
+
+
+def clear_artifact_index_cache() -> None:
+    with _INDEX_LOCK:
+        _INDEX_CACHE.clear()
@@ -0,0 +1,144 @@
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+CANCEL_POLL_SECONDS = 0.1
+
+
+class WorkflowCancelled(Exception):
+    """The workflow was cancelled or ran past a deadline; nothing more should be spent on it"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class DeadlineExceeded(WorkflowCancelled):
+    pass
+
+
+class WorkflowBudget:
+    """
+    Latency and cost budget for one workflow run.
+
+    The model router reads the remaining budget to pick a model per call, and
+    every live call charges its estimated cost against it. The budget is also
+    the run's cancellation token: once cancelled (or past its deadline), model
+    calls, limiter waits and retry sleeps raise WorkflowCancelled.
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None, cost_budget_usd: Optional[float] = None):
+        self.started_at = time.monotonic()
+        self.deadline_seconds = deadline_seconds
+        self.cost_budget_usd = cost_budget_usd
+        self.spent_usd = 0.0
+        self.cancel_reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.deadline_seconds is None:
+            return None
+        return self.deadline_seconds - (time.monotonic() - self.started_at)
+
+    def remaining_usd(self) -> Optional[float]:
+        if self.cost_budget_usd is None:
+            return None
+        with self._lock:
+            return self.cost_budget_usd - self.spent_usd
+
+    def charge(self, cost_usd: float) -> None:
+        with self._lock:
+            self.spent_usd += cost_usd
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._cancelled.is_set():
+            self.cancel_reason = reason
+            self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self) -> None:
+        """Raise WorkflowCancelled if the run was cancelled or its deadline has passed"""
+        if self._cancelled.is_set():
+            raise WorkflowCancelled(f"Workflow cancelled: {self.cancel_reason}")
+        remaining = self.remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Workflow exceeded its {self.deadline_seconds:g}s deadline")
+
+    def snapshot(self) -> Dict[str, Any]:
+        remaining_seconds = self.remaining_seconds()
+        remaining_usd = self.remaining_usd()
+        return {
+            'elapsed_seconds': round(time.monotonic() - self.started_at, 3),
+            'deadline_seconds': self.deadline_seconds,
+            'remaining_seconds': round(remaining_seconds, 3) if remaining_seconds is not None else None,
+            'cost_budget_usd': self.cost_budget_usd,
+            'spent_usd': round(self.spent_usd, 6),
+            'remaining_usd': round(remaining_usd, 6) if remaining_usd is not None else None,
+            'cancelled': self.cancel_reason,
+        }
+
+
+_active_budget: ContextVar[Optional[WorkflowBudget]] = ContextVar('active_budget', default=None)
+# (stage name, deadline seconds, monotonic expiry) of the stage running in this context
+_stage_deadline: ContextVar[Optional[tuple]] = ContextVar('stage_deadline', default=None)
+
+
+def get_active_budget() -> Optional[WorkflowBudget]:
+    return _active_budget.get()
+
+
+@contextmanager
+def use_budget(budget: Optional[WorkflowBudget]):
+    """Make budget active for all persona calls in the current context"""
+    token = _active_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _active_budget.reset(token)
+
+
+@contextmanager
+def use_stage_deadline(stage: str, seconds: Optional[float]):
+    """Bound the calls made in the current context by a per-stage deadline"""
+    if seconds is None:
+        yield
+        return
+    token = _stage_deadline.set((stage, seconds, time.monotonic() + seconds))
+    try:
+        yield
+    finally:
+        _stage_deadline.reset(token)
+
+
+def check_cancelled() -> None:
+    """Raise WorkflowCancelled if the active workflow was cancelled or a deadline passed"""
+    budget = _active_budget.get()
+    if budget:
+        budget.check()
+    stage_deadline = _stage_deadline.get()
+    if stage_deadline and time.monotonic() >= stage_deadline[2]:
+        raise DeadlineExceeded(f"Stage {stage_deadline[0]} exceeded its {stage_deadline[1]:g}s deadline")
+
+
+def cancellable_sleep(seconds: float) -> None:
+    """time.sleep that wakes up (and raises) as soon as the active workflow is cancelled"""
+    budget = _active_budget.get()
+    if budget is None and _stage_deadline.get() is None:
+        time.sleep(seconds)
+        return
+    end = time.monotonic() + seconds
+    while True:
+        check_cancelled()
+        left = end - time.monotonic()
+        if left <= 0:
+            return
+        if budget:
+            budget._cancelled.wait(min(left, 1.0))
+        else:
+            time.sleep(min(left, 1.0))
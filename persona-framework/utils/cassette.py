@@ -0,0 +1,147 @@
+from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Values that differ between otherwise identical runs (generation dates in
+# upstream artifacts, recorded durations); masked before a prompt is keyed
+VOLATILE_PATTERNS = (
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<timestamp>"),
+    # Measured durations are fractional ("1.42s"); whole numbers in requirements are kept
+    (re.compile(r"\b\d+\.\d+\s?(?:ms|s|seconds)\b"), "<duration>"),
+)
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a prompt was never recorded"""
+
+
+class CassetteReplayError(RuntimeError):
+    """Re-raises an error that was recorded for a call, with the original message"""
+
+
+class CassetteResponse:
+    """Minimal stand-in for a Gemini response served from a cassette"""
+
+    def __init__(self, text: str, model_name: Optional[str] = None, finish_reason: Optional[str] = None):
+        self.text = text
+        self.model_name = model_name
+        self.finish_reason = finish_reason
+        self.candidates = []
+
+
+class Cassette:
+    """
+    On-disk record of persona LLM calls for one workflow.
+
+    In record mode every prompt, generation config, response text (or error)
+    and latency is appended to a gzipped JSON-lines file. In replay mode the
+    same calls are served from that file, optionally sleeping for the
+    recorded latency, so whole workflows can be re-run offline.
+    """
+
+    def __init__(self, path: Path, mode: str = RECORD, replay_latency: bool = False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.calls = 0
+
+        if mode == REPLAY:
+            if not self.path.exists():
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # Re-key from the recorded prompt so older recordings follow call_key changes
+                        key = self.call_key(entry['prompt'], entry['config'])
+                        self._entries.setdefault(key, []).append(entry)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Start a fresh recording for this run
+            with gzip.open(self.path, 'wt', encoding='utf-8'):
+                pass
+
+    @staticmethod
+    def call_key(prompt: Any, generation_config: Optional[Dict[str, Any]]) -> str:
+        """Hash of prompt and config, with timestamps and durations masked so reruns match"""
+        payload = json.dumps({'prompt': prompt, 'config': generation_config}, sort_keys=True, default=str)
+        for pattern, placeholder in VOLATILE_PATTERNS:
+            payload = pattern.sub(placeholder, payload)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def record(
+        self,
+        prompt: Any,
+        generation_config: Optional[Dict[str, Any]],
+        model_name: str,
+        latency_seconds: float,
+        text: Optional[str] = None,
+        error: Optional[str] = None,
+        finish_reason: Optional[str] = None
+    ) -> None:
+        entry = {
+            'key': self.call_key(prompt, generation_config),
+            'model': model_name,
+            'prompt': prompt,
+            'config': generation_config,
+            'latency_seconds': round(latency_seconds, 4),
+            'text': text,
+            'error': error,
+            'finish_reason': finish_reason,
+        }
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            # Append a new gzip member per call so a crash keeps earlier calls
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+            self.calls += 1
+
+    def replay(self, prompt: Any, generation_config: Optional[Dict[str, Any]]) -> CassetteResponse:
+        key = self.call_key(prompt, generation_config)
+        with self._lock:
+            entries = self._entries.get(key)
+            position = self._cursor.get(key, 0)
+            if not entries:
+                raise CassetteMissError(f"No recorded response for prompt (key {key[:12]}) in {self.path}")
+            # Repeated identical prompts replay in recorded order, then stick to the last one
+            entry = entries[min(position, len(entries) - 1)]
+            self._cursor[key] = position + 1
+            self.calls += 1
+
+        if self.replay_latency and entry.get('latency_seconds'):
+            time.sleep(entry['latency_seconds'])
+        if entry.get('error'):
+            raise CassetteReplayError(entry['error'])
+        return CassetteResponse(entry['text'], entry.get('model'), entry.get('finish_reason'))
+
+
+_active_cassette: ContextVar[Optional[Cassette]] = ContextVar('active_cassette', default=None)
+
+
+def get_active_cassette() -> Optional[Cassette]:
+    return _active_cassette.get()
+
+
+@contextmanager
+def use_cassette(cassette: Optional[Cassette]):
+    """Make cassette active for all persona calls in the current context"""
+    token = _active_cassette.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active_cassette.reset(token)
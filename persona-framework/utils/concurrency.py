@@ -0,0 +1,166 @@
+from typing import Dict, Any, Optional, Callable
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+from utils.budget import WorkflowCancelled, CANCEL_POLL_SECONDS
+
+THROTTLE_MARKERS = ("429", "503", "504", "resource exhausted", "resource_exhausted", "quota",
+                    "overloaded", "unavailable", "timeout", "timed out", "deadline")
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for errors that signal the backend is saturated (rate limit, overload, timeout)"""
+    if isinstance(error, WorkflowCancelled):
+        return False
+    error_str = str(error).lower()
+    return isinstance(error, TimeoutError) or any(marker in error_str for marker in THROTTLE_MARKERS)
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit using additive-increase / multiplicative-decrease.
+
+    Each healthy response (no error, latency under target) grows the limit by
+    roughly one slot per window of successful requests, but only while the
+    limit is actually in use (all slots taken or callers waiting): light
+    traffic proves nothing about a higher limit, and growing it anyway would
+    let the next burst through at full width. A throttle signal
+    (429, 503, timeout) cuts it by decrease_factor. Only one cut is applied
+    per window of in-flight requests, so a burst of failures from requests
+    that were already running does not collapse the limit to the floor.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_target_seconds: float = 60.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_target_seconds = latency_target_seconds
+
+        self.in_flight = 0
+        self._waiters = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._stats = {'successes': 0, 'throttles': 0, 'errors': 0, 'cancelled': 0, 'decreases': 0,
+                       'wait_seconds': 0.0}
+        self._latency_ewma: Optional[float] = None
+
+    def acquire(self, timeout: Optional[float] = None, abort: Optional[Callable[[], None]] = None) -> float:
+        """
+        Block until a slot is free. Returns the acquisition timestamp.
+
+        abort is polled while waiting; if it raises, the wait is abandoned.
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            self._waiters += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for an LLM concurrency slot")
+                    if abort:
+                        abort()
+                        remaining = CANCEL_POLL_SECONDS if remaining is None else min(remaining, CANCEL_POLL_SECONDS)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+            self.in_flight += 1
+            acquired = time.monotonic()
+            self._stats['wait_seconds'] += acquired - started
+            return acquired
+
+    def release(self, acquired_at: float, outcome: str) -> None:
+        """
+        Release a slot and adapt the limit.
+
+        Args:
+            acquired_at: Timestamp returned by acquire()
+            outcome: "success", "throttle", "error" or "cancelled" (errors and
+                cancellations do not adapt)
+        """
+        now = time.monotonic()
+        latency = now - acquired_at
+        with self._cond:
+            saturated = self.in_flight >= int(self.limit) or self._waiters > 0
+            self.in_flight -= 1
+            if outcome == 'success':
+                self._stats['successes'] += 1
+                self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+                if latency <= self.latency_target_seconds:
+                    if saturated:
+                        self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+                else:
+                    self._decrease(acquired_at, now)
+            elif outcome == 'throttle':
+                self._stats['throttles'] += 1
+                self._decrease(acquired_at, now)
+            elif outcome == 'cancelled':
+                self._stats['cancelled'] += 1
+            else:
+                self._stats['errors'] += 1
+            self._cond.notify_all()
+
+    def _decrease(self, acquired_at: float, now: float) -> None:
+        # Requests that started before the last cut were sent under the old limit
+        if acquired_at < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self._last_decrease = now
+        self._stats['decreases'] += 1
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None, abort: Optional[Callable[[], None]] = None):
+        """Hold a slot for the duration of one model call, classifying the outcome"""
+        acquired_at = self.acquire(timeout, abort)
+        try:
+            yield
+        except WorkflowCancelled:
+            self.release(acquired_at, 'cancelled')
+            raise
+        except Exception as e:
+            self.release(acquired_at, 'throttle' if is_throttle_error(e) else 'error')
+            raise
+        else:
+            self.release(acquired_at, 'success')
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'effective_limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'waiting': self._waiters,
+                'latency_ewma_seconds': round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self._stats.items()},
+            }
+
+
+_llm_limiter: Optional[AIMDLimiter] = None
+_llm_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter() -> AIMDLimiter:
+    """Process-wide limiter shared by all personas"""
+    global _llm_limiter
+    with _llm_limiter_lock:
+        if _llm_limiter is None:
+            _llm_limiter = AIMDLimiter(
+                initial_limit=float(os.getenv('LLM_CONCURRENCY_INITIAL', '4')),
+                min_limit=float(os.getenv('LLM_CONCURRENCY_MIN', '1')),
+                max_limit=float(os.getenv('LLM_CONCURRENCY_MAX', '32')),
+                latency_target_seconds=float(os.getenv('LLM_LATENCY_TARGET_SECONDS', '60')),
+            )
+        return _llm_limiter
@@ -0,0 +1,128 @@
+from typing import Dict, Any, List, Optional
+import os
+import threading
+
+TRUNCATED_FINISH_REASONS = ("MAX_TOKENS", "2")
+
+CONTINUE_INSTRUCTION = """Your previous response was cut off because it hit the output length limit.
+Continue EXACTLY where it stopped:
+- Do not repeat any text that was already written
+- Do not add a preamble, summary or apology
+- If it stopped inside a code block, continue the code directly without opening a new ``` fence
+- If it stopped mid-word or mid-line, continue from the next character"""
+
+# Minimum length of a repeated suffix/prefix before it is treated as overlap
+MIN_OVERLAP_CHARS = 8
+MAX_OVERLAP_CHARS = 500
+
+
+def is_truncated(reason: Optional[str]) -> bool:
+    """True if a finish reason means the output hit max_output_tokens"""
+    return reason is not None and str(reason).upper().rsplit('.', 1)[-1] in TRUNCATED_FINISH_REASONS
+
+
+def open_fence(text: str) -> Optional[str]:
+    """Return the opening line of an unclosed ``` fence at the end of text, or None"""
+    fence = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            fence = None if fence is not None else stripped
+    return fence
+
+
+def continuation_prompt(prompt: Any, output: str) -> List[Dict[str, Any]]:
+    """Multi-turn prompt that replays the partial output and asks the model to resume"""
+    return [
+        {'role': 'user', 'parts': [prompt if isinstance(prompt, str) else str(prompt)]},
+        {'role': 'model', 'parts': [output]},
+        {'role': 'user', 'parts': [CONTINUE_INSTRUCTION]},
+    ]
+
+
+def stitch(output: str, continuation: str) -> str:
+    """
+    Append a continuation to truncated output, removing text the model
+    repeated and a code fence it re-opened.
+
+    Args:
+        output: Output accumulated so far (ends where the model stopped)
+        continuation: Next response from the model
+
+    Returns:
+        Combined output
+    """
+    if not continuation:
+        return output
+
+    # Drop a re-opened fence when the truncation happened inside a code block
+    if open_fence(output) is not None:
+        first_line, _, rest = continuation.lstrip('\n').partition('\n')
+        if first_line.strip().startswith("```") and first_line.strip() != "```":
+            continuation = rest
+
+    # Exact overlap: continuation starts with the tail of the output
+    for size in range(min(len(output), len(continuation), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if output.endswith(continuation[:size]):
+            return output + continuation[size:]
+
+    # Restated line: the model rewrote the partial last line from its start.
+    # A continuation that opens a new line, or a short last line (a lone
+    # brace, a list marker), is new text that only looks like a restatement.
+    head, newline, last_line = output.rpartition('\n')
+    restated = last_line.strip()
+    if len(restated) >= MIN_OVERLAP_CHARS and not continuation.startswith('\n') \
+            and continuation.lstrip().startswith(restated):
+        indent = last_line[:len(last_line) - len(last_line.lstrip())]
+        return head + newline + indent + continuation.lstrip()
+
+    return output + continuation
+
+
+def close_fence(output: str) -> str:
+    """Close a dangling ``` fence so downstream extractors still find the block"""
+    if open_fence(output) is None:
+        return output
+    return output + ("" if output.endswith('\n') else "\n") + "```\n"
+
+
+class ContinuationStats:
+    """Process-wide counters for truncated responses and continuation rounds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'responses': 0,
+            'truncated_responses': 0,
+            'continuation_calls': 0,
+            'completed_after_continuation': 0,
+            'still_truncated_at_cap': 0,
+            'continued_chars': 0,
+        }
+        self._rounds: Dict[int, int] = {}
+
+    def record(self, rounds: int, completed: bool, continued_chars: int) -> None:
+        """Record one response; rounds is 0 unless it was truncated"""
+        with self._lock:
+            self._stats['responses'] += 1
+            if rounds or not completed:
+                self._stats['truncated_responses'] += 1
+                self._stats['continuation_calls'] += rounds
+                self._stats['continued_chars'] += continued_chars
+                self._stats['completed_after_continuation' if completed else 'still_truncated_at_cap'] += 1
+                self._rounds[rounds] = self._rounds.get(rounds, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'rounds': {str(k): v for k, v in sorted(self._rounds.items())}}
+
+
+_stats = ContinuationStats()
+
+
+def get_continuation_stats() -> ContinuationStats:
+    return _stats
+
+
+def max_continuations() -> int:
+    return int(os.getenv('LLM_MAX_CONTINUATIONS', '3'))
@@ -0,0 +1,272 @@
+from typing import Dict, Any, Optional, Callable, Tuple
+import contextvars
+import threading
+import time
+
+from utils.cassette import get_active_cassette, REPLAY
+from utils.concurrency import get_llm_limiter
+from utils.model_router import get_model_router, estimate_tokens
+from utils.tracing import span
+from utils.budget import get_active_budget, check_cancelled, WorkflowCancelled, CANCEL_POLL_SECONDS
+from utils.continuation import (
+    is_truncated, continuation_prompt, stitch, close_fence, get_continuation_stats, max_continuations
+)
+
+
+def _is_overloaded(error: Exception) -> bool:
+    error_str = str(error).lower()
+    return "503" in str(error) or "overloaded" in error_str or "unavailable" in error_str
+
+
+def model_name(model) -> str:
+    return getattr(model, 'model_name', None) or repr(model)
+
+
+def response_text(response) -> str:
+    """Return response text, concatenating parts for multi-part responses"""
+    try:
+        return response.text
+    except ValueError:
+        # Response has multiple parts, concatenate them
+        content = ""
+        for candidate in response.candidates:
+            for part in candidate.content.parts:
+                if hasattr(part, 'text'):
+                    content += part.text
+        return content
+
+
+def finish_reason(response) -> Optional[str]:
+    """Name of the first candidate's finish reason (e.g. STOP, MAX_TOKENS), if known"""
+    if getattr(response, 'finish_reason', None):
+        return response.finish_reason
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return getattr(reason, 'name', None) or str(reason)
+
+
+def _run_cancellable(call: Callable[[], Any]) -> Any:
+    """
+    Run a blocking call, abandoning it as soon as the active workflow is
+    cancelled or a deadline passes. The SDK call cannot be interrupted, so it
+    finishes on a daemon thread and its result is discarded.
+    """
+    if get_active_budget() is None:
+        return call()
+    done = threading.Event()
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = call()
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=contextvars.copy_context().run, args=(target,), daemon=True).start()
+    while not done.wait(CANCEL_POLL_SECONDS):
+        check_cancelled()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+def _call_model(model, prompt: Any, kwargs: Dict[str, Any], stage: Optional[str], route_reason: str,
+                attempt: int = 1):
+    """One live model call under the concurrency limiter, recorded in routing stats and the trace"""
+    router = get_model_router() if stage else None
+    check_cancelled()
+    prompt_tokens = estimate_tokens(prompt)
+    with span(f"llm {model_name(model)}", 'llm', stage=stage, model=model_name(model), route=route_reason,
+              attempt=attempt, prompt_tokens=prompt_tokens) as call_span:
+        started = time.perf_counter()
+        try:
+            with get_llm_limiter().slot(abort=check_cancelled):
+                call_span.set(queue_wait_ms=round((time.perf_counter() - started) * 1000, 1))
+                response = _run_cancellable(lambda: model.generate_content(prompt, **kwargs))
+        except WorkflowCancelled:
+            raise
+        except Exception:
+            if router:
+                router.record(stage, model_name(model), route_reason, time.perf_counter() - started,
+                              prompt_tokens, 0, success=False)
+            raise
+
+        output_tokens = estimate_tokens(response_text(response))
+        call_span.set(output_tokens=output_tokens, finish_reason=finish_reason(response))
+        if router:
+            cost = router.record(stage, model_name(model), route_reason, time.perf_counter() - started,
+                                 prompt_tokens, output_tokens, success=True)
+            call_span.set(cost_usd=round(cost, 6))
+            budget = get_active_budget()
+            if budget:
+                budget.charge(cost)
+    return response
+
+
+def _resolve_model(router, name: Optional[str], *known):
+    """Reuse a persona's own model object when it matches the routed name"""
+    if name is None:
+        return None
+    for candidate in known:
+        if candidate is not None and model_name(candidate) == name:
+            return candidate
+    return router.model(name)
+
+
+def generate_content(
+    model,
+    fallback_model,
+    prompt: Any,
+    generation_config: Optional[Dict[str, Any]] = None,
+    stage: Optional[str] = None,
+    route: Optional[Tuple[str, Optional[str], str]] = None
+):
+    """
+    Call model.generate_content, falling back to fallback_model if the primary
+    model is overloaded. Calls go through the active cassette, if any, so they
+    can be recorded or replayed, and each live call holds a slot of the shared
+    adaptive concurrency limiter.
+
+    When stage is given, the model router picks the primary/fallback models
+    for that stage (prompt size, remaining workflow budget, observed latency)
+    instead of the persona's defaults; route, a (primary, fallback, reason)
+    tuple from an earlier choice, skips the router.
+    """
+    cassette = get_active_cassette()
+    if cassette and cassette.mode == REPLAY:
+        with span("llm replay", 'llm', stage=stage):
+            return cassette.replay(prompt, generation_config)
+
+    route_reason = 'persona_default'
+    if stage:
+        router = get_model_router()
+        primary_name, fallback_name, route_reason = route or router.choose(
+            stage, prompt, generation_config, get_active_budget()
+        )
+        model, fallback_model = (
+            _resolve_model(router, primary_name, model, fallback_model),
+            _resolve_model(router, fallback_name, model, fallback_model),
+        )
+
+    kwargs = {'generation_config': generation_config} if generation_config is not None else {}
+    used_model = model
+    started = time.perf_counter()
+    try:
+        try:
+            response = _call_model(model, prompt, kwargs, stage, route_reason)
+        except Exception as e:
+            if not _is_overloaded(e) or fallback_model is None:
+                raise
+            print(f"   ⚠️  Primary model overloaded, trying fallback model ({model_name(fallback_model)})...")
+            used_model = fallback_model
+            response = _call_model(fallback_model, prompt, kwargs, stage, 'fallback', attempt=2)
+    except WorkflowCancelled:
+        raise
+    except Exception as e:
+        if cassette:
+            cassette.record(prompt, generation_config, model_name(used_model),
+                            time.perf_counter() - started, error=str(e))
+        raise
+
+    if cassette:
+        cassette.record(prompt, generation_config, model_name(used_model), time.perf_counter() - started,
+                        text=response_text(response), finish_reason=finish_reason(response))
+    return response
+
+
+def _usable(output: str, truncated: bool, accept: Optional[Callable[[str], bool]]) -> bool:
+    """False for an empty or still-truncated answer, or one accept rejects"""
+    if truncated or not output.strip():
+        return False
+    if accept is None:
+        return True
+    try:
+        return bool(accept(output))
+    except Exception:
+        return False
+
+
+def _generate_complete(
+    model,
+    fallback_model,
+    prompt: Any,
+    generation_config: Optional[Dict[str, Any]],
+    stage: Optional[str],
+    route: Optional[Tuple[str, Optional[str], str]],
+    max_rounds: int
+) -> Tuple[str, int, bool]:
+    """One answer plus its continuations; returns (output, rounds, still_truncated)"""
+    response = generate_content(model, fallback_model, prompt, generation_config, stage, route)
+    output = response_text(response)
+    initial_length = len(output)
+
+    rounds = 0
+    truncated = is_truncated(finish_reason(response))
+    while truncated and rounds < max_rounds:
+        check_cancelled()
+        rounds += 1
+        print(f"   ✂️  Response hit max_output_tokens, continuing ({rounds}/{max_rounds})...")
+        response = generate_content(model, fallback_model, continuation_prompt(prompt, output),
+                                    generation_config, stage, route)
+        output = stitch(output, response_text(response))
+        truncated = is_truncated(finish_reason(response))
+
+    get_continuation_stats().record(rounds, not truncated, len(output) - initial_length)
+    return output, rounds, truncated
+
+
+def generate_text(
+    model,
+    fallback_model,
+    prompt: Any,
+    generation_config: Optional[Dict[str, Any]] = None,
+    stage: Optional[str] = None,
+    max_rounds: Optional[int] = None,
+    accept: Optional[Callable[[str], bool]] = None
+) -> str:
+    """
+    Generate a complete text response, continuing it while the model stops
+    on max_output_tokens.
+
+    Each continuation replays the partial output as a model turn and asks the
+    model to resume; the pieces are stitched so repeated text and re-opened
+    code fences are dropped. After max_rounds continuations (default
+    LLM_MAX_CONTINUATIONS) any dangling code fence is closed.
+
+    When stage is given, the routed model is kept for every continuation. If
+    its answer is empty, still truncated or rejected by accept (typically the
+    persona's own validation), the call is repeated once on the stage's next
+    stronger model, so a light model never has the final say on a bad answer.
+
+    Returns:
+        Response text
+    """
+    max_rounds = max_continuations() if max_rounds is None else max_rounds
+    with span(f"generate {stage or 'text'}", 'llm', stage=stage) as text_span:
+        router = get_model_router() if stage else None
+        route = router.choose(stage, prompt, generation_config, get_active_budget()) if router else None
+        output, rounds, truncated = _generate_complete(
+            model, fallback_model, prompt, generation_config, stage, route, max_rounds
+        )
+
+        escalated_to = None
+        if route and not _usable(output, truncated, accept):
+            escalated_to = router.escalation(stage, route[0])
+            if escalated_to:
+                print(f"   ⚠️  Unusable answer from {route[0]}, retrying with {escalated_to}...")
+                output, rounds, truncated = _generate_complete(
+                    model, fallback_model, prompt, generation_config, stage,
+                    (escalated_to, None, 'escalated'), max_rounds
+                )
+
+        if truncated:
+            print(f"   ⚠️  Response still truncated after {rounds} continuation(s)")
+            output = close_fence(output)
+
+        text_span.set(continuations=rounds, truncated=truncated, output_chars=len(output),
+                      escalated_to=escalated_to)
+    return output
@@ -0,0 +1,175 @@
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+import json
+import os
+import threading
+
+STRONG_MODEL = 'models/gemini-2.5-flash'
+LIGHT_MODEL = 'models/gemini-1.5-flash'
+
+# USD per 1M tokens (input, output) - approximate list prices, override via MODEL_ROUTES_FILE
+DEFAULT_MODELS = {
+    STRONG_MODEL: {'input_per_million': 0.30, 'output_per_million': 2.50, 'expected_latency_seconds': 40.0},
+    LIGHT_MODEL: {'input_per_million': 0.075, 'output_per_million': 0.30, 'expected_latency_seconds': 15.0},
+}
+
+# Per stage: candidate models (preferred first) and the prompt size under which
+# the lighter model is good enough
+DEFAULT_ROUTES = {
+    'requirements': {'candidates': [STRONG_MODEL, LIGHT_MODEL], 'light_below_tokens': 1500},
+    'architecture': {'candidates': [STRONG_MODEL, LIGHT_MODEL], 'light_below_tokens': 0},
+    'planning': {'candidates': [STRONG_MODEL, LIGHT_MODEL], 'light_below_tokens': 1000},
+    'code_generation': {'candidates': [STRONG_MODEL, LIGHT_MODEL], 'light_below_tokens': 0},
+    'unit_tests': {'candidates': [STRONG_MODEL, LIGHT_MODEL], 'light_below_tokens': 2500},
+    'test_summary': {'candidates': [LIGHT_MODEL, STRONG_MODEL], 'light_below_tokens': 0},
+}
+
+
+def estimate_tokens(prompt: Any) -> int:
+    """Cheap token estimate (~4 characters per token) without a count_tokens round-trip"""
+    return max(1, len(prompt if isinstance(prompt, str) else str(prompt)) // 4)
+
+
+class ModelRouter:
+    """
+    Chooses a model for each persona call based on stage, prompt size, the
+    workflow's remaining latency/cost budget and observed per-model latency.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Any]] = None, models: Optional[Dict[str, Any]] = None):
+        self.routes = routes or DEFAULT_ROUTES
+        self.models = models or DEFAULT_MODELS
+        self._model_objects: Dict[str, Any] = {}
+        self._latency: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # ---- Routing ----
+
+    def expected_latency(self, model: str) -> float:
+        with self._lock:
+            observed = self._latency.get(model)
+        if observed is not None:
+            return observed
+        return self.models.get(model, {}).get('expected_latency_seconds', 30.0)
+
+    def estimate_cost(self, model: str, prompt_tokens: int, output_tokens: int) -> float:
+        prices = self.models.get(model, {})
+        return (prompt_tokens * prices.get('input_per_million', 0.0)
+                + output_tokens * prices.get('output_per_million', 0.0)) / 1_000_000
+
+    def choose(
+        self,
+        stage: str,
+        prompt: Any,
+        generation_config: Optional[Dict[str, Any]] = None,
+        budget=None
+    ) -> Tuple[str, Optional[str], str]:
+        """
+        Pick (primary_model, fallback_model, reason) for a call.
+        """
+        route = self.routes.get(stage)
+        if not route:
+            return STRONG_MODEL, LIGHT_MODEL, 'default'
+
+        candidates: List[str] = list(route['candidates'])
+        prompt_tokens = estimate_tokens(prompt)
+        output_tokens = (generation_config or {}).get('max_output_tokens', 2048)
+        light = min(candidates, key=lambda m: self.estimate_cost(m, prompt_tokens, output_tokens))
+
+        choice, reason = candidates[0], 'preferred'
+        if prompt_tokens < route.get('light_below_tokens', 0):
+            choice, reason = light, 'small_prompt'
+
+        if budget is not None:
+            remaining_seconds = budget.remaining_seconds()
+            if remaining_seconds is not None and self.expected_latency(choice) > remaining_seconds:
+                choice, reason = min(candidates, key=self.expected_latency), 'latency_budget'
+            remaining_usd = budget.remaining_usd()
+            if remaining_usd is not None and self.estimate_cost(choice, prompt_tokens, output_tokens) > remaining_usd:
+                choice, reason = light, 'cost_budget'
+
+        fallback = next((m for m in candidates if m != choice), None)
+        return choice, fallback, reason
+
+    def escalation(self, stage: str, model: str) -> Optional[str]:
+        """
+        Cheapest candidate of stage that costs more than model, to retry with
+        when model's answer is empty or invalid; None if model is the strongest.
+        """
+        route = self.routes.get(stage) or {'candidates': [STRONG_MODEL, LIGHT_MODEL]}
+        price = lambda m: self.estimate_cost(m, 1000, 1000)
+        stronger = [m for m in route['candidates'] if price(m) > price(model)]
+        return min(stronger, key=price) if stronger else None
+
+    def model(self, name: str):
+        """Cached GenerativeModel instance for name"""
+        with self._lock:
+            instance = self._model_objects.get(name)
+            if instance is None:
+                import google.generativeai as genai
+                instance = genai.GenerativeModel(name)
+                self._model_objects[name] = instance
+            return instance
+
+    # ---- Statistics ----
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        reason: str,
+        latency_seconds: float,
+        prompt_tokens: int,
+        output_tokens: int,
+        success: bool
+    ) -> float:
+        """Record one routed call; returns its estimated cost in USD"""
+        cost = self.estimate_cost(model, prompt_tokens, output_tokens) if success else 0.0
+        with self._lock:
+            if success:
+                previous = self._latency.get(model)
+                self._latency[model] = latency_seconds if previous is None else 0.8 * previous + 0.2 * latency_seconds
+            route = self._stats.setdefault(stage, {'calls': 0, 'failures': 0, 'cost_usd': 0.0, 'models': {}, 'reasons': {}})
+            route['calls'] += 1
+            route['failures'] += 0 if success else 1
+            route['cost_usd'] += cost
+            route['reasons'][reason] = route['reasons'].get(reason, 0) + 1
+            per_model = route['models'].setdefault(model, {'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'total_latency_seconds': 0.0})
+            per_model['calls'] += 1
+            per_model['prompt_tokens'] += prompt_tokens
+            per_model['output_tokens'] += output_tokens
+            per_model['total_latency_seconds'] += latency_seconds
+        return cost
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = json.loads(json.dumps(self._stats))
+            latency = dict(self._latency)
+        for route in routes.values():
+            route['cost_usd'] = round(route['cost_usd'], 6)
+            for stats in route['models'].values():
+                stats['avg_latency_seconds'] = round(stats.pop('total_latency_seconds') / max(stats['calls'], 1), 3)
+        return {
+            'routes': routes,
+            'observed_latency_seconds': {m: round(v, 3) for m, v in latency.items()},
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router; MODEL_ROUTES_FILE may point to a JSON {"routes", "models"} override"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            routes, models = None, None
+            config_file = os.getenv('MODEL_ROUTES_FILE')
+            if config_file and Path(config_file).exists():
+                config = json.loads(Path(config_file).read_text(encoding='utf-8'))
+                routes = {**DEFAULT_ROUTES, **config.get('routes', {})}
+                models = {**DEFAULT_MODELS, **config.get('models', {})}
+            _router = ModelRouter(routes, models)
+        return _router
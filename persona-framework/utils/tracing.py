@@ -0,0 +1,126 @@
+from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+TRACE_FILENAME = "trace.json"
+
+
+class Span:
+    """Attributes of an open span; set() adds attributes known only at the end (tokens, status)"""
+
+    def __init__(self, args: Dict[str, Any]):
+        self.args = args
+
+    def set(self, **attrs: Any) -> None:
+        self.args.update(attrs)
+
+
+class Tracer:
+    """
+    Collects the spans of one workflow run as Chrome trace events.
+
+    Each span becomes a complete ("X") event on the thread that ran it, so
+    stages that ran in parallel show up as separate tracks when the file is
+    opened in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self._origin = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return round((time.perf_counter() - self._origin) * 1e6, 1)
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            tid = self._threads.get(ident)
+            if tid is None:
+                tid = self._threads[ident] = len(self._threads) + 1
+                self._events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                    'args': {'name': threading.current_thread().name},
+                })
+            return tid
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args: Any):
+        """Record the enclosed block as a span; exceptions are recorded and re-raised"""
+        tid = self._tid()
+        span = Span(dict(args))
+        start = self._now_us()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}"[:300])
+            raise
+        finally:
+            event = {
+                'name': name, 'cat': cat, 'ph': 'X', 'pid': 1, 'tid': tid,
+                'ts': start, 'dur': round(self._now_us() - start, 1),
+                'args': {k: v for k, v in span.args.items() if v is not None},
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def instant(self, name: str, cat: str, **args: Any) -> None:
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'pid': 1, 'tid': self._tid(),
+                 'ts': self._now_us(), 'args': args}
+        with self._lock:
+            self._events.append(event)
+
+    def to_chrome(self, **metadata: Any) -> Dict[str, Any]:
+        with self._lock:
+            events = list(self._events)
+        events.insert(0, {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': self.name}})
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'started_at': self.started_at.isoformat(), **metadata},
+        }
+
+    def save(self, path: Path, **metadata: Any) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.to_chrome(**metadata), default=str), encoding='utf-8')
+        os.replace(tmp_path, path)
+        return path
+
+
+_active_tracer: ContextVar[Optional[Tracer]] = ContextVar('active_tracer', default=None)
+
+
+def get_active_tracer() -> Optional[Tracer]:
+    return _active_tracer.get()
+
+
+@contextmanager
+def use_tracer(tracer: Optional[Tracer]):
+    """Make tracer collect the spans emitted in the current context"""
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+
+@contextmanager
+def span(name: str, cat: str, **args: Any):
+    """Span on the active tracer; a no-op (still yielding a Span) when no workflow is traced"""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield Span(dict(args))
+        return
+    with tracer.span(name, cat, **args) as active:
+        yield active
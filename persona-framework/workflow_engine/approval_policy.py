@@ -0,0 +1,157 @@
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, field
+from pathlib import Path
+import difflib
+import json
+
+POLICIES_DIR = Path(__file__).parent / "policies"
+
+# Above this many lines, diffs fall back to comparing line sets
+MAX_DIFF_LINES = 20000
+
+
+def diff_ratio(previous: str, current: str) -> float:
+    """Fraction of lines changed between two versions (0.0 identical, 1.0 nothing shared)"""
+    if previous == current:
+        return 0.0
+    a, b = previous.splitlines(), current.splitlines()
+    if not a or not b:
+        return 1.0
+    if len(a) + len(b) > MAX_DIFF_LINES:
+        sa, sb = set(a), set(b)
+        return 1.0 - len(sa & sb) / len(sa | sb)
+    return 1.0 - difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+@dataclass
+class PolicyDecision:
+    auto_approve: bool
+    checks: Dict[str, bool] = field(default_factory=dict)
+    reasons: List[str] = field(default_factory=list)
+    policy: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'auto_approve': self.auto_approve,
+            'checks': self.checks,
+            'reasons': self.reasons,
+            'policy': self.policy,
+        }
+
+
+class ApprovalPolicy:
+    """
+    Rules that let low-risk gates approve themselves.
+
+    A policy lists, per stage, the conditions under which that stage's gate
+    is approved without a human. Every condition must hold; any failing or
+    unknown condition, and any stage without rules, goes to the normal
+    approval callback or console. Conditions read the gate's evidence:
+
+        validation_passed     stage validation (persona checks, code verification) passed
+        tests_passed          generated unit tests all passed in the sandbox
+        max_artifact_chars    artifact is at most this large
+        max_diff_ratio        at most this fraction of lines changed since the
+                              ticket's previously approved version of the artifact
+        require_prior_approval  a previously approved version exists
+        min_similarity        a completed workflow at least this similar exists
+        min_tasks / max_tasks   planned task count bounds
+    """
+
+    def __init__(self, name: str, stages: Dict[str, Dict[str, Any]]):
+        self.name = name
+        self.stages = stages
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ApprovalPolicy":
+        stages = data.get('stages', {})
+        for stage, rules in stages.items():
+            unknown = set(rules) - set(CONDITIONS)
+            if unknown:
+                raise ValueError(f"Approval policy {data.get('name')}: unknown conditions for {stage}: {sorted(unknown)}")
+        return cls(data.get('name', 'policy'), stages)
+
+    def evaluate(self, stage: str, evidence: Dict[str, Any]) -> PolicyDecision:
+        rules = self.stages.get(stage)
+        if not rules:
+            return PolicyDecision(False, reasons=[f"no auto-approval rules for {stage}"], policy=self.name)
+
+        checks, reasons = {}, []
+        for condition, expected in rules.items():
+            passed, reason = CONDITIONS[condition](expected, evidence)
+            checks[condition] = passed
+            if not passed:
+                reasons.append(reason)
+        return PolicyDecision(all(checks.values()), checks, reasons, self.name)
+
+
+def _validation_passed(expected: bool, evidence: Dict[str, Any]):
+    validation = evidence.get('validation')
+    if validation is None:
+        return not expected, "stage has no validation result"
+    passed = bool(validation.get('is_valid', validation.get('all_passed')))
+    return passed == expected, f"validation {'passed' if passed else 'failed'}"
+
+
+def _tests_passed(expected: bool, evidence: Dict[str, Any]):
+    tests = evidence.get('tests')
+    if tests is None:
+        return not expected, "no test results"
+    passed = bool(tests.get('all_passed')) and tests.get('passed', 0) > 0
+    return passed == expected, f"tests: {tests.get('passed', 0)} passed, {tests.get('failed', 0)} failed"
+
+
+def _max_artifact_chars(limit: int, evidence: Dict[str, Any]):
+    size = evidence.get('artifact_chars', 0)
+    return size <= limit, f"artifact is {size} chars (limit {limit})"
+
+
+def _max_diff_ratio(limit: float, evidence: Dict[str, Any]):
+    ratio = evidence.get('diff_ratio')
+    if ratio is None:
+        return False, "no previously approved version to diff against"
+    return ratio <= limit, f"{ratio:.0%} of lines changed since last approval (limit {limit:.0%})"
+
+
+def _require_prior_approval(expected: bool, evidence: Dict[str, Any]):
+    has_prior = evidence.get('diff_ratio') is not None
+    return has_prior == expected, "no previously approved version" if not has_prior else "previously approved"
+
+
+def _min_similarity(threshold: float, evidence: Dict[str, Any]):
+    similarity = evidence.get('similarity') or 0.0
+    return similarity >= threshold, f"closest approved workflow is {similarity:.0%} similar (need {threshold:.0%})"
+
+
+def _min_tasks(minimum: int, evidence: Dict[str, Any]):
+    tasks = evidence.get('tasks')
+    return tasks is not None and tasks >= minimum, f"{tasks} planned task(s) (min {minimum})"
+
+
+def _max_tasks(maximum: int, evidence: Dict[str, Any]):
+    tasks = evidence.get('tasks')
+    return tasks is not None and tasks <= maximum, f"{tasks} planned task(s) (max {maximum})"
+
+
+CONDITIONS = {
+    'validation_passed': _validation_passed,
+    'tests_passed': _tests_passed,
+    'max_artifact_chars': _max_artifact_chars,
+    'max_diff_ratio': _max_diff_ratio,
+    'require_prior_approval': _require_prior_approval,
+    'min_similarity': _min_similarity,
+    'min_tasks': _min_tasks,
+    'max_tasks': _max_tasks,
+}
+
+
+def load_policy(name_or_path: Optional[str]) -> Optional[ApprovalPolicy]:
+    """Load a policy by name (workflow_engine/policies/<name>.json) or path; None disables auto-approval"""
+    if not name_or_path or name_or_path.lower() == 'none':
+        return None
+    path = Path(name_or_path)
+    if not path.suffix:
+        path = POLICIES_DIR / f"{name_or_path}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Approval policy not found: {name_or_path}")
+    return ApprovalPolicy.from_dict(json.loads(path.read_text(encoding='utf-8')))
@@ -0,0 +1,107 @@
+from typing import Dict, Iterator, List, Tuple
+from pathlib import Path, PurePosixPath
+import os
+import zipfile
+
+CODE_DIR = "code"
+TESTS_DIR = "tests"
+COPY_CHUNK_BYTES = 64 * 1024
+
+
+def safe_relative_path(name: str) -> Path:
+    """
+    Relative path for a generated file name. Names come from model output,
+    so absolute paths, drive letters and '..' components are rejected.
+    """
+    parts = [p for p in PurePosixPath(name.replace('\\', '/')).parts if p not in ('', '.')]
+    if not parts or parts[0] == '/' or ':' in parts[0] or '..' in parts:
+        raise ValueError(f"Unsafe generated file path: {name!r}")
+    return Path(*parts)
+
+
+def write_files(root: Path, files: Dict[str, str]) -> List[Path]:
+    """
+    Materialise generated files under root, one real file per entry.
+    Each file is written to a temporary name and renamed, so readers never
+    see a partial file. Unsafe names are skipped with a warning.
+    """
+    written = []
+    for name, content in files.items():
+        try:
+            path = root / safe_relative_path(name)
+        except ValueError as e:
+            print(f"⚠️  {e}, not written")
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def list_files(root: Path, prefix: str = "") -> List[Tuple[str, Path]]:
+    """(archive name, path) of every file under root, in stable order"""
+    if not root.is_dir():
+        return []
+    return [
+        (str(PurePosixPath(prefix, path.relative_to(root).as_posix())), path)
+        for path in sorted(root.rglob('*'))
+        if path.is_file() and not path.name.endswith('.tmp')
+    ]
+
+
+class _ZipSink:
+    """Write-only, non-seekable file object that hands zip bytes to the caller as they are produced"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: List[Tuple[str, Path]], compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Stream a zip archive of entries ((archive name, path) pairs).
+
+    Files are read from disk in COPY_CHUNK_BYTES pieces and compressed bytes
+    are yielded as soon as they are produced, so memory stays flat however
+    large the archive is and the first bytes go out immediately.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode='w', compression=compression, allowZip64=True) as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compression
+            with open(path, 'rb') as source, archive.open(info, 'w', force_zip64=info.file_size > 2 ** 31) as target:
+                while True:
+                    chunk = source.read(COPY_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,300 @@
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import ast
+import hashlib
+import json
+import sys
+import threading
+
+PYTHON_EXTENSIONS = ('.py',)
+SCRIPT_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs')
+
+# Bump when a checker's verdicts change, to invalidate cached results
+CHECKER_VERSION = 2
+
+# Below this many uncached files a process pool costs more than it saves
+POOL_THRESHOLD = 8
+
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+
+# After these a '/' starts a regex literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await',
+}
+
+
+def _regex_allowed(code: str, i: int, jsx: bool = False) -> bool:
+    """Whether a '/' at i (not a comment) opens a regex literal, judged by the token before it"""
+    j = i - 1
+    while j >= 0 and code[j] in ' \t\r\n':
+        j -= 1
+    if j < 0:
+        return True
+    if code[j] in _REGEX_PRECEDERS:
+        # '</' closes a JSX element
+        return not (jsx and code[j] == '<')
+    end = j + 1
+    while j >= 0 and (code[j].isalnum() or code[j] in '_$'):
+        j -= 1
+    return code[j + 1:end] in _REGEX_KEYWORDS
+
+
+def _regex_end(code: str, i: int) -> int:
+    """Index just past the regex literal (and flags) opening at i, or -1 if it does not close on its line"""
+    j, n, in_class = i + 1, len(code), False
+    while j < n:
+        ch = code[j]
+        if ch == '\\':
+            j += 1
+        elif ch == '\n':
+            return -1
+        elif ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            j += 1
+            while j < n and (code[j].isalnum() or code[j] in '_$'):
+                j += 1
+            return j
+        j += 1
+    return -1
+
+
+def _language_for(filename: str) -> Optional[str]:
+    lower = filename.lower()
+    if lower.endswith(PYTHON_EXTENSIONS):
+        return 'python'
+    if lower.endswith(SCRIPT_EXTENSIONS):
+        return 'typescript' if lower.endswith(('.ts', '.tsx')) else 'javascript'
+    return None
+
+
+def _verify_python(filename: str, code: str) -> Dict[str, Any]:
+    try:
+        tree = ast.parse(code, filename=filename)
+        compile(tree, filename, 'exec')
+    except SyntaxError as e:
+        return {'ok': False, 'error': f"SyntaxError: {e.msg}", 'line': e.lineno}
+    except ValueError as e:  # e.g. null bytes in source
+        return {'ok': False, 'error': f"ValueError: {e}", 'line': None}
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module.split('.')[0])
+    return {'ok': True, 'error': None, 'line': None, 'imports': sorted(imports)}
+
+
+def _verify_script(code: str, jsx: bool = False) -> Dict[str, Any]:
+    """
+    Fast structural check for TS/JS: strings, template literals and comments
+    must terminate and brackets must balance. This is not a full parser but it
+    catches the truncation and fence-mangling errors LLM output typically has.
+    Regex literals are skipped where the previous token allows one (after an
+    operator, punctuator or keyword such as return).
+
+    In JSX files a stray quote may be plain text (e.g. "Don't"), so an
+    unterminated quote on a line is tolerated there.
+    """
+    stack: List[tuple] = []
+    i, n, line = 0, len(code), 1
+    template_depth: List[int] = []  # brace depth at which each `${` opened
+
+    while i < n:
+        ch = code[i]
+        if ch == '\n':
+            line += 1
+        elif ch == '/' and code.startswith('//', i):
+            end = code.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif ch == '/' and code.startswith('/*', i):
+            end = code.find('*/', i + 2)
+            if end == -1:
+                return {'ok': False, 'error': "Unterminated block comment", 'line': line}
+            line += code.count('\n', i, end)
+            i = end + 2
+            continue
+        elif ch == '/' and _regex_allowed(code, i, jsx):
+            end = _regex_end(code, i)
+            if end != -1:
+                i = end
+                continue
+        elif ch in ('"', "'"):
+            j = i + 1
+            while j < n and code[j] != ch:
+                if code[j] == '\\':
+                    j += 1
+                elif code[j] == '\n':
+                    break
+                j += 1
+            if j >= n or code[j] != ch:
+                if jsx:
+                    i += 1
+                    continue
+                return {'ok': False, 'error': "Unterminated string literal", 'line': line}
+            i = j + 1
+            continue
+        elif ch == '`' or (ch == '}' and template_depth and template_depth[-1] == len(stack)):
+            if ch == '}':
+                template_depth.pop()
+            j = i + 1
+            while j < n and code[j] != '`':
+                if code[j] == '\\':
+                    j += 1
+                elif code.startswith('${', j):
+                    break
+                elif code[j] == '\n':
+                    line += 1
+                j += 1
+            if j >= n:
+                return {'ok': False, 'error': "Unterminated template literal", 'line': line}
+            if code[j] == '$':
+                template_depth.append(len(stack))
+                i = j + 2
+            else:
+                i = j + 1
+            continue
+        elif ch in '([{':
+            stack.append((ch, line))
+        elif ch in ')]}':
+            if not stack or stack[-1][0] != _CLOSERS[ch]:
+                return {'ok': False, 'error': f"Unexpected '{ch}'", 'line': line}
+            stack.pop()
+        i += 1
+
+    if stack:
+        opener, opened_at = stack[-1]
+        return {'ok': False, 'error': f"Unclosed '{opener}'", 'line': opened_at}
+    return {'ok': True, 'error': None, 'line': None}
+
+
+def verify_source(filename: str, code: str) -> Dict[str, Any]:
+    """Verify a single generated file. Safe to run in a worker process."""
+    language = _language_for(filename)
+    if language == 'python':
+        result = _verify_python(filename, code)
+    elif language in ('typescript', 'javascript'):
+        result = _verify_script(code, jsx=filename.lower().endswith(('.tsx', '.jsx')))
+    else:
+        result = {'ok': True, 'error': None, 'line': None, 'skipped': True}
+    result['filename'] = filename
+    result['language'] = language
+    return result
+
+
+def _verify_batch(items: List[tuple]) -> List[Dict[str, Any]]:
+    return [verify_source(filename, code) for filename, code in items]
+
+
+class CodeVerifier:
+    """
+    Verifies generated code files (syntax + imports) before the code review gate.
+
+    Results are cached by content hash so unchanged files are never re-checked,
+    and large batches are fanned out over a process pool.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, max_workers: Optional[int] = None):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.max_workers = max_workers
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.cache_file and self.cache_file.exists():
+            try:
+                self._cache = json.loads(self.cache_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._cache = {}
+
+    @staticmethod
+    def _cache_key(filename: str, code: str) -> str:
+        # The extension decides which checker runs, so it is part of the key;
+        # so is the checker version, so results of older checkers are not reused
+        suffix = Path(filename).suffix.lower()
+        return hashlib.sha256(f"{CHECKER_VERSION}\0{suffix}\0{code}".encode('utf-8')).hexdigest()
+
+    def verify_files(self, files: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Verify all generated files.
+
+        Args:
+            files: Dictionary of {filename: code_content}
+
+        Returns:
+            {'is_valid', 'results': {filename: result}, 'failed': [filenames],
+             'warnings': {filename: [unresolved imports]}, 'cache_hits'}
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[tuple] = []
+        keys: Dict[str, str] = {}
+
+        with self._lock:
+            for filename, code in files.items():
+                key = self._cache_key(filename, code)
+                keys[filename] = key
+                cached = self._cache.get(key)
+                if cached is not None:
+                    results[filename] = dict(cached, filename=filename)
+                else:
+                    pending.append((filename, code))
+        cache_hits = len(results)
+
+        if pending:
+            if len(pending) >= POOL_THRESHOLD:
+                workers = self.max_workers or min(len(pending), 8)
+                batches = [pending[i::workers] for i in range(workers)]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    checked = [r for batch in pool.map(_verify_batch, batches) for r in batch]
+            else:
+                checked = _verify_batch(pending)
+
+            with self._lock:
+                for result in checked:
+                    results[result['filename']] = result
+                    self._cache[keys[result['filename']]] = result
+            self._persist()
+
+        warnings = self._unresolved_imports(files, results)
+        failed = sorted(name for name, result in results.items() if not result['ok'])
+        return {
+            'is_valid': not failed,
+            'results': results,
+            'failed': failed,
+            'warnings': warnings,
+            'cache_hits': cache_hits,
+        }
+
+    def _unresolved_imports(self, files: Dict[str, str], results: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+        """Imports that are neither stdlib nor provided by another generated file"""
+        local_modules = set()
+        for filename in files:
+            parts = Path(filename).with_suffix('').parts
+            local_modules.update(parts)
+        stdlib = getattr(sys, 'stdlib_module_names', set())
+
+        warnings = {}
+        for filename, result in results.items():
+            missing = [
+                name for name in result.get('imports', [])
+                if name not in stdlib and name not in local_modules
+            ]
+            if missing:
+                warnings[filename] = missing
+        return warnings
+
+    def _persist(self) -> None:
+        if not self.cache_file:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                payload = json.dumps(self._cache)
+            self.cache_file.write_text(payload, encoding='utf-8')
+        except OSError as e:
+            print(f"   ⚠️  Could not persist verification cache: {e}")
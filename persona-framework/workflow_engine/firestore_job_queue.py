@@ -0,0 +1,319 @@
+from typing import Dict, Any, List, Optional, Iterable
+from datetime import datetime
+import json
+import time
+
+from google.cloud import firestore
+
+from workflow_engine.job_queue import (
+    PENDING, RUNNING, DONE, FAILED, CANCELLED, AWAITING_APPROVAL, JOB_STATUSES,
+    DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+)
+
+# Firestore allows 30 values in an 'in' filter
+IN_FILTER_LIMIT = 30
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class FirestoreJobQueue:
+    """
+    JobQueue on Firestore, for workers spread over several nodes.
+
+    Same interface and lease semantics as the SQLite JobQueue: claims,
+    heartbeats, completions and checkpoints are transactions that check the
+    caller still holds the lease. Checkpoints are stored one document per
+    stage in a subcollection of the job.
+
+    Needs composite indexes on (status, created_ts) and (status, lease_expires_at).
+    """
+
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        collection: str = "workflow_jobs",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ):
+        self.db = firestore.Client(project=project_id)
+        self.jobs = self.db.collection(collection)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    # ---- Producers ----
+
+    def enqueue(self, ticket_id: str, payload: Dict[str, Any], source: Optional[str] = None) -> None:
+        self.enqueue_many([(ticket_id, payload)], source)
+
+    def enqueue_many(self, jobs: Iterable[tuple], source: Optional[str] = None) -> int:
+        """Enqueue (ticket_id, payload) pairs; a ticket's pending job gets the newer payload"""
+        jobs = list(jobs)
+        for start in range(0, len(jobs), IN_FILTER_LIMIT):
+            chunk = jobs[start:start + IN_FILTER_LIMIT]
+            pending = {
+                doc.get('ticket_id'): doc.reference
+                for doc in self.jobs.where('status', '==', PENDING)
+                                    .where('ticket_id', 'in', [ticket_id for ticket_id, _ in chunk]).stream()
+            }
+            batch = self.db.batch()
+            for ticket_id, payload in chunk:
+                now = _now()
+                data = {'payload': json.dumps(payload, default=str), 'source': source, 'updated_at': now}
+                if ticket_id in pending:
+                    batch.update(pending[ticket_id], data)
+                else:
+                    batch.set(self.jobs.document(), {
+                        **data,
+                        'ticket_id': ticket_id,
+                        'status': PENDING,
+                        'attempts': 0,
+                        'worker_id': None,
+                        'created_at': now,
+                        'created_ts': time.time(),
+                        'error': None,
+                        'lease_expires_at': None,
+                        'heartbeat_at': None,
+                        'held_stage': None,
+                    })
+            batch.commit()
+        return len(jobs)
+
+    # ---- Consumers ----
+
+    def claim(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Lease the oldest pending job, or a running job whose lease expired"""
+        lease_seconds = lease_seconds or self.lease_seconds
+
+        @firestore.transactional
+        def _claim(transaction) -> Optional[Dict[str, Any]]:
+            now = time.time()
+            candidates = list(
+                self.jobs.where('status', '==', PENDING).order_by('created_ts').limit(1).stream(transaction=transaction)
+            )
+            # All reads happen before the transaction's first write
+            expired = list(
+                self.jobs.where('status', '==', RUNNING).where('lease_expires_at', '<', now)
+                         .order_by('lease_expires_at').limit(5).stream(transaction=transaction)
+            )
+            for doc in expired:
+                if doc.get('attempts') >= self.max_attempts:
+                    transaction.update(doc.reference, {
+                        'status': FAILED, 'updated_at': _now(), 'lease_expires_at': None,
+                        'error': f"lease expired after {doc.get('attempts')} attempt(s)",
+                    })
+                else:
+                    candidates.append(doc)
+            if not candidates:
+                return None
+            doc = min(candidates, key=lambda d: d.get('created_ts'))
+            transaction.update(doc.reference, {
+                'status': RUNNING,
+                'worker_id': worker_id,
+                'attempts': doc.get('attempts') + 1,
+                'updated_at': _now(),
+                'lease_expires_at': now + lease_seconds,
+                'heartbeat_at': _now(),
+            })
+            job = doc.to_dict()
+            job.update({
+                'job_id': doc.id,
+                'payload': json.loads(job['payload']),
+                'resumed': job['status'] == RUNNING,
+                'status': RUNNING,
+                'worker_id': worker_id,
+                'attempts': job['attempts'] + 1,
+                'lease_expires_at': now + lease_seconds,
+            })
+            return job
+
+        return _claim(self.db.transaction())
+
+    def _update_if_owner(self, job_id: str, worker_id: Optional[str], fields: Dict[str, Any]) -> bool:
+        ref = self.jobs.document(job_id)
+
+        @firestore.transactional
+        def _update(transaction) -> bool:
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            if worker_id is not None and (snapshot.get('worker_id') != worker_id or snapshot.get('status') != RUNNING):
+                return False
+            transaction.update(ref, fields)
+            return True
+
+        return _update(self.db.transaction())
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: Optional[float] = None) -> bool:
+        lease_seconds = lease_seconds or self.lease_seconds
+        return self._update_if_owner(job_id, worker_id, {
+            'lease_expires_at': time.time() + lease_seconds,
+            'heartbeat_at': _now(),
+        })
+
+    def complete(
+        self,
+        job_id: str,
+        status: str = DONE,
+        error: Optional[str] = None,
+        worker_id: Optional[str] = None
+    ) -> bool:
+        return self._update_if_owner(job_id, worker_id, {
+            'status': status,
+            'error': error,
+            'updated_at': _now(),
+            'lease_expires_at': None,
+        })
+
+    def release(self, job_id: str, worker_id: str, error: Optional[str] = None, delay_seconds: float = 0.0) -> bool:
+        """Give up a leased job for another attempt after delay_seconds (left as an expired lease)"""
+        return self._update_if_owner(job_id, worker_id, {
+            'error': error,
+            'updated_at': _now(),
+            'lease_expires_at': time.time() + delay_seconds,
+        })
+
+    def hold(
+        self,
+        job_id: str,
+        worker_id: str,
+        stage: str,
+        outputs: Dict[str, Any],
+        artifact_url: Optional[str] = None
+    ) -> bool:
+        """Park a leased job held at stage's gate, keeping the stage's outcome for approve()"""
+        job_ref = self.jobs.document(job_id)
+        checkpoint_ref = job_ref.collection('checkpoints').document(stage)
+
+        @firestore.transactional
+        def _hold(transaction) -> bool:
+            snapshot = job_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get('worker_id') != worker_id or snapshot.get('status') != RUNNING:
+                return False
+            transaction.set(checkpoint_ref, {
+                'outputs': json.dumps(outputs, default=str),
+                'artifact_url': artifact_url,
+                'created_at': _now(),
+            })
+            transaction.update(job_ref, {
+                'status': AWAITING_APPROVAL,
+                'held_stage': stage,
+                'error': None,
+                'updated_at': _now(),
+                'lease_expires_at': None,
+            })
+            return True
+
+        return _hold(self.db.transaction())
+
+    def _decide(self, job_id: str, stage: Optional[str], fields) -> bool:
+        ref = self.jobs.document(job_id)
+
+        @firestore.transactional
+        def _update(transaction) -> bool:
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get('status') != AWAITING_APPROVAL:
+                return False
+            if stage is not None and snapshot.get('held_stage') != stage:
+                return False
+            transaction.update(ref, fields(snapshot))
+            return True
+
+        return _update(self.db.transaction())
+
+    def approve(self, job_id: str, stage: Optional[str] = None) -> bool:
+        """Approve the stage a job is held at and queue the job again to resume after it"""
+        return self._decide(job_id, stage, lambda snapshot: {
+            'status': PENDING,
+            'held_stage': None,
+            'attempts': 0,
+            'worker_id': None,
+            'error': None,
+            'updated_at': _now(),
+        })
+
+    def reject(self, job_id: str, reason: Optional[str] = None) -> bool:
+        """Fail a job awaiting approval"""
+        return self._decide(job_id, None, lambda snapshot: {
+            'status': FAILED,
+            'error': f"rejected at {snapshot.get('held_stage')}" + (f": {reason}" if reason else ""),
+            'updated_at': _now(),
+        })
+
+    def cancel_pending(self, ticket_id: str) -> int:
+        batch = self.db.batch()
+        count = 0
+        for doc in self.jobs.where('status', '==', PENDING).where('ticket_id', '==', ticket_id).stream():
+            batch.update(doc.reference, {'status': CANCELLED, 'error': 'cancelled before start', 'updated_at': _now()})
+            count += 1
+        if count:
+            batch.commit()
+        return count
+
+    # ---- Checkpoints ----
+
+    def save_checkpoint(
+        self,
+        job_id: str,
+        worker_id: str,
+        stage: str,
+        outputs: Dict[str, Any],
+        artifact_url: Optional[str] = None
+    ) -> bool:
+        job_ref = self.jobs.document(job_id)
+        checkpoint_ref = job_ref.collection('checkpoints').document(stage)
+
+        @firestore.transactional
+        def _save(transaction) -> bool:
+            snapshot = job_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get('worker_id') != worker_id or snapshot.get('status') != RUNNING:
+                return False
+            transaction.set(checkpoint_ref, {
+                'outputs': json.dumps(outputs, default=str),
+                'artifact_url': artifact_url,
+                'created_at': _now(),
+            })
+            return True
+
+        return _save(self.db.transaction())
+
+    def load_checkpoints(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """Approved stages of a job (the stage it is held at is not one)"""
+        job_ref = self.jobs.document(job_id)
+        held_stage = (job_ref.get().to_dict() or {}).get('held_stage')
+        docs = job_ref.collection('checkpoints').order_by('created_at').stream()
+        return {
+            doc.id: {'outputs': json.loads(doc.get('outputs')), 'artifact_url': doc.get('artifact_url')}
+            for doc in docs if doc.id != held_stage
+        }
+
+    # ---- Reads ----
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        snapshot = self.jobs.document(job_id).get()
+        if not snapshot.exists:
+            return None
+        job = snapshot.to_dict()
+        job.pop('created_ts', None)
+        return {**job, 'job_id': snapshot.id, 'payload': json.loads(job['payload'])}
+
+    def stats(self) -> Dict[str, int]:
+        counts = {}
+        for status in JOB_STATUSES:
+            result = self.jobs.where('status', '==', status).count().get()
+            counts[status] = int(result[0][0].value)
+        return counts
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        query = self.jobs
+        if status:
+            query = query.where('status', '==', status)
+        query = query.order_by('created_ts', direction=firestore.Query.DESCENDING).offset(offset).limit(limit)
+        jobs = []
+        for doc in query.stream():
+            job = doc.to_dict()
+            job.pop('payload', None)
+            job.pop('created_ts', None)
+            jobs.append({'job_id': doc.id, **job})
+        return jobs
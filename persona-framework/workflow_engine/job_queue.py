@@ -0,0 +1,602 @@
+from typing import Dict, Any, List, Optional, Iterable, Callable
+from pathlib import Path
+from datetime import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id   TEXT NOT NULL,
+    source      TEXT,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker_id   TEXT,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    error       TEXT,
+    lease_expires_at REAL,
+    heartbeat_at     TEXT,
+    held_stage       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+-- At most one pending job per ticket: re-enqueueing replaces its payload
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending_ticket ON jobs(ticket_id) WHERE status = 'PENDING';
+-- Approved stage outcomes of a job, so a re-claimed job resumes where the last worker stopped,
+-- and the outcome of the stage it is held at (jobs.held_stage) until a reviewer decides
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id        INTEGER NOT NULL,
+    stage         TEXT NOT NULL,
+    outputs       TEXT NOT NULL,
+    artifact_url  TEXT,
+    created_at    TEXT NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+# Columns added after the first release; older databases are migrated on open
+MIGRATED_COLUMNS = {'lease_expires_at': 'REAL', 'heartbeat_at': 'TEXT', 'held_stage': 'TEXT'}
+
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY_SECONDS = 30.0
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+DONE = 'DONE'
+FAILED = 'FAILED'
+CANCELLED = 'CANCELLED'
+# Workflow held at a gate; approve() puts the job back in the queue to resume after that stage
+AWAITING_APPROVAL = 'AWAITING_APPROVAL'
+
+JOB_STATUSES = (PENDING, RUNNING, AWAITING_APPROVAL, DONE, FAILED, CANCELLED)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class JobQueue:
+    """
+    Durable SQLite-backed queue of workflow jobs.
+
+    Intake adapters enqueue tickets; workers claim the oldest pending job
+    under a lease, keep the lease alive with heartbeats while the workflow
+    runs, checkpoint each approved stage and mark the job done or failed.
+    A job whose lease expires (its worker crashed or lost connectivity) is
+    claimed again by another worker and resumes from its checkpoints.
+
+    A workflow held at a gate for review leaves its job AWAITING_APPROVAL
+    with the held stage's outcome; approve() re-queues it to resume after
+    that stage, reject() fails it.
+
+    Any number of worker processes on hosts sharing the database file can
+    use one queue; FirestoreJobQueue offers the same interface across nodes.
+    """
+
+    def __init__(
+        self,
+        db_path: str = ".ai/state/jobs.db",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in MIGRATED_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- Producers ----
+
+    def enqueue(self, ticket_id: str, payload: Dict[str, Any], source: Optional[str] = None) -> None:
+        self.enqueue_many([(ticket_id, payload)], source)
+
+    def enqueue_many(self, jobs: Iterable[tuple], source: Optional[str] = None) -> int:
+        """
+        Enqueue (ticket_id, payload) pairs in one transaction.
+
+        A ticket that already has a pending job keeps its place in the queue
+        and gets the newer payload.
+
+        Returns:
+            Number of jobs written
+        """
+        now = _now()
+        rows = [(ticket_id, source, json.dumps(payload, default=str), now, now) for ticket_id, payload in jobs]
+        if not rows:
+            return 0
+        with self._write_lock:
+            conn = self._conn()
+            conn.executemany(
+                "INSERT INTO jobs (ticket_id, source, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'PENDING', ?, ?) "
+                "ON CONFLICT(ticket_id) WHERE status = 'PENDING' "
+                "DO UPDATE SET payload = excluded.payload, source = excluded.source, updated_at = excluded.updated_at",
+                rows
+            )
+            conn.commit()
+        return len(rows)
+
+    # ---- Consumers ----
+
+    def claim(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically lease the oldest claimable job: pending, or running under
+        an expired lease. Returns None if there is nothing to do.
+
+        Jobs whose lease expired max_attempts times are failed instead of
+        being handed out again.
+        """
+        lease_seconds = lease_seconds or self.lease_seconds
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'FAILED', error = 'lease expired after ' || attempts || ' attempt(s)', "
+                    "updated_at = ? WHERE status = 'RUNNING' AND COALESCE(lease_expires_at, 0) < ? AND attempts >= ?",
+                    (_now(), now, self.max_attempts)
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'PENDING' "
+                    "OR (status = 'RUNNING' AND COALESCE(lease_expires_at, 0) < ?) ORDER BY job_id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.commit()
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'RUNNING', worker_id = ?, attempts = attempts + 1, updated_at = ?, "
+                    "lease_expires_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                    (worker_id, _now(), now + lease_seconds, _now(), row['job_id'])
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['resumed'] = row['status'] == RUNNING
+        job['status'] = RUNNING
+        job['worker_id'] = worker_id
+        job['attempts'] += 1
+        job['lease_expires_at'] = now + lease_seconds
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: Optional[float] = None) -> bool:
+        """Extend a job's lease. False if the worker no longer holds it."""
+        lease_seconds = lease_seconds or self.lease_seconds
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, heartbeat_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                (time.time() + lease_seconds, _now(), job_id, worker_id)
+            )
+            conn.commit()
+        return cursor.rowcount == 1
+
+    def complete(
+        self,
+        job_id: int,
+        status: str = DONE,
+        error: Optional[str] = None,
+        worker_id: Optional[str] = None
+    ) -> bool:
+        """
+        Finish a job. With worker_id, only while that worker still holds the
+        lease; returns False if another worker has taken the job over.
+        """
+        sql = "UPDATE jobs SET status = ?, error = ?, updated_at = ?, lease_expires_at = NULL WHERE job_id = ?"
+        params = [status, error, _now(), job_id]
+        if worker_id is not None:
+            sql += " AND worker_id = ? AND status = 'RUNNING'"
+            params.append(worker_id)
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+        return cursor.rowcount == 1
+
+    def release(self, job_id: int, worker_id: str, error: Optional[str] = None, delay_seconds: float = 0.0) -> bool:
+        """
+        Give up a leased job for another attempt after delay_seconds. The job
+        is left as an expired lease, so the next claim resumes it from its
+        checkpoints. False if the worker no longer holds it.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute(
+                "UPDATE jobs SET error = ?, updated_at = ?, lease_expires_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                (error, _now(), time.time() + delay_seconds, job_id, worker_id)
+            )
+            conn.commit()
+        return cursor.rowcount == 1
+
+    def hold(
+        self,
+        job_id: int,
+        worker_id: str,
+        stage: str,
+        outputs: Dict[str, Any],
+        artifact_url: Optional[str] = None
+    ) -> bool:
+        """
+        Park a leased job whose workflow is held at stage's gate, keeping the
+        stage's outcome for approve(). False if the worker no longer holds it.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'AWAITING_APPROVAL', held_stage = ?, error = NULL, updated_at = ?, "
+                    "lease_expires_at = NULL WHERE job_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                    (stage, _now(), job_id, worker_id)
+                )
+                if cursor.rowcount == 1:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO checkpoints (job_id, stage, outputs, artifact_url, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (job_id, stage, json.dumps(outputs, default=str), artifact_url, _now())
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return cursor.rowcount == 1
+
+    def approve(self, job_id: int, stage: Optional[str] = None) -> bool:
+        """
+        Approve the stage a job is held at and queue the job again; its next
+        run resumes after that stage. With stage, only if the job is held
+        there. False if the job is not awaiting approval (of that stage).
+
+        Raises:
+            ValueError: the ticket already has a newer pending job
+        """
+        sql = ("UPDATE jobs SET status = 'PENDING', held_stage = NULL, attempts = 0, worker_id = NULL, "
+               "error = NULL, updated_at = ? WHERE job_id = ? AND status = 'AWAITING_APPROVAL'")
+        params = [_now(), job_id]
+        if stage is not None:
+            sql += " AND held_stage = ?"
+            params.append(stage)
+        with self._write_lock:
+            conn = self._conn()
+            try:
+                cursor = conn.execute(sql, params)
+                conn.commit()
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                raise ValueError(f"Job {job_id}: its ticket already has a pending job")
+        return cursor.rowcount == 1
+
+    def reject(self, job_id: int, reason: Optional[str] = None) -> bool:
+        """Fail a job awaiting approval. False if it is not awaiting approval."""
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'FAILED', error = 'rejected at ' || held_stage || ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'AWAITING_APPROVAL'",
+                (f": {reason}" if reason else "", _now(), job_id)
+            )
+            conn.commit()
+        return cursor.rowcount == 1
+
+    # ---- Checkpoints ----
+
+    def save_checkpoint(
+        self,
+        job_id: int,
+        worker_id: str,
+        stage: str,
+        outputs: Dict[str, Any],
+        artifact_url: Optional[str] = None
+    ) -> bool:
+        """Record an approved stage of a leased job. False if the lease was lost."""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                owned = conn.execute(
+                    "SELECT 1 FROM jobs WHERE job_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                    (job_id, worker_id)
+                ).fetchone()
+                if owned:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO checkpoints (job_id, stage, outputs, artifact_url, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (job_id, stage, json.dumps(outputs, default=str), artifact_url, _now())
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return owned is not None
+
+    def load_checkpoints(self, job_id: int) -> Dict[str, Dict[str, Any]]:
+        """Approved stages of a job: {stage: {'outputs', 'artifact_url'}}"""
+        rows = self._conn().execute(
+            "SELECT stage, outputs, artifact_url FROM checkpoints WHERE job_id = ? "
+            "AND stage IS NOT (SELECT held_stage FROM jobs WHERE job_id = ?) ORDER BY created_at",
+            (job_id, job_id)
+        ).fetchall()
+        return {r['stage']: {'outputs': json.loads(r['outputs']), 'artifact_url': r['artifact_url']} for r in rows}
+
+    def cancel_pending(self, ticket_id: str) -> int:
+        """Cancel a ticket's pending job so no worker picks it up. Returns jobs cancelled."""
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'CANCELLED', error = 'cancelled before start', updated_at = ? "
+                "WHERE ticket_id = ? AND status = 'PENDING'",
+                (_now(), ticket_id)
+            )
+            conn.commit()
+        return cursor.rowcount
+
+    # ---- Reads ----
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({r['status']: r['n'] for r in rows})
+        return counts
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        where, params = ("WHERE status = ?", [status]) if status else ("", [])
+        rows = self._conn().execute(
+            f"SELECT job_id, ticket_id, source, status, attempts, worker_id, created_at, updated_at, error, "
+            f"lease_expires_at, heartbeat_at, held_stage "
+            f"FROM jobs {where} ORDER BY job_id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+class QueueWorker:
+    """
+    Background worker that claims jobs from a JobQueue and runs their workflows.
+
+    Jobs run without a console, so approval gates use approval_callback; with
+    none, a workflow stops at its next gate and the job waits as
+    AWAITING_APPROVAL until a reviewer approves (re-queueing it) or rejects it.
+
+    While a job runs, a heartbeat thread renews its lease every third of the
+    lease period; if the lease is lost, the workflow is cancelled so two
+    workers never keep spending on the same job. Each approved stage is
+    checkpointed, and a re-claimed job skips the stages already approved.
+
+    A job is DONE when its workflow completed. A failed workflow is released for another attempt (resuming from
+    its checkpoints) until the queue's max_attempts, then FAILED; a rejected
+    one is FAILED at once, since re-running cannot change the decision.
+
+    With an OrchestratorRegistry instead of an orchestrator, a job runs on its
+    payload's 'project' (the default project if none) and waits for a free
+    slot of that project's workflow quota.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        orchestrator,
+        worker_id: str,
+        approval_callback=None,
+        poll_seconds: float = 5.0,
+        lease_seconds: Optional[float] = None,
+        retry_delay_seconds: float = DEFAULT_RETRY_DELAY_SECONDS
+    ):
+        self.queue = queue
+        self.orchestrator = orchestrator
+        self.worker_id = worker_id
+        self.approval_callback = approval_callback
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds or queue.lease_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Claim and run one job; returns the job, or None if the queue was empty"""
+        from workflow_engine.project_registry import OrchestratorRegistry
+
+        job = self.queue.claim(self.worker_id, self.lease_seconds)
+        if job is None:
+            return None
+        if not isinstance(self.orchestrator, OrchestratorRegistry):
+            return self._run_job(job, self.orchestrator)
+        project = job['payload'].get('project')
+        if not self.orchestrator.has_project(project):
+            self.queue.complete(job['job_id'], FAILED, f"Unknown project: {project}", worker_id=self.worker_id)
+            print(f"❌ Job {job['job_id']} failed: unknown project {project}")
+            return job
+        with self.orchestrator.lease(project) as orchestrator:
+            return self._run_job(job, orchestrator)
+
+    def _run_job(self, job: Dict[str, Any], orchestrator) -> Dict[str, Any]:
+        from workflow_engine.pipeline import StageOutcome
+
+        payload = job['payload']
+        ticket_id = payload.get('ticket_id', job['ticket_id'])
+        seed = {
+            stage: StageOutcome(checkpoint['outputs'], checkpoint['artifact_url'])
+            for stage, checkpoint in self.queue.load_checkpoints(job['job_id']).items()
+        }
+        print(f"🛠️  Worker {self.worker_id} running job {job['job_id']} ({job['ticket_id']}, attempt {job['attempts']})")
+        if seed:
+            print(f"⏩ Resuming from checkpoint: {', '.join(seed)} already approved")
+
+        def on_lease_lost():
+            print(f"⚠️  Worker {self.worker_id} lost the lease on job {job['job_id']}")
+            orchestrator.cancel_workflow(ticket_id, "job lease lost to another worker")
+
+        def checkpoint(stage: str, outcome) -> None:
+            if not self.queue.save_checkpoint(job['job_id'], self.worker_id, stage, outcome.outputs, outcome.artifact_url):
+                on_lease_lost()
+
+        keeper = _LeaseKeeper(
+            lambda: self.queue.heartbeat(job['job_id'], self.worker_id, self.lease_seconds),
+            interval=self.lease_seconds / 3,
+            on_lost=on_lease_lost
+        )
+        keeper.start()
+        try:
+            # Waiting for a quota slot happens under the lease heartbeat
+            with orchestrator.workflow_slot(wait=True):
+                results = orchestrator.execute_workflow_with_gates(
+                    ticket_id=ticket_id,
+                    requirements_doc=payload['requirements'],
+                    context=payload.get('context'),
+                    approval_callback=self.approval_callback or _hold_for_review,
+                    seed=seed or None,
+                    checkpoint=checkpoint
+                )
+        except Exception as e:
+            keeper.stop()
+            self._fail(job, str(e))
+            return job
+        keeper.stop()
+
+        if keeper.lost:
+            print(f"↪️  Job {job['job_id']} was taken over by another worker; result discarded")
+            return job
+        if results.get('budget', {}).get('cancelled'):
+            self.queue.complete(job['job_id'], CANCELLED, results['budget']['cancelled'], worker_id=self.worker_id)
+            return job
+
+        # Workflow failures are caught by the orchestrator; its final status tells what happened
+        status = (orchestrator.state_store.get_workflow(ticket_id) or {}).get('status')
+        if status == 'COMPLETED':
+            self.queue.complete(job['job_id'], DONE, worker_id=self.worker_id)
+        elif status == 'PENDING' and results.get('held'):
+            held = results['held']
+            self.queue.hold(job['job_id'], self.worker_id, held['stage'], held['outputs'], held['artifact_url'])
+            print(f"⏸️  Job {job['job_id']} awaiting approval of {held['stage']}")
+        elif status in ('REJECTED', 'CHANGES_REQUESTED'):
+            self.queue.complete(job['job_id'], FAILED, f"workflow {status}", worker_id=self.worker_id)
+            print(f"🚫 Job {job['job_id']}: workflow {status}")
+        else:
+            self._fail(job, "; ".join(results.get('errors') or []) or f"workflow ended as {status}")
+        return job
+
+    def _fail(self, job: Dict[str, Any], error: str) -> None:
+        """Release the job for another attempt, or fail it once max_attempts is reached"""
+        if job['attempts'] < self.queue.max_attempts:
+            self.queue.release(job['job_id'], self.worker_id, error, delay_seconds=self.retry_delay_seconds)
+            print(f"🔁 Job {job['job_id']} failed (attempt {job['attempts']}/{self.queue.max_attempts}), "
+                  f"retrying in {self.retry_delay_seconds:g}s: {error}")
+        else:
+            self.queue.complete(job['job_id'], FAILED, error, worker_id=self.worker_id)
+            print(f"❌ Job {job['job_id']} failed: {error}")
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.run_once()
+            except Exception as e:
+                print(f"⚠️  Worker {self.worker_id} error: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run_forever, name=f"queue-worker-{self.worker_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class _LeaseKeeper:
+    """Calls heartbeat every interval until stopped; on_lost fires once if a heartbeat fails"""
+
+    def __init__(self, heartbeat: Callable[[], bool], interval: float, on_lost: Callable[[], None]):
+        self.heartbeat = heartbeat
+        self.interval = interval
+        self.on_lost = on_lost
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-lease-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                alive = self.heartbeat()
+            except Exception as e:
+                # Transient storage errors: keep trying until the lease actually expires
+                print(f"⚠️  Heartbeat failed: {e}")
+                continue
+            if not alive:
+                self.lost = True
+                self.on_lost()
+                return
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def create_job_queue() -> "JobQueue":
+    """
+    Job queue selected by JOB_QUEUE_BACKEND: "sqlite" (default, JOB_QUEUE_DB
+    file shared by the processes of one host or volume) or "firestore"
+    (shared by any number of nodes)
+    """
+    lease_seconds = float(os.getenv('JOB_LEASE_SECONDS', str(DEFAULT_LEASE_SECONDS)))
+    max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', str(DEFAULT_MAX_ATTEMPTS)))
+    backend = os.getenv('JOB_QUEUE_BACKEND', 'sqlite').lower()
+    if backend == 'firestore':
+        from workflow_engine.firestore_job_queue import FirestoreJobQueue
+        return FirestoreJobQueue(
+            project_id=os.getenv('GOOGLE_CLOUD_PROJECT'),
+            collection=os.getenv('JOB_QUEUE_COLLECTION', 'workflow_jobs'),
+            lease_seconds=lease_seconds,
+            max_attempts=max_attempts
+        )
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {backend}")
+    return JobQueue(os.getenv('JOB_QUEUE_DB', '.ai/state/jobs.db'), lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+def _hold_for_review(stage: str, artifact_url: str):
+    from workflow_engine.orchestrator import ApprovalStatus
+    print(f"⏸️  {stage} awaiting human review: {artifact_url}")
+    return ApprovalStatus.PENDING
@@ -1,11 +1,19 @@
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable
 from pathlib import Path
 import json
 from datetime import datetime
 from google.cloud import firestore, storage
 from enum import Enum
+from dataclasses import dataclass, field
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
+import threading
+import contextvars
+import hashlib
+from contextlib import contextmanager
+import shutil
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,6 +23,50 @@ from personas.architect_ai import ArchitectAI
 from personas.planner_ai import PlannerAI
 from personas.developer_ai import DeveloperAI
 from personas.unit_test_ai import UnitTestAI
+from workflow_engine.code_verifier import CodeVerifier
+from workflow_engine.test_runner import TestRunner
+from workflow_engine.state_store import WorkflowStateStore
+from workflow_engine.status_hub import StatusHub
+from workflow_engine.similarity_index import SimilarityIndex
+from workflow_engine.artifact_files import CODE_DIR, TESTS_DIR, write_files, list_files
+from workflow_engine.pipeline import PipelineEngine, PipelineStopped, StageOutcome, StageSpec, load_pipeline
+from workflow_engine.approval_policy import ApprovalPolicy, diff_ratio, load_policy
+from context_bootstrap.retrieval import CodeSearchIndex
+from utils.artifact_index import get_artifact_index
+from utils.cassette import Cassette, use_cassette
+from utils.tracing import Tracer, use_tracer, span, TRACE_FILENAME
+from utils.budget import WorkflowBudget, WorkflowCancelled, use_budget, cancellable_sleep
+
+CASSETTE_FILENAME = 'llm_cassette.jsonl.gz'
+
+# Epic mode: stages run once per epic and shared by its child tickets
+EPIC_DESIGN_STAGES = ('requirements', 'architecture')
+EPIC_DESIGN_FILENAME = "EPIC_DESIGN.json"
+
+# results['artifacts'] key of the artifact each stage hands to its gate
+STAGE_ARTIFACT_KEYS = {
+    'planning': 'plan',
+    'code_generation': 'generated_code',
+    'unit_tests': 'test_summary',
+}
+
+# results['validation'] key each gate's policy evidence reads
+STAGE_VALIDATION_KEYS = {
+    'requirements': 'requirements',
+    'architecture': 'architecture',
+    'code_generation': 'generated_code',
+    'unit_tests': 'unit_tests',
+}
+
+# Copies of approved artifacts, the baseline a re-run's diff is measured against
+APPROVED_DIR = "approved"
+
+# Approved artifact offered as a few-shot seed to each stage
+SIMILAR_SEED_ARTIFACTS = {
+    'requirements': 'requirements',
+    'architecture': 'architecture',
+    'planning': 'plan',
+}
 
 class ApprovalStatus(Enum):
     PENDING = "PENDING"
@@ -22,14 +74,58 @@ class ApprovalStatus(Enum):
     REJECTED = "REJECTED"
     CHANGES_REQUESTED = "CHANGES_REQUESTED"
 
+class WorkflowQuotaExceeded(Exception):
+    """The project already runs its maximum number of concurrent workflows"""
+
+@dataclass
+class WorkflowRun:
+    """Per-run state shared by the stage handlers of one workflow"""
+    ticket_id: str
+    requirements_doc: str
+    context: Optional[Dict[str, Any]]
+    workflow_dir: Path
+    results: Dict[str, Any]
+    similar: List[Dict[str, Any]] = field(default_factory=list)
+    policy: Optional[ApprovalPolicy] = None
+
 class WorkflowOrchestrator:
     """
     Orchestrates the complete workflow with human approval gates.
+
+    One orchestrator serves one project. With state_dir, its workflow state,
+    similarity index, caches and artifacts live under that directory instead of the
+    shared .ai/ paths, so several projects can be served side by side.
     """
     
-    def __init__(self, project_id: str, bucket_name: str):
+    def __init__(
+        self,
+        project_id: str,
+        bucket_name: str,
+        project_root: Optional[str] = None,
+        state_dir: Optional[str] = None,
+        default_context: Optional[Dict[str, Any]] = None,
+        max_concurrent_workflows: Optional[int] = None
+    ):
+        """
+        Args:
+            project_id: GCP project for Firestore and Cloud Storage
+            bucket_name: Artifact bucket
+            project_root: Target codebase, for code retrieval and context bootstrap
+            state_dir: Directory for this project's state, caches and artifacts
+                (default: WORKFLOW_STATE_DB / SIMILARITY_INDEX_PATH / .ai/cache / .ai/workflow)
+            default_context: Context defaults for every workflow (budgets,
+                approval_policy, coding_standards); request context overrides them
+            max_concurrent_workflows: Quota enforced by workflow_slot()
+        """
         self.project_id = project_id
         self.bucket_name = bucket_name
+        self.project_root = project_root
+        self.default_context = default_context or {}
+        self.output_dir = str(Path(state_dir) / "workflow") if state_dir else ".ai/workflow"
+        state_db = str(Path(state_dir) / "workflows.db") if state_dir else os.getenv('WORKFLOW_STATE_DB', '.ai/state/workflows.db')
+        similarity_path = str(Path(state_dir) / "similarity_index.json") if state_dir \
+            else os.getenv('SIMILARITY_INDEX_PATH', '.ai/state/similarity_index.json')
+        self.cache_dir = Path(state_dir) / "cache" if state_dir else Path(".ai/cache")
         
         # Initialize GCP clients
         try:
@@ -40,14 +136,43 @@ class WorkflowOrchestrator:
             print(f"Warning: Could not initialize GCP clients: {e}")
             print("Running in local mode without cloud storage")
             self.db = None
+            self.storage_client = None
             self.bucket = None
         
+        # Status push to watchers; runs on other nodes are followed through Firestore listeners
+        self.status_hub = StatusHub(upstream=self._watch_firestore if self.db else None)
+
+        # Local workflow state (works with or without Firestore); every change is pushed to watchers
+        self.state_store = WorkflowStateStore(state_db, on_change=self._publish_status)
+        
         # Initialize AI personas
         self.requirements_ai = RequirementsAI()
         self.architect_ai = ArchitectAI()
         self.planner_ai = PlannerAI()
         self.developer_ai = DeveloperAI()
         self.unit_test_ai = UnitTestAI()
+
+        # Syntax/import checks for generated code, cached by content hash
+        self.code_verifier = CodeVerifier(cache_file=self.cache_dir / "code_verification.json")
+
+        # Sandboxed execution of generated tests, cached by code+test hash
+        self.test_runner = TestRunner(cache_file=self.cache_dir / "test_results.json")
+
+        # MinHash/LSH index of completed workflows, used to seed similar tickets
+        self.similarity_index = SimilarityIndex(similarity_path)
+        self.similarity_threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.5'))
+
+        # Budgets of running workflows, by ticket; cancelling one stops its run
+        self._active_runs: Dict[str, WorkflowBudget] = {}
+        self._active_runs_lock = threading.Lock()
+        # Console approvals from parallel runs (epic children) are asked one at a time
+        self._console_lock = threading.Lock()
+        # Project quota: workflows started through workflow_slot() at once
+        self.max_concurrent_workflows = max_concurrent_workflows
+        self._workflow_slots = threading.BoundedSemaphore(max_concurrent_workflows) if max_concurrent_workflows else None
+
+        # BM25 retrieval over the target project's code and .ai/rules
+        self.code_search = CodeSearchIndex(project_root) if project_root else None
         
     def execute_workflow_with_gates(
         self, 
@@ -55,7 +180,12 @@ class WorkflowOrchestrator:
         requirements_doc: str,
         context: Optional[Dict[str, Any]] = None,
         approval_callback: Optional[Callable] = None,
-        output_dir: str = ".ai/workflow"
+        output_dir: Optional[str] = None,
+        cassette_mode: Optional[str] = None,
+        replay_latency: bool = False,
+        pipeline: Optional[str] = None,
+        seed: Optional[Dict[str, StageOutcome]] = None,
+        checkpoint: Optional[Callable[[str, StageOutcome], None]] = None
     ) -> Dict[str, Any]:
         """
         Execute workflow with human approval gates after each stage.
@@ -63,9 +193,19 @@ class WorkflowOrchestrator:
         Args:
             ticket_id: Unique identifier
             requirements_doc: Input requirements
-            context: Project context
+            context: Project context; context['approval_policy'] names an approval
+                policy (default: APPROVAL_POLICY, or none) that auto-approves low-risk gates
             approval_callback: Function to call for human approval
-            output_dir: Local directory for artifacts
+            output_dir: Local directory for artifacts (default: the project's)
+            cassette_mode: "record" to capture all LLM calls to a cassette,
+                "replay" to serve them from a previous recording (offline)
+            replay_latency: In replay mode, sleep for the recorded latencies
+            pipeline: Pipeline definition name or path (default: WORKFLOW_PIPELINE
+                or workflow_engine/pipelines/default.json)
+            seed: Already-approved stage outcomes, by stage name, that the
+                pipeline builds on instead of running (e.g. an epic's design, or
+                the checkpoints of an interrupted run)
+            checkpoint: Called with (stage, outcome) after each stage is approved
         
         Returns:
             Workflow execution results
@@ -73,10 +213,304 @@ class WorkflowOrchestrator:
         
         print(f"🚀 Starting workflow for {ticket_id} with approval gates")
         
+        context = {**self.default_context, **(context or {})} if self.default_context else context
+
         # Create output directory
-        workflow_dir = Path(output_dir) / ticket_id
+        workflow_dir = Path(output_dir or self.output_dir) / ticket_id
         workflow_dir.mkdir(parents=True, exist_ok=True)
-        
+
+        cassette_mode = cassette_mode or os.getenv('PERSONA_CASSETTE_MODE') or None
+        cassette = None
+        if cassette_mode:
+            cassette = Cassette(workflow_dir / CASSETTE_FILENAME, mode=cassette_mode, replay_latency=replay_latency)
+            print(f"📼 Cassette {cassette_mode} mode: {cassette.path}")
+
+        budget = self._workflow_budget(context)
+        tracer = Tracer(f"workflow {ticket_id}")
+        with self._active_runs_lock:
+            self._active_runs[ticket_id] = budget
+        try:
+            with use_cassette(cassette), use_budget(budget), use_tracer(tracer):
+                with span(f"workflow {ticket_id}", 'workflow', ticket_id=ticket_id) as workflow_span:
+                    results = self._execute_stages(
+                        ticket_id, requirements_doc, context, approval_callback, workflow_dir, pipeline, seed,
+                        checkpoint
+                    )
+                    workflow_span.set(pipeline=results.get('pipeline'), errors=len(results['errors']))
+        finally:
+            with self._active_runs_lock:
+                if self._active_runs.get(ticket_id) is budget:
+                    del self._active_runs[ticket_id]
+            # Written even when the run fails, since that is when a timeline helps most
+            trace_path = tracer.save(workflow_dir / TRACE_FILENAME, ticket_id=ticket_id, budget=budget.snapshot())
+
+        results['trace'] = str(trace_path)
+        results['budget'] = budget.snapshot()
+        if cassette:
+            results['cassette'] = {'mode': cassette.mode, 'path': str(cassette.path), 'calls': cassette.calls}
+        return results
+
+    @staticmethod
+    def _workflow_budget(context: Optional[Dict[str, Any]]) -> WorkflowBudget:
+        """Latency/cost budget for model routing, from context or WORKFLOW_* env vars"""
+        context = context or {}
+
+        def _value(key: str, env_var: str) -> Optional[float]:
+            value = context.get(key, os.getenv(env_var))
+            return float(value) if value not in (None, '') else None
+
+        return WorkflowBudget(
+            deadline_seconds=_value('deadline_seconds', 'WORKFLOW_DEADLINE_SECONDS'),
+            cost_budget_usd=_value('cost_budget_usd', 'WORKFLOW_COST_BUDGET_USD'),
+        )
+
+    @contextmanager
+    def workflow_slot(self, wait: bool = False):
+        """
+        Hold one of the project's concurrent workflow slots while running a workflow.
+
+        Raises:
+            WorkflowQuotaExceeded: all slots are taken and wait is False
+        """
+        if self._workflow_slots is None:
+            yield
+            return
+        if not self._workflow_slots.acquire(blocking=wait):
+            raise WorkflowQuotaExceeded(
+                f"Workflow quota reached: {self.max_concurrent_workflows} concurrent workflow(s) already running"
+            )
+        try:
+            yield
+        finally:
+            self._workflow_slots.release()
+
+    def is_idle(self) -> bool:
+        """No running workflows and no status watchers"""
+        with self._active_runs_lock:
+            if self._active_runs:
+                return False
+        return not self.status_hub.watching()
+
+    def shutdown(self) -> None:
+        """Close clients and connections; call only when idle"""
+        self.state_store.close()
+        for client in (self.db, self.storage_client):
+            close = getattr(client, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"⚠️  Could not close {type(client).__name__}: {e}")
+
+    def cancel_workflow(self, ticket_id: str, reason: str = "cancelled by user") -> bool:
+        """
+        Cancel a running workflow.
+
+        In-flight model calls are abandoned, pending retries are skipped and
+        limiter slots are released; the workflow is recorded as CANCELLED.
+
+        Returns:
+            True if the workflow was running in this process
+        """
+        with self._active_runs_lock:
+            budget = self._active_runs.get(ticket_id)
+        if budget is None:
+            return False
+        print(f"🛑 Cancelling workflow {ticket_id}: {reason}")
+        budget.cancel(reason)
+        return True
+
+    def running_workflows(self) -> List[str]:
+        with self._active_runs_lock:
+            return list(self._active_runs)
+
+    # ---- Epic mode ----
+
+    def execute_epic(
+        self,
+        epic_id: str,
+        epic_requirements: str,
+        tickets: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        approval_callback: Optional[Callable] = None,
+        output_dir: Optional[str] = None,
+        max_parallel: Optional[int] = None,
+        refresh_design: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run an epic: Requirements and Architecture once for the whole epic,
+        then Planning, Code and Tests per child ticket in parallel against
+        that shared design.
+
+        The approved epic design is cached in <output_dir>/<epic_id>/ and
+        reused while the epic requirements and child list are unchanged, so
+        an N-ticket epic costs about 2 + 3N persona calls instead of 5N.
+
+        Args:
+            epic_id: Epic key
+            epic_requirements: Epic description
+            tickets: Child tickets as {'ticket_id', 'requirements'}
+            context: Project context, shared by the epic and its children
+            approval_callback: Function to call for approvals (epic and child gates)
+            output_dir: Local directory for artifacts (default: the project's)
+            max_parallel: Child tickets run at once (default EPIC_MAX_PARALLEL or 4)
+            refresh_design: Re-derive the epic design even if a cached one matches
+
+        Returns:
+            {'epic_id', 'status', 'design': {...}, 'tickets': {ticket_id: results}}
+        """
+        print(f"🧩 Starting epic {epic_id} with {len(tickets)} child ticket(s)")
+        output_dir = output_dir or self.output_dir
+        context = {**self.default_context, **(context or {})} if self.default_context else context
+        design_doc = self._epic_design_input(epic_requirements, tickets)
+        design, design_info = self._epic_design(
+            epic_id, design_doc, context, approval_callback, output_dir, refresh_design
+        )
+        epic_results = {'epic_id': epic_id, 'design': design_info, 'tickets': {}}
+        if design is None:
+            print(f"❌ Epic {epic_id} design not approved; child tickets not started")
+            epic_results['status'] = design_info['status']
+            return epic_results
+
+        max_parallel = max_parallel or int(os.getenv('EPIC_MAX_PARALLEL', '4'))
+        epic_context = {**(context or {}), 'epic': {'epic_id': epic_id, 'artifacts': design_info['artifacts']}}
+
+        def run_ticket(ticket: Dict[str, str]) -> Dict[str, Any]:
+            epic_requirements = design['requirements']
+            child_requirements = self._epic_child_requirements(epic_id, ticket, epic_requirements.outputs['document'])
+            # Later stages read the requirements outcome, so it carries the child's scope, not the epic's
+            child_seed = {
+                **design,
+                'requirements': StageOutcome(
+                    {**epic_requirements.outputs, 'document': child_requirements},
+                    epic_requirements.artifact_url
+                )
+            }
+            return self.execute_workflow_with_gates(
+                ticket_id=ticket['ticket_id'],
+                requirements_doc=child_requirements,
+                context=epic_context,
+                approval_callback=approval_callback,
+                output_dir=output_dir,
+                pipeline='epic_child',
+                seed=child_seed
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(tickets) or 1))) as pool:
+            futures = {
+                ticket['ticket_id']: pool.submit(contextvars.copy_context().run, run_ticket, ticket)
+                for ticket in tickets
+            }
+            for ticket_id, future in futures.items():
+                try:
+                    epic_results['tickets'][ticket_id] = future.result()
+                except Exception as e:
+                    print(f"❌ Epic child {ticket_id} failed: {e}")
+                    epic_results['tickets'][ticket_id] = {'ticket_id': ticket_id, 'errors': [str(e)]}
+
+        statuses = [
+            (self.state_store.get_workflow(ticket_id) or {}).get('status') for ticket_id in epic_results['tickets']
+        ]
+        epic_results['status'] = 'COMPLETED' if all(s == 'COMPLETED' for s in statuses) else 'PARTIAL'
+        print(f"🧩 Epic {epic_id}: {statuses.count('COMPLETED')}/{len(statuses)} child ticket(s) completed")
+        return epic_results
+
+    @staticmethod
+    def _epic_design_input(epic_requirements: str, tickets: List[Dict[str, str]]) -> str:
+        """Epic description plus a one-line scope per child, so the design covers every child"""
+        lines = [epic_requirements.strip(), "", "## Child Tickets"]
+        for ticket in tickets:
+            first_line = next((l.strip() for l in ticket['requirements'].splitlines() if l.strip()), "")
+            lines.append(f"- {ticket['ticket_id']}: {first_line[:200]}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _epic_child_requirements(epic_id: str, ticket: Dict[str, str], epic_requirements: str) -> str:
+        return (
+            f"# {ticket['ticket_id']} (child of epic {epic_id})\n\n"
+            f"Plan and implement ONLY this ticket's scope, within the epic's shared design.\n\n"
+            f"{ticket['requirements'].strip()}\n\n"
+            f"---\n\n# Epic {epic_id} Requirements (shared context)\n\n{epic_requirements}"
+        )
+
+    def _epic_design(
+        self,
+        epic_id: str,
+        design_doc: str,
+        context: Optional[Dict[str, Any]],
+        approval_callback: Optional[Callable],
+        output_dir: str,
+        refresh: bool
+    ) -> tuple:
+        """
+        Approved epic requirements and architecture, from cache or a new epic_design run.
+
+        Returns:
+            (seed outcomes by stage or None if not approved, design info)
+        """
+        cache_path = Path(output_dir) / epic_id / EPIC_DESIGN_FILENAME
+        design_hash = hashlib.sha256(
+            f"{json.dumps(context, sort_keys=True, default=str)}\0{design_doc}".encode('utf-8')
+        ).hexdigest()
+
+        if not refresh and cache_path.exists():
+            try:
+                cached = json.loads(cache_path.read_text(encoding='utf-8'))
+                if cached['design_hash'] == design_hash:
+                    seed = {
+                        stage: StageOutcome({'document': Path(path).read_text(encoding='utf-8')}, path)
+                        for stage, path in cached['artifacts'].items()
+                    }
+                    print(f"♻️  Reusing approved epic design from {cached['approved_at']}")
+                    return seed, {'status': 'COMPLETED', 'cached': True, 'artifacts': cached['artifacts']}
+            except (OSError, KeyError, json.JSONDecodeError):
+                pass
+
+        results = self.execute_workflow_with_gates(
+            ticket_id=epic_id,
+            requirements_doc=design_doc,
+            context=context,
+            approval_callback=approval_callback,
+            output_dir=output_dir,
+            pipeline='epic_design'
+        )
+        status = (self.state_store.get_workflow(epic_id) or {}).get('status', 'FAILED')
+        artifacts = {stage: results['artifacts'][stage] for stage in EPIC_DESIGN_STAGES if stage in results['artifacts']}
+        info = {'status': status, 'cached': False, 'artifacts': artifacts, 'errors': results['errors']}
+        if status != 'COMPLETED' or len(artifacts) != len(EPIC_DESIGN_STAGES):
+            return None, info
+
+        cache_path.write_text(json.dumps({
+            'epic_id': epic_id,
+            'design_hash': design_hash,
+            'approved_at': datetime.utcnow().isoformat(),
+            'artifacts': artifacts,
+        }, indent=2), encoding='utf-8')
+        seed = {
+            stage: StageOutcome({'document': Path(path).read_text(encoding='utf-8')}, path)
+            for stage, path in artifacts.items()
+        }
+        return seed, info
+
+    def _execute_stages(
+        self,
+        ticket_id: str,
+        requirements_doc: str,
+        context: Optional[Dict[str, Any]],
+        approval_callback: Optional[Callable],
+        workflow_dir: Path,
+        pipeline: Optional[str] = None,
+        seed: Optional[Dict[str, StageOutcome]] = None,
+        checkpoint: Optional[Callable[[str, StageOutcome], None]] = None
+    ) -> Dict[str, Any]:
+        """Run all stages and approval gates for one workflow, as defined by its pipeline"""
+        definition = load_pipeline(pipeline or os.getenv('WORKFLOW_PIPELINE'))
+        stage_deadlines = (context or {}).get('stage_deadlines') or {}
+        for stage in definition.stages:
+            if stage.name in stage_deadlines:
+                stage.timeout_seconds = float(stage_deadlines[stage.name])
+        first_stage = definition.topological_order()[0].name if definition.stages else None
+
         # Create workflow record
         if self.db:
             workflow_ref = self.db.collection('workflows').document(ticket_id)
@@ -84,317 +518,497 @@ class WorkflowOrchestrator:
                 'ticket_id': ticket_id,
                 'status': 'RUNNING',
                 'started_at': datetime.utcnow(),
-                'current_step': 'requirements_analysis',
+                'current_step': first_stage,
                 'approval_gates': []
             })
+        self.state_store.create_workflow(ticket_id, current_step=first_stage)
         
         results = {
             'ticket_id': ticket_id,
+            'pipeline': definition.name,
             'artifacts': {},
             'validation': {},
             'approvals': {},
             'errors': []
         }
+        seed = seed or {}
+        for stage_name, outcome in seed.items():
+            if outcome.artifact_url:
+                results['artifacts'][STAGE_ARTIFACT_KEYS.get(stage_name, stage_name)] = outcome.artifact_url
+            if stage_name == 'planning':
+                results['tasks'] = outcome.outputs.get('tasks', [])
         
-        try:
-            # ========== STAGE 1: Requirements Analysis ==========
-            print("\n" + "="*60)
-            print("📋 STAGE 1: Requirements Analysis")
-            print("="*60)
-            
-            requirements_output = self.requirements_ai.analyze_requirements(
-                requirements_doc, 
-                context
-            )
-            
-            req_validation = self.requirements_ai.validate_output(requirements_output)
-            results['validation']['requirements'] = req_validation
-
-            if not req_validation['is_valid']:
-                print(f"\n❌ Requirements validation failed:")
-                print(f"   Validation details: {req_validation}")
-                raise ValueError("Requirements validation failed")
-            
-            req_path = self._save_local_artifact(
-                workflow_dir,
-                'FEATURE_REQUIREMENTS.md', 
-                requirements_output
+        # Closest completed workflows; their approved artifacts seed each stage
+        similar = []
+        if not context or context.get('use_similar_workflows', True):
+            similar = self.similarity_index.query(
+                requirements_doc, k=3, min_similarity=self.similarity_threshold, exclude=ticket_id
             )
-            results['artifacts']['requirements'] = str(req_path)
-            
-            # APPROVAL GATE 1
-            print(f"\n🚦 APPROVAL GATE 1: Requirements Review")
-            print(f"📄 Review document: {req_path}")
-            
-            approval_1 = self._request_approval(
-                None if not self.db else self.db.collection('workflows').document(ticket_id),
-                stage="requirements",
-                artifact_url=str(req_path),
-                callback=approval_callback
-            )
-            
-            results['approvals']['requirements'] = approval_1
-            
-            if approval_1 != ApprovalStatus.APPROVED:
-                print("❌ Requirements not approved. Workflow stopped.")
-                return results
-            
-            print("✅ Requirements approved. Proceeding to architecture...")
-
-            # ========== STAGE 2: Architecture Design ==========
+        results['similar_workflows'] = [
+            {'ticket_id': m['ticket_id'], 'similarity': m['similarity'], 'title': m['title']} for m in similar
+        ]
+        if similar:
+            print(f"🔁 Similar approved workflow: {similar[0]['ticket_id']} ({similar[0]['similarity']:.0%} similar)")
+
+        # Gates the policy finds low-risk are approved without asking
+        policy = load_policy((context or {}).get('approval_policy') or os.getenv('APPROVAL_POLICY'))
+        results['approval_policy'] = policy.name if policy else None
+        if policy:
+            print(f"🛂 Approval policy: {policy.name}")
+
+        run = WorkflowRun(
+            ticket_id=ticket_id,
+            requirements_doc=requirements_doc,
+            context=context,
+            workflow_dir=workflow_dir,
+            results=results,
+            similar=similar,
+            policy=policy
+        )
+        engine = PipelineEngine(
+            definition,
+            handlers={name: partial(handler, run) for name, handler in self._stage_handlers().items()},
+            on_stage_start=lambda stage, number: self._announce_stage(ticket_id, stage, number),
+            on_stage_finish=lambda stage, outcome: self.state_store.finish_stage(ticket_id, stage.name),
+            request_gate=lambda stage, outcome: self._stage_gate(run, stage, outcome, approval_callback),
+            is_approved=lambda status: status == ApprovalStatus.APPROVED,
+            on_stage_complete=(lambda stage, outcome: checkpoint(stage.name, outcome)) if checkpoint else None
+        )
+
+        try:
+            engine.run({stage_name: outcome.outputs for stage_name, outcome in seed.items()})
+
             print("\n" + "="*60)
-            print("🏗️  STAGE 2: Architecture Design")
+            print("✅ WORKFLOW COMPLETED SUCCESSFULLY")
             print("="*60)
+            self._finish_workflow(ticket_id, 'COMPLETED')
+            try:
+                self.similarity_index.add(ticket_id, requirements_doc, results['artifacts'])
+            except OSError as e:
+                print(f"⚠️  Could not update similarity index: {e}")
+
+        except PipelineStopped as stop:
+            print(f"❌ {stop.stage} not approved. Workflow stopped.")
+            if stop.status == ApprovalStatus.PENDING and stop.outcome is not None:
+                # What a reviewer approves later, so the run can resume after this stage
+                results['held'] = {
+                    'stage': stop.stage,
+                    'outputs': stop.outcome.outputs,
+                    'artifact_url': stop.outcome.artifact_url
+                }
+            self._finish_workflow(ticket_id, stop.status.value)
+
+        except WorkflowCancelled as e:
+            print(f"\n🛑 {e.reason}")
+            results['errors'].append(e.reason)
+            self._finish_workflow(ticket_id, 'CANCELLED', error=e.reason)
 
-            # Retry logic for timeout and overload errors
-            max_retries = 3
-            import time
-            for attempt in range(max_retries):
-                try:
-                    print(f"   Attempt {attempt + 1}/{max_retries}...")
-                    architecture_output = self.architect_ai.design_architecture(
-                        requirements_output,
-                        context
-                    )
-                    break  # Success, exit retry loop
-                except Exception as e:
-                    error_str = str(e).lower()
-                    # Check for timeout (504) or overload (503) errors
-                    if "timeout" in error_str or "504" in str(e) or "503" in str(e) or "overloaded" in error_str:
-                        if attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 10  # Exponential backoff: 10s, 20s, 30s
-                            print(f"   ⚠️  API error occurred (timeout/overload), waiting {wait_time}s before retry...")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            print(f"   ❌ Failed after {max_retries} attempts")
-                            raise
-                    else:
-                        raise  # Re-raise non-retryable errors
-
-            arch_validation = self.architect_ai.validate_output(architecture_output)
-            results['validation']['architecture'] = arch_validation
+        except Exception as e:
+            print(f"\n❌ Workflow failed: {str(e)}")
+            results['errors'].append(str(e))
+            self._finish_workflow(ticket_id, 'FAILED', error=str(e))
+            import traceback
+            traceback.print_exc()
 
-            if not arch_validation['is_valid']:
-                print(f"\n❌ Architecture validation failed:")
-                print(f"   Validation details: {arch_validation}")
-                raise ValueError("Architecture validation failed")
+        return results
 
-            arch_path = self._save_local_artifact(
-                workflow_dir,
-                'SYSTEM_DESIGN.md',
-                architecture_output
-            )
-            results['artifacts']['architecture'] = str(arch_path)
+    # ---- Pipeline hooks ----
 
-            # APPROVAL GATE 2
-            print(f"\n🚦 APPROVAL GATE 2: Architecture Review")
-            print(f"📄 Review document: {arch_path}")
+    def _stage_handlers(self) -> Dict[str, Callable]:
+        """Handlers that pipeline definitions can reference by name"""
+        return {
+            'requirements': self._stage_requirements,
+            'architecture': self._stage_architecture,
+            'planning': self._stage_planning,
+            'code_generation': self._stage_code_generation,
+            'unit_tests': self._stage_unit_tests,
+        }
 
-            approval_2 = self._request_approval(
-                None if not self.db else self.db.collection('workflows').document(ticket_id),
-                stage="architecture",
-                artifact_url=str(arch_path),
-                callback=approval_callback
-            )
+    def _announce_stage(self, ticket_id: str, stage: StageSpec, number: int) -> None:
+        print("\n" + "="*60)
+        print(f"STAGE {number}: {stage.title or stage.name}")
+        print("="*60)
+        self.state_store.start_stage(ticket_id, stage.name)
 
-            results['approvals']['architecture'] = approval_2
+    def _stage_gate(
+        self,
+        run: "WorkflowRun",
+        stage: StageSpec,
+        outcome: StageOutcome,
+        approval_callback: Optional[Callable]
+    ) -> ApprovalStatus:
+        """Approval gate after a stage; stages without an artifact have nothing to review"""
+        if outcome.artifact_url is None:
+            print(f"⏭️  {stage.name} produced no artifact, skipping its gate")
+            return ApprovalStatus.APPROVED
+
+        print(f"\n🚦 APPROVAL GATE: {stage.title or stage.name} Review")
+        print(f"📄 Review: {outcome.artifact_url}")
+
+        status = self._request_approval(
+            None if not self.db else self.db.collection('workflows').document(run.ticket_id),
+            stage=stage.name,
+            artifact_url=outcome.artifact_url,
+            callback=approval_callback,
+            ticket_id=run.ticket_id,
+            policy=run.policy,
+            evidence=self._gate_evidence(run, stage.name, outcome.artifact_url) if run.policy else None
+        )
+        run.results['approvals'][stage.name] = status
+        if status == ApprovalStatus.APPROVED:
+            print(f"✅ {stage.name} approved.")
+            self._keep_approved_copy(run.workflow_dir, stage.name, outcome.artifact_url)
+        return status
 
-            if approval_2 != ApprovalStatus.APPROVED:
-                print("❌ Architecture not approved. Workflow stopped.")
-                return results
+    def _gate_evidence(self, run: "WorkflowRun", stage: str, artifact_url: str) -> Dict[str, Any]:
+        """What an approval policy may look at for a gate"""
+        artifact = Path(artifact_url).read_text(encoding='utf-8', errors='replace')
+        approved = self._approved_copy_path(run.workflow_dir, stage, artifact_url)
+        validation_key = STAGE_VALIDATION_KEYS.get(stage)
+        with span("diff against approved", 'validate', stage=stage):
+            ratio = diff_ratio(approved.read_text(encoding='utf-8', errors='replace'), artifact) \
+                if approved.exists() else None
+        return {
+            'stage': stage,
+            'artifact_chars': len(artifact),
+            'diff_ratio': ratio,
+            'validation': run.results['validation'].get(validation_key) if validation_key else None,
+            'tests': run.results['validation'].get('unit_tests'),
+            'similarity': run.similar[0]['similarity'] if run.similar else 0.0,
+            'tasks': len(run.results['tasks']) if 'tasks' in run.results else None,
+        }
 
-            print("✅ Architecture approved. Proceeding to planning...")
+    @staticmethod
+    def _approved_copy_path(workflow_dir: Path, stage: str, artifact_url: str) -> Path:
+        return workflow_dir / APPROVED_DIR / f"{stage}__{Path(artifact_url).name}"
 
-            # ========== STAGE 3: Implementation Planning ==========
-            print("\n" + "="*60)
-            print("📝 STAGE 3: Implementation Planning")
-            print("="*60)
+    def _keep_approved_copy(self, workflow_dir: Path, stage: str, artifact_url: str) -> None:
+        """Keep the approved version of an artifact; the next run of the ticket overwrites the original"""
+        try:
+            path = self._approved_copy_path(workflow_dir, stage, artifact_url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(artifact_url, path)
+        except OSError as e:
+            print(f"⚠️  Could not keep approved copy of {artifact_url}: {e}")
+
+    # ---- Stage handlers ----
+
+    def _stage_requirements(self, run: "WorkflowRun", outputs: Dict[str, Any]) -> StageOutcome:
+        requirements_output = self.requirements_ai.analyze_large_requirements(
+            run.requirements_doc, 
+            run.context,
+            cache_dir=str(self.cache_dir / "requirements_chunks"),
+            reference=self._similar_reference(run.similar, 'requirements')
+        )
+        
+        with span("validate requirements", 'validate'):
+            req_validation = self.requirements_ai.validate_output(requirements_output)
+        run.results['validation']['requirements'] = req_validation
 
-            # Retry logic for timeout and overload errors
+        if not req_validation['is_valid']:
+            print(f"\n❌ Requirements validation failed:")
+            print(f"   Validation details: {req_validation}")
+            raise ValueError("Requirements validation failed")
+        
+        req_path = self._save_local_artifact(
+            run.workflow_dir,
+            'FEATURE_REQUIREMENTS.md', 
+            requirements_output
+        )
+        run.results['artifacts']['requirements'] = str(req_path)
+        return StageOutcome({'document': requirements_output}, str(req_path))
+
+    def _stage_architecture(self, run: "WorkflowRun", outputs: Dict[str, Any]) -> StageOutcome:
+        architecture_output = self.architect_ai.design_architecture(
+            outputs['requirements']['document'],
+            run.context,
+            reference=self._similar_reference(run.similar, 'architecture')
+        )
+
+        with span("validate architecture", 'validate'):
+            arch_validation = self.architect_ai.validate_output(architecture_output)
+        run.results['validation']['architecture'] = arch_validation
+
+        if not arch_validation['is_valid']:
+            print(f"\n❌ Architecture validation failed:")
+            print(f"   Validation details: {arch_validation}")
+            raise ValueError("Architecture validation failed")
+
+        arch_path = self._save_local_artifact(
+            run.workflow_dir,
+            'SYSTEM_DESIGN.md',
+            architecture_output
+        )
+        run.results['artifacts']['architecture'] = str(arch_path)
+        return StageOutcome({'document': architecture_output}, str(arch_path))
+
+    def _stage_planning(self, run: "WorkflowRun", outputs: Dict[str, Any]) -> StageOutcome:
+        plan_output = self.planner_ai.create_implementation_plan(
+            outputs['requirements']['document'],
+            outputs['architecture']['document'],
+            run.context,
+            reference=self._similar_reference(run.similar, 'planning')
+        )
+
+        plan_path = self._save_local_artifact(
+            run.workflow_dir,
+            'IMPLEMENTATION_PLAN.md',
+            plan_output
+        )
+        run.results['artifacts']['plan'] = str(plan_path)
+
+        with span("parse tasks", 'parse') as parse_span:
+            tasks = self.planner_ai.extract_tasks(plan_output)
+            parse_span.set(tasks=len(tasks))
+        run.results['tasks'] = tasks
+        print(f"📋 Tasks identified: {len(tasks)}")
+        return StageOutcome({'document': plan_output, 'tasks': tasks}, str(plan_path))
+
+    def _stage_code_generation(self, run: "WorkflowRun", outputs: Dict[str, Any]) -> StageOutcome:
+        architecture_output = outputs['architecture']['document']
+        tasks = outputs['planning']['tasks']
+        coding_standards = run.context.get('coding_standards') if run.context else None
+        generated_files = {}
+        # Files are materialised under code/ as each task's output arrives
+        code_dir = run.workflow_dir / CODE_DIR
+        shutil.rmtree(code_dir, ignore_errors=True)
+
+        if self.code_search:
+            stats = self.code_search.refresh()
+            print(f"🔎 Code search index: {stats['files']} files, {stats['chunks']} snippets "
+                  f"({stats['changed']} updated in {stats['duration_seconds']}s)")
+
+        for i, task in enumerate(tasks[:3], 1):
+            print(f"\n  [{i}/{min(3, len(tasks))}] Generating code for: {task.get('name', 'Unknown task')}")
+
+            code_context = None
+            if self.code_search:
+                query = " ".join(str(value) for value in task.values())
+                with span("retrieve code context", 'retrieval', task=i):
+                    code_context = self.code_search.retrieve_context(query, token_budget=1500)
+
+            # Retry logic for each code generation task
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    print(f"   Attempt {attempt + 1}/{max_retries}...")
-                    plan_output = self.planner_ai.create_implementation_plan(
-                        requirements_output,
-                        architecture_output,
-                        context
-                    )
+                    if attempt > 0:
+                        print(f"     Attempt {attempt + 1}/{max_retries}...")
+                    with span(f"code task {i}", 'attempt', task=task.get('name'), attempt=attempt + 1) as task_span:
+                        files = self.developer_ai.generate_code(
+                            task,
+                            architecture_output,
+                            coding_standards,
+                            code_context
+                        )
+                        task_span.set(files=len(files))
+                    generated_files.update(files)
+                    with span(f"write {CODE_DIR}/", 'artifact', files=len(files)):
+                        write_files(code_dir, files)
                     break  # Success, exit retry loop
+                except WorkflowCancelled:
+                    raise
                 except Exception as e:
                     error_str = str(e).lower()
-                    # Check for timeout (504) or overload (503) errors
                     if "timeout" in error_str or "504" in str(e) or "503" in str(e) or "overloaded" in error_str:
                         if attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 10  # Exponential backoff: 10s, 20s, 30s
-                            print(f"   ⚠️  API error occurred (timeout/overload), waiting {wait_time}s before retry...")
-                            time.sleep(wait_time)
+                            wait_time = (attempt + 1) * 5  # Shorter backoff: 5s, 10s, 15s
+                            print(f"     ⚠️  API error, waiting {wait_time}s before retry...")
+                            with span("retry sleep", 'retry', task=i, attempt=attempt + 1, seconds=wait_time):
+                                cancellable_sleep(wait_time)
                             continue
                         else:
-                            print(f"   ❌ Failed after {max_retries} attempts")
+                            print(f"     ❌ Failed after {max_retries} attempts")
                             raise
                     else:
-                        raise  # Re-raise non-retryable errors
-
-            plan_path = self._save_local_artifact(
-                workflow_dir,
-                'IMPLEMENTATION_PLAN.md',
-                plan_output
+                        raise
+
+        code_path = None
+        if generated_files:
+            generated_files, verification = self._verify_generated_code(
+                generated_files,
+                architecture_output,
+                coding_standards
             )
-            results['artifacts']['plan'] = str(plan_path)
-
-            tasks = self.planner_ai.extract_tasks(plan_output)
-            results['tasks'] = tasks
-
-            # APPROVAL GATE 3
-            print(f"\n🚦 APPROVAL GATE 3: Implementation Plan Review")
-            print(f"📄 Review document: {plan_path}")
-            print(f"📋 Tasks identified: {len(tasks)}")
-
-            approval_3 = self._request_approval(
-                None if not self.db else self.db.collection('workflows').document(ticket_id),
-                stage="planning",
-                artifact_url=str(plan_path),
-                callback=approval_callback
+            run.results['validation']['generated_code'] = {
+                'is_valid': verification['is_valid'],
+                'failed': verification['failed'],
+                'import_warnings': verification['warnings'],
+                'fix_rounds': verification['fix_rounds'],
+            }
+            self._save_local_artifact(
+                run.workflow_dir,
+                'CODE_VERIFICATION.json',
+                json.dumps(verification, indent=2, default=str)
             )
+            if verification['fix_rounds']:
+                with span(f"write {CODE_DIR}/", 'artifact', files=len(generated_files)):
+                    write_files(code_dir, generated_files)
+            self.state_store.record_artifact(run.ticket_id, CODE_DIR, str(code_dir))
+
+            code_path = self._save_generated_code(run.workflow_dir, generated_files)
+            run.results['artifacts']['generated_code'] = str(code_path)
+            print(f"\n✅ Generated {len(generated_files)} code files")
+
+        return StageOutcome({'generated_files': generated_files}, str(code_path) if code_path else None)
+
+    def _stage_unit_tests(self, run: "WorkflowRun", outputs: Dict[str, Any]) -> StageOutcome:
+        generated_files = outputs['code_generation']['generated_files']
+        test_files = self.unit_test_ai.generate_test_files(
+            code_files=generated_files,
+            architecture=outputs['architecture']['document'],
+            coding_standards=run.context.get('coding_standards') if run.context else None,
+            test_framework="pytest"
+        )
+
+        print(f"\n▶️  Running {len(test_files)} test files in sandbox...")
+        with span("run tests", 'validate', test_files=len(test_files)) as run_span:
+            test_results = self.test_runner.run(generated_files, test_files)
+            run_span.set(passed=test_results['passed'], failed=test_results['failed'],
+                         cache_hits=test_results['cache_hits'])
+        run.results['validation']['unit_tests'] = {
+            'all_passed': test_results['all_passed'],
+            'passed': test_results['passed'],
+            'failed': test_results['failed'],
+            'errors': test_results['errors'],
+            'cache_hits': test_results['cache_hits'],
+            'duration_seconds': test_results['duration_seconds'],
+        }
+        print(f"   {test_results['passed']} passed, {test_results['failed']} failed, "
+              f"{test_results['errors']} errors in {test_results['duration_seconds']}s "
+              f"({test_results['cache_hits']} cached)")
+
+        test_summary = self.unit_test_ai.generate_test_summary(test_files, test_results)
+
+        test_path = self._save_test_files(run.workflow_dir, test_files, test_results)
+        tests_dir = run.workflow_dir / TESTS_DIR
+        shutil.rmtree(tests_dir, ignore_errors=True)
+        with span(f"write {TESTS_DIR}/", 'artifact', files=len(test_files)):
+            write_files(tests_dir, test_files)
+        self.state_store.record_artifact(run.ticket_id, TESTS_DIR, str(tests_dir))
+        test_summary_path = self._save_local_artifact(
+            run.workflow_dir,
+            'TEST_SUMMARY.md',
+            test_summary
+        )
+
+        run.results['artifacts']['unit_tests'] = str(test_path)
+        run.results['artifacts']['test_summary'] = str(test_summary_path)
+
+        print(f"\n✅ Generated {len(test_files)} test files")
+        return StageOutcome({'test_files': test_files, 'test_results': test_results}, str(test_summary_path))
+
+    def _verify_generated_code(
+        self,
+        generated_files: Dict[str, str],
+        architecture: str,
+        coding_standards: Optional[str] = None,
+        max_fix_rounds: int = 2
+    ) -> tuple:
+        """
+        Verify generated files and send only the failing ones back to Developer AI.
 
-            results['approvals']['planning'] = approval_3
-
-            if approval_3 != ApprovalStatus.APPROVED:
-                print("❌ Implementation plan not approved. Workflow stopped.")
-                return results
-
-            print("✅ Implementation plan approved. Proceeding to code generation...")
-
-            # ========== STAGE 4: Code Generation ==========
-            print("\n" + "="*60)
-            print("💻 STAGE 4: Code Generation")
-            print("="*60)
-
-            generated_files = {}
-
-            for i, task in enumerate(tasks[:3], 1):
-                print(f"\n  [{i}/{min(3, len(tasks))}] Generating code for: {task.get('name', 'Unknown task')}")
-
-                # Retry logic for each code generation task
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        if attempt > 0:
-                            print(f"     Attempt {attempt + 1}/{max_retries}...")
-                        files = self.developer_ai.generate_code(
-                            task,
-                            architecture_output,
-                            context.get('coding_standards') if context else None
-                        )
-                        generated_files.update(files)
-                        break  # Success, exit retry loop
-                    except Exception as e:
-                        error_str = str(e).lower()
-                        if "timeout" in error_str or "504" in str(e) or "503" in str(e) or "overloaded" in error_str:
-                            if attempt < max_retries - 1:
-                                wait_time = (attempt + 1) * 5  # Shorter backoff: 5s, 10s, 15s
-                                print(f"     ⚠️  API error, waiting {wait_time}s before retry...")
-                                time.sleep(wait_time)
-                                continue
-                            else:
-                                print(f"     ❌ Failed after {max_retries} attempts")
-                                raise
-                        else:
-                            raise
-
-            if generated_files:
-                code_path = self._save_generated_code(workflow_dir, generated_files)
-                results['artifacts']['generated_code'] = str(code_path)
-                print(f"\n✅ Generated {len(generated_files)} code files")
-
-            # APPROVAL GATE 4
-            print(f"\n🚦 APPROVAL GATE 4: Generated Code Review")
-            print(f"📄 Review code: {code_path}")
-            print(f"📁 Files generated: {len(generated_files)}")
-
-            approval_4 = self._request_approval(
-                None if not self.db else self.db.collection('workflows').document(ticket_id),
-                stage="code_generation",
-                artifact_url=str(code_path),
-                callback=approval_callback
-            )
-
-            results['approvals']['code_generation'] = approval_4
-
-            if approval_4 != ApprovalStatus.APPROVED:
-                print("❌ Generated code not approved. Workflow stopped.")
-                return results
-
-            print("✅ Generated code approved. Workflow complete!")
-
-            # ========== STAGE 5: Unit Test Generation (COMMENTED OUT - TO BE ADDED LATER) ==========
-            # print("\n" + "="*60)
-            # print("🧪 STAGE 5: Unit Test Generation")
-            # print("="*60)
-
-            # test_files = self.unit_test_ai.generate_unit_tests(
-            #     code_files=generated_files,
-            #     architecture=architecture_output,
-            #     coding_standards=context.get('coding_standards') if context else None,
-            #     test_framework="pytest"
-            # )
-
-            # test_summary = self.unit_test_ai.generate_test_summary(test_files)
-
-            # test_path = self._save_test_files(workflow_dir, test_files)
-            # test_summary_path = self._save_local_artifact(
-            #     workflow_dir,
-            #     'TEST_SUMMARY.md',
-            #     test_summary
-            # )
-
-            # results['artifacts']['unit_tests'] = str(test_path)
-            # results['artifacts']['test_summary'] = str(test_summary_path)
-
-            # print(f"\n✅ Generated {len(test_files)} test files")
-
-            # # APPROVAL GATE 5
-            # print(f"\n🚦 APPROVAL GATE 5: Unit Tests Review")
-            # print(f"📄 Review tests: {test_path}")
-            # print(f"📄 Test summary: {test_summary_path}")
-
-            # approval_5 = self._request_approval(
-            #     None if not self.db else self.db.collection('workflows').document(ticket_id),
-            #     stage="unit_tests",
-            #     artifact_url=str(test_summary_path),
-            #     callback=approval_callback
-            # )
-
-            # results['approvals']['unit_tests'] = approval_5
-
-            # if approval_5 != ApprovalStatus.APPROVED:
-            #     print("❌ Unit tests not approved. Workflow stopped.")
-            #     return results
-
-            # print("✅ Unit tests approved. Workflow complete!")
-
-            print("\n" + "="*60)
-            print("✅ WORKFLOW COMPLETED SUCCESSFULLY")
-            print("="*60)
-
-        except Exception as e:
-            print(f"\n❌ Workflow failed: {str(e)}")
-            results['errors'].append(str(e))
-            import traceback
-            traceback.print_exc()
+        Returns:
+            (generated_files with fixes applied, final verification report)
+        """
+        print("\n🔍 Verifying generated code (syntax/imports)...")
+        with span("verify code", 'validate', files=len(generated_files)):
+            verification = self.code_verifier.verify_files(generated_files)
+        fix_rounds = 0
+
+        while not verification['is_valid'] and fix_rounds < max_fix_rounds:
+            fix_rounds += 1
+            failures = {name: verification['results'][name] for name in verification['failed']}
+            print(f"   ⚠️  {len(failures)} file(s) failed verification, regenerating (round {fix_rounds}/{max_fix_rounds})...")
+            for name, result in failures.items():
+                print(f"      - {name}: {result['error']} (line {result['line']})")
+
+            try:
+                fixed = self.developer_ai.fix_files(
+                    failures,
+                    generated_files,
+                    architecture,
+                    coding_standards
+                )
+            except Exception as e:
+                print(f"   ⚠️  Targeted regeneration failed: {e}")
+                break
 
-        return results
+            if not fixed:
+                break
+            generated_files = {**generated_files, **fixed}
+            with span("verify code", 'validate', files=len(generated_files), fix_round=fix_rounds):
+                verification = self.code_verifier.verify_files(generated_files)
+
+        if verification['is_valid']:
+            print(f"   ✅ All {len(generated_files)} files passed verification")
+        else:
+            print(f"   ❌ {len(verification['failed'])} file(s) still failing, flagged for review")
+
+        verification['fix_rounds'] = fix_rounds
+        return generated_files, verification
+
+    @staticmethod
+    def _similar_reference(similar: List[Dict[str, Any]], stage: str, max_chars: int = 3000) -> Optional[str]:
+        """Excerpt of the best similar workflow's approved artifact for stage, if it still exists"""
+        for match in similar:
+            path = match['artifacts'].get(SIMILAR_SEED_ARTIFACTS[stage])
+            if path and Path(path).exists():
+                text = Path(path).read_text(encoding='utf-8')
+                return (
+                    f"Approved {Path(path).name} of ticket {match['ticket_id']} "
+                    f"({match['similarity']:.0%} similar requirements). Reuse its structure and any parts "
+                    f"that apply; adapt everything to the current requirements.\n\n"
+                    f"{get_artifact_index(text).excerpt(max_chars)}"
+                )
+        return None
+
+    def _finish_workflow(self, ticket_id: str, status: str, error: Optional[str] = None) -> None:
+        """
+        Record the final workflow status (and fail or cancel the running stages
+        on errors) locally and in the Firestore workflow document, which other
+        nodes and their status feeds read.
+        """
+        if error:
+            workflow = self.state_store.get_workflow(ticket_id) or {'stages': []}
+            stage_status = 'CANCELLED' if status == 'CANCELLED' else 'FAILED'
+            for stage in workflow['stages']:
+                if stage['status'] == 'RUNNING':
+                    self.state_store.finish_stage(ticket_id, stage['stage'], status=stage_status)
+        completed_at = datetime.utcnow()
+        self.state_store.update_workflow(
+            ticket_id,
+            status=status,
+            completed_at=completed_at.isoformat(),
+            error=error
+        )
+        if self.db:
+            try:
+                self.db.collection('workflows').document(ticket_id).update({
+                    'status': status,
+                    'completed_at': completed_at,
+                    'error': error
+                })
+            except Exception as e:
+                # The local record stands; don't let Firestore mask the workflow's own outcome
+                print(f"⚠️  Could not record final status of {ticket_id} in Firestore: {e}")
 
     def _request_approval(
         self,
         workflow_ref,
         stage: str,
         artifact_url: str,
-        callback: Optional[Callable] = None
+        callback: Optional[Callable] = None,
+        ticket_id: Optional[str] = None,
+        policy: Optional[ApprovalPolicy] = None,
+        evidence: Optional[Dict[str, Any]] = None
     ) -> ApprovalStatus:
-        """Request human approval for a workflow stage."""
+        """
+        Request approval for a workflow stage.
+
+        With a policy, a gate it finds low-risk is approved automatically;
+        everything else goes to the callback or the console. Every decision
+        is written to the approval audit log.
+        """
 
         approval_data = {
             'stage': stage,
@@ -407,56 +1021,75 @@ class WorkflowOrchestrator:
             workflow_ref.update({
                 f'approval_gates.{stage}': approval_data
             })
-
-        # If callback provided, use it
-        if callback:
-            approval_status = callback(stage, artifact_url)
-            if workflow_ref:
-                approval_data['status'] = approval_status.value
-                approval_data['approved_at'] = datetime.utcnow()
-                workflow_ref.update({
-                    f'approval_gates.{stage}': approval_data
-                })
-            return approval_status
-
-        # Manual approval
-        print("\n" + "-"*60)
-        print(f"APPROVAL REQUIRED: {stage.upper()}")
-        print(f"Artifact: {artifact_url}")
-        print("-"*60)
-        print("\nOptions:")
-        print("  1. APPROVED - Proceed to next stage")
-        print("  2. REJECTED - Stop workflow")
-        print("  3. CHANGES_REQUESTED - Request modifications")
-
-        while True:
-            choice = input("\nEnter your choice (1/2/3): ").strip()
-
-            if choice == "1":
-                status = ApprovalStatus.APPROVED
-                break
-            elif choice == "2":
-                status = ApprovalStatus.REJECTED
-                break
-            elif choice == "3":
-                status = ApprovalStatus.CHANGES_REQUESTED
-                break
+        if ticket_id:
+            self.state_store.record_approval(ticket_id, stage, ApprovalStatus.PENDING.value, artifact_url)
+
+        decision = None
+        if policy is not None and evidence is not None:
+            with span(f"policy {stage}", 'gate', policy=policy.name) as policy_span:
+                decision = policy.evaluate(stage, evidence)
+                policy_span.set(auto_approve=decision.auto_approve)
+
+        if decision and decision.auto_approve:
+            print(f"🛂 Auto-approved by policy {policy.name} ({', '.join(decision.checks)})")
+            status, decided_by = ApprovalStatus.APPROVED, 'policy'
+        else:
+            if decision:
+                print(f"🛂 Policy {policy.name} needs a reviewer: {'; '.join(decision.reasons)}")
+            if callback:
+                status, decided_by = callback(stage, artifact_url), 'callback'
             else:
-                print("Invalid choice. Please enter 1, 2, or 3.")
-
+                status, decided_by = self._console_approval(stage, artifact_url), 'console'
+
+        if ticket_id:
+            self.state_store.record_approval(ticket_id, stage, status.value)
+            self.state_store.record_audit(
+                ticket_id, stage, status.value, decided_by,
+                artifact_url=artifact_url,
+                policy=policy.name if policy else None,
+                checks=decision.checks if decision else None,
+                reasons=decision.reasons if decision else None
+            )
         if workflow_ref:
             approval_data['status'] = status.value
             approval_data['approved_at'] = datetime.utcnow()
+            approval_data['decided_by'] = decided_by
             workflow_ref.update({
                 f'approval_gates.{stage}': approval_data
             })
 
         return status
 
+    def _console_approval(self, stage: str, artifact_url: str) -> ApprovalStatus:
+        """Manual approval"""
+        with self._console_lock:
+            print("\n" + "-"*60)
+            print(f"APPROVAL REQUIRED: {stage.upper()}")
+            print(f"Artifact: {artifact_url}")
+            print("-"*60)
+            print("\nOptions:")
+            print("  1. APPROVED - Proceed to next stage")
+            print("  2. REJECTED - Stop workflow")
+            print("  3. CHANGES_REQUESTED - Request modifications")
+
+            while True:
+                choice = input("\nEnter your choice (1/2/3): ").strip()
+
+                if choice == "1":
+                    return ApprovalStatus.APPROVED
+                elif choice == "2":
+                    return ApprovalStatus.REJECTED
+                elif choice == "3":
+                    return ApprovalStatus.CHANGES_REQUESTED
+                else:
+                    print("Invalid choice. Please enter 1, 2, or 3.")
+
     def _save_local_artifact(self, workflow_dir: Path, filename: str, content: str) -> Path:
         """Save artifact to local filesystem"""
         file_path = workflow_dir / filename
-        file_path.write_text(content, encoding='utf-8')
+        with span(f"write {filename}", 'artifact', bytes=len(content)):
+            file_path.write_text(content, encoding='utf-8')
+            self.state_store.record_artifact(workflow_dir.name, filename, str(file_path))
         return file_path
 
     def _save_generated_code(self, workflow_dir: Path, files: Dict[str, str]) -> Path:
@@ -467,27 +1100,150 @@ class WorkflowOrchestrator:
         }
 
         file_path = workflow_dir / 'generated_code.json'
-        file_path.write_text(json.dumps(code_bundle, indent=2), encoding='utf-8')
+        with span("write generated_code.json", 'artifact', files=len(files)):
+            file_path.write_text(json.dumps(code_bundle, indent=2), encoding='utf-8')
+            self.state_store.record_artifact(workflow_dir.name, 'generated_code.json', str(file_path))
         return file_path
 
-    def _save_test_files(self, workflow_dir: Path, test_files: Dict[str, str]) -> Path:
-        """Save generated test files"""
+    def _save_test_files(
+        self,
+        workflow_dir: Path,
+        test_files: Dict[str, str],
+        test_results: Optional[Dict[str, Any]] = None
+    ) -> Path:
+        """Save generated test files (with execution results when available)"""
         test_bundle = {
             'generated_at': datetime.utcnow().isoformat(),
             'test_files': test_files
         }
+        if test_results is not None:
+            test_bundle['test_results'] = test_results
 
         file_path = workflow_dir / 'unit_tests.json'
-        file_path.write_text(json.dumps(test_bundle, indent=2), encoding='utf-8')
+        with span("write unit_tests.json", 'artifact', files=len(test_files)):
+            file_path.write_text(json.dumps(test_bundle, indent=2), encoding='utf-8')
+            self.state_store.record_artifact(workflow_dir.name, 'unit_tests.json', str(file_path))
         return file_path
 
+    def workflow_files(
+        self,
+        ticket_id: str,
+        parts: tuple = (CODE_DIR, TESTS_DIR),
+        output_dir: Optional[str] = None
+    ) -> List[tuple]:
+        """
+        (archive name, path) of a workflow's generated files on disk, for download.
+
+        Workflows from before files were materialised only have the JSON
+        bundles; their files are written out on first request.
+        """
+        workflow_dir = Path(output_dir or self.output_dir) / ticket_id
+        bundles = {CODE_DIR: ('generated_code.json', 'files'), TESTS_DIR: ('unit_tests.json', 'test_files')}
+        entries = []
+        for part in parts:
+            part_dir = workflow_dir / part
+            bundle_file, key = bundles[part]
+            if not part_dir.is_dir() and (workflow_dir / bundle_file).exists():
+                bundle = json.loads((workflow_dir / bundle_file).read_text(encoding='utf-8'))
+                write_files(part_dir, bundle.get(key, {}))
+            entries.extend(list_files(part_dir, prefix=f"{ticket_id}/{part}"))
+        return entries
+
+    def record_review(
+        self,
+        ticket_id: str,
+        stage: str,
+        status: ApprovalStatus,
+        artifact_url: Optional[str] = None,
+        reasons: Optional[List[str]] = None
+    ) -> None:
+        """Record a reviewer's decision on a gate that was held for review (e.g. of a queue job)"""
+        self.state_store.record_approval(ticket_id, stage, status.value, artifact_url)
+        self.state_store.record_audit(ticket_id, stage, status.value, 'reviewer', artifact_url=artifact_url, reasons=reasons)
+        if self.db:
+            try:
+                self.db.collection('workflows').document(ticket_id).update({
+                    f'approval_gates.{stage}.status': status.value,
+                    f'approval_gates.{stage}.approved_at': datetime.utcnow(),
+                    f'approval_gates.{stage}.decided_by': 'reviewer'
+                })
+            except Exception as e:
+                print(f"⚠️  Could not record review of {ticket_id} in Firestore: {e}")
+
+    def approval_audit(self, ticket_id: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """Gate decisions of a ticket across its runs: who decided, under which policy, and why"""
+        return self.state_store.list_audit(ticket_id, limit=limit)
+
+    def trace_path(self, ticket_id: str, output_dir: Optional[str] = None) -> Optional[Path]:
+        """Chrome trace of a workflow's last run, if one was written"""
+        path = Path(output_dir or self.output_dir) / ticket_id / TRACE_FILENAME
+        return path if path.exists() else None
+
+    # ---- Status push ----
+
+    def _publish_status(self, ticket_id: str, change: Dict[str, Any]) -> None:
+        """Push a state change, with the workflow's new snapshot, to the ticket's watchers"""
+        if not self.status_hub.has_subscribers(ticket_id):
+            return
+        self.status_hub.publish(ticket_id, {**change, 'workflow': self.state_store.get_workflow(ticket_id)})
+
+    def _watch_firestore(self, ticket_id: str, publish: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """Firestore snapshot listener for a watched ticket; returns its unsubscribe"""
+        def on_snapshot(docs, changes, read_time):
+            # Runs in this process publish their own transitions
+            if ticket_id in self._active_runs:
+                return
+            for doc in docs:
+                if doc.exists:
+                    data = doc.to_dict()
+                    publish({'type': 'workflow', 'status': data.get('status'), 'source': 'firestore', 'workflow': data})
+
+        watch = self.db.collection('workflows').document(ticket_id).on_snapshot(on_snapshot)
+        return watch.unsubscribe
+
     def get_workflow_status(self, ticket_id: str) -> Dict[str, Any]:
         """Get current status of a workflow"""
+        workflow = self.state_store.get_workflow(ticket_id)
+        if workflow:
+            return workflow
+
+        # Workflows executed by another instance are only in Firestore
         if not self.db:
-            return {'error': 'Database not available'}
+            return {'error': 'Workflow not found'}
+
+        # A watched workflow's listener already holds its latest document
+        latest = self.status_hub.latest(ticket_id)
+        if latest and latest.get('source') == 'firestore':
+            return latest['workflow']
 
         doc = self.db.collection('workflows').document(ticket_id).get()
         if doc.exists:
             return doc.to_dict()
         return {'error': 'Workflow not found'}
 
+    def list_workflows(
+        self,
+        status: Optional[str] = None,
+        ticket_prefix: Optional[str] = None,
+        started_after: Optional[str] = None,
+        started_before: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """List workflows from the local state store with filters and pagination"""
+        return self.state_store.list_workflows(
+            status=status,
+            ticket_prefix=ticket_prefix,
+            started_after=started_after,
+            started_before=started_before,
+            limit=limit,
+            offset=offset
+        )
+
+    def find_similar_workflows(self, requirements: str, k: int = 3, min_similarity: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Closest completed workflows to requirements (MinHash/LSH estimate of Jaccard similarity)"""
+        return self.similarity_index.query(
+            requirements,
+            k=k,
+            min_similarity=self.similarity_threshold if min_similarity is None else min_similarity
+        )
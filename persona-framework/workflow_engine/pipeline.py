@@ -0,0 +1,311 @@
+from typing import Dict, Any, List, Optional, Callable, Set
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+import contextvars
+import json
+import threading
+
+from utils.concurrency import is_throttle_error
+from utils.tracing import span
+from utils.budget import (
+    WorkflowCancelled, get_active_budget, check_cancelled, cancellable_sleep, use_stage_deadline
+)
+
+PIPELINES_DIR = Path(__file__).parent / "pipelines"
+DEFAULT_PIPELINE = "default"
+
+
+@dataclass
+class RetryPolicy:
+    """Stage-level retry: linear backoff (attempt * backoff_seconds) on transient errors"""
+    max_attempts: int = 1
+    backoff_seconds: float = 10.0
+    on: str = "transient"   # "transient" (timeouts, 429/503/504, overload) or "any"
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        if attempt >= self.max_attempts or isinstance(error, WorkflowCancelled):
+            return False
+        return self.on == "any" or is_throttle_error(error)
+
+
+@dataclass
+class StageSpec:
+    name: str
+    handler: str
+    title: str = ""
+    after: List[str] = field(default_factory=list)
+    gate: bool = True
+    when: Optional[str] = None      # "<stage>.<output>" that must be truthy for the stage to run
+    timeout_seconds: Optional[float] = None     # stage deadline, including retries
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+
+
+@dataclass
+class PipelineDefinition:
+    name: str
+    stages: List[StageSpec]
+    max_concurrency: int = 4
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PipelineDefinition":
+        stages = []
+        for raw in data.get('stages', []):
+            raw = dict(raw)
+            retry = RetryPolicy(**raw.pop('retry', {}))
+            raw.setdefault('handler', raw['name'])
+            stages.append(StageSpec(retry=retry, **raw))
+        definition = cls(
+            name=data.get('name', 'pipeline'),
+            stages=stages,
+            max_concurrency=data.get('max_concurrency', 4)
+        )
+        definition.validate()
+        return definition
+
+    def validate(self, handlers: Optional[Set[str]] = None) -> None:
+        """Check names, dependencies, handlers and that the stage graph is acyclic"""
+        names = [s.name for s in self.stages]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Pipeline {self.name}: duplicate stage names")
+        known = set(names)
+        for stage in self.stages:
+            missing = [dep for dep in stage.after if dep not in known]
+            if missing:
+                raise ValueError(f"Pipeline {self.name}: stage {stage.name} depends on unknown {missing}")
+            if stage.when and stage.when.split('.', 1)[0] not in stage.after:
+                raise ValueError(f"Pipeline {self.name}: stage {stage.name} 'when' must reference a dependency")
+            if handlers is not None and stage.handler not in handlers:
+                raise ValueError(f"Pipeline {self.name}: no handler named {stage.handler}")
+        self.topological_order()
+
+    def topological_order(self) -> List[StageSpec]:
+        by_name = {s.name: s for s in self.stages}
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline {self.name}: dependency cycle at {name}")
+            visiting.add(name)
+            for dep in by_name[name].after:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(by_name[name])
+
+        for stage in self.stages:
+            visit(stage.name)
+        return ordered
+
+
+def load_pipeline(name_or_path: Optional[str] = None) -> PipelineDefinition:
+    """
+    Load a pipeline definition by name (workflow_engine/pipelines/<name>.json|yaml)
+    or by path. YAML definitions need PyYAML installed.
+    """
+    name_or_path = name_or_path or DEFAULT_PIPELINE
+    path = Path(name_or_path)
+    if not path.suffix:
+        candidates = [PIPELINES_DIR / f"{name_or_path}{ext}" for ext in ('.json', '.yaml', '.yml')]
+        path = next((c for c in candidates if c.exists()), candidates[0])
+    if not path.exists():
+        raise FileNotFoundError(f"Pipeline definition not found: {name_or_path}")
+
+    text = path.read_text(encoding='utf-8')
+    if path.suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("PyYAML is required for YAML pipeline definitions (pip install pyyaml)")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    return PipelineDefinition.from_dict(data)
+
+
+@dataclass
+class StageOutcome:
+    """What a stage handler produced: outputs for later stages and the artifact to review"""
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    artifact_url: Optional[str] = None
+
+
+class PipelineStopped(Exception):
+    """A gate was not approved; carries the approval status and the stage's outcome"""
+
+    def __init__(self, stage: str, status, outcome: Optional["StageOutcome"] = None):
+        super().__init__(f"{stage} not approved ({status.value})")
+        self.stage = stage
+        self.status = status
+        self.outcome = outcome
+
+
+class PipelineEngine:
+    """
+    Runs a PipelineDefinition as a DAG.
+
+    Stages whose dependencies have completed (and passed their gates) run
+    concurrently up to max_concurrency; each receives the outputs of all
+    completed stages. Gates are requested one at a time as stages finish.
+    A rejected gate stops scheduling new stages; a failing stage (after its
+    retries) fails the run and cancels the active workflow budget, so stages
+    still running in parallel stop spending model calls.
+    """
+
+    def __init__(
+        self,
+        definition: PipelineDefinition,
+        handlers: Dict[str, Callable[[Dict[str, Any]], StageOutcome]],
+        on_stage_start: Optional[Callable[[StageSpec, int], None]] = None,
+        on_stage_finish: Optional[Callable[[StageSpec, StageOutcome], None]] = None,
+        request_gate: Optional[Callable[[StageSpec, StageOutcome], Any]] = None,
+        is_approved: Callable[[Any], bool] = lambda status: True,
+        on_stage_complete: Optional[Callable[[StageSpec, StageOutcome], None]] = None
+    ):
+        definition.validate(set(handlers))
+        self.definition = definition
+        self.handlers = handlers
+        self.on_stage_start = on_stage_start
+        self.on_stage_finish = on_stage_finish
+        self.request_gate = request_gate
+        self.is_approved = is_approved
+        self.on_stage_complete = on_stage_complete
+        self._gate_lock = threading.Lock()
+
+    def run(self, outputs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Execute all stages.
+
+        Args:
+            outputs: Initial inputs (available to every stage under their own keys).
+                A stage whose name is already present counts as completed and
+                approved, so a checkpointed run resumes after it.
+
+        Returns:
+            {'outputs': {stage: {...}}, 'completed': [...], 'skipped': [...]}
+
+        Raises:
+            PipelineStopped: a gate was not approved
+            WorkflowCancelled: the workflow was cancelled or ran past a deadline
+            Exception: the first stage failure
+        """
+        outputs = dict(outputs or {})
+        order = self.definition.topological_order()
+        numbers = {stage.name: i for i, stage in enumerate(order, 1)}
+        pending = {stage.name: stage for stage in order}
+        completed: List[str] = [name for name in pending if name in outputs]
+        skipped: List[str] = []
+        for name in completed:
+            pending.pop(name)
+            print(f"⏩ {name} already approved, not re-running it")
+        running = {}
+        stopped: Optional[PipelineStopped] = None
+        failure: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=max(1, self.definition.max_concurrency)) as pool:
+            while True:
+                if stopped is None and failure is None:
+                    try:
+                        check_cancelled()
+                    except WorkflowCancelled as e:
+                        failure = e
+                        continue
+                    for name in [n for n, stage in pending.items() if self._ready(stage, completed, skipped)]:
+                        stage = pending.pop(name)
+                        if stage.when and not self._lookup(outputs, stage.when):
+                            print(f"⏭️  Skipping {stage.name} ({stage.when} is empty)")
+                            skipped.append(stage.name)
+                            continue
+                        snapshot = dict(outputs)
+                        future = pool.submit(
+                            contextvars.copy_context().run, self._run_stage, stage, numbers[name], snapshot
+                        )
+                        running[future] = stage
+                    # Skipping can make further stages ready without anything running
+                    if any(self._ready(s, completed, skipped) for s in pending.values()):
+                        continue
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        outcome = future.result()
+                    except BaseException as e:
+                        if failure is None:
+                            failure = e
+                            self._cancel_running(stage, e, running)
+                        continue
+                    outputs[stage.name] = outcome.outputs
+                    if stopped is None and failure is None and stage.gate and self.request_gate:
+                        with self._gate_lock:
+                            try:
+                                check_cancelled()
+                            except WorkflowCancelled as e:
+                                failure = e
+                                continue
+                            with span(f"gate {stage.name}", 'gate', stage=stage.name) as gate_span:
+                                status = self.request_gate(stage, outcome)
+                                gate_span.set(status=getattr(status, 'value', status))
+                        if not self.is_approved(status):
+                            stopped = PipelineStopped(stage.name, status, outcome)
+                            continue
+                    completed.append(stage.name)
+                    if self.on_stage_complete:
+                        self.on_stage_complete(stage, outcome)
+
+        if failure is not None:
+            raise failure
+        if stopped is not None:
+            raise stopped
+        return {'outputs': outputs, 'completed': completed, 'skipped': skipped}
+
+    @staticmethod
+    def _cancel_running(stage: StageSpec, error: BaseException, running: Dict) -> None:
+        budget = get_active_budget()
+        if running and budget and not isinstance(error, WorkflowCancelled):
+            budget.cancel(f"stage {stage.name} failed")
+
+    @staticmethod
+    def _ready(stage: StageSpec, completed: List[str], skipped: List[str]) -> bool:
+        return all(dep in completed or dep in skipped for dep in stage.after)
+
+    @staticmethod
+    def _lookup(outputs: Dict[str, Any], path: str) -> Any:
+        stage, _, key = path.partition('.')
+        value = outputs.get(stage) or {}
+        return value.get(key) if key else value
+
+    def _run_stage(self, stage: StageSpec, number: int, outputs: Dict[str, Any]) -> StageOutcome:
+        if self.on_stage_start:
+            self.on_stage_start(stage, number)
+        handler = self.handlers[stage.handler]
+        attempt = 0
+        with use_stage_deadline(stage.name, stage.timeout_seconds), \
+                span(f"stage {stage.name}", 'stage', stage=stage.name, number=number) as stage_span:
+            while True:
+                attempt += 1
+                try:
+                    check_cancelled()
+                    if stage.retry.max_attempts > 1:
+                        print(f"   Attempt {attempt}/{stage.retry.max_attempts}...")
+                    with span(f"{stage.name} attempt {attempt}", 'attempt', attempt=attempt):
+                        outcome = handler(outputs)
+                    break
+                except Exception as e:
+                    if not stage.retry.should_retry(e, attempt):
+                        if attempt > 1:
+                            print(f"   ❌ Failed after {attempt} attempts")
+                        raise
+                    wait_time = attempt * stage.retry.backoff_seconds
+                    print(f"   ⚠️  API error occurred (timeout/overload), waiting {wait_time:.0f}s before retry...")
+                    with span("retry sleep", 'retry', stage=stage.name, attempt=attempt, seconds=wait_time):
+                        cancellable_sleep(wait_time)
+            stage_span.set(attempts=attempt, artifact=outcome.artifact_url)
+        if self.on_stage_finish:
+            self.on_stage_finish(stage, outcome)
+        return outcome
@@ -0,0 +1,225 @@
+from typing import Dict, Any, List, Optional, Callable
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import os
+import threading
+
+DEFAULT_PROJECT = "default"
+DEFAULT_CACHE_SIZE = 8
+
+
+class UnknownProject(KeyError):
+    """No project is configured under this key"""
+
+
+@dataclass
+class ProjectConfig:
+    """
+    One tenant: where its workflows keep state and artifacts, and its limits.
+
+    Without state_dir a project uses the shared .ai/ paths (WORKFLOW_STATE_DB,
+    SIMILARITY_INDEX_PATH, .ai/workflow), as a single-project deployment does.
+    """
+    key: str
+    gcp_project_id: str
+    bucket_name: str
+    project_root: Optional[str] = None
+    state_dir: Optional[str] = None
+    max_concurrent_workflows: Optional[int] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, key: str, data: Dict[str, Any], defaults: "ProjectConfig") -> "ProjectConfig":
+        unknown = set(data) - {
+            'gcp_project_id', 'bucket_name', 'project_root', 'state_dir', 'max_concurrent_workflows', 'context'
+        }
+        if unknown:
+            raise ValueError(f"Project {key}: unknown settings {sorted(unknown)}")
+        return cls(
+            key=key,
+            gcp_project_id=data.get('gcp_project_id', defaults.gcp_project_id),
+            bucket_name=data.get('bucket_name', defaults.bucket_name),
+            project_root=data.get('project_root'),
+            state_dir=data.get('state_dir', str(Path('.ai') / 'projects' / key)),
+            max_concurrent_workflows=data.get('max_concurrent_workflows'),
+            context=data.get('context') or {}
+        )
+
+
+def _create_orchestrator(config: ProjectConfig):
+    from workflow_engine.orchestrator import WorkflowOrchestrator
+
+    return WorkflowOrchestrator(
+        project_id=config.gcp_project_id,
+        bucket_name=config.bucket_name,
+        project_root=config.project_root,
+        state_dir=config.state_dir,
+        default_context=config.context,
+        max_concurrent_workflows=config.max_concurrent_workflows
+    )
+
+
+class _Entry:
+    def __init__(self, config: ProjectConfig):
+        self.config = config
+        self.orchestrator = None
+        self.leases = 0
+        self.ready = threading.Lock()
+
+
+class OrchestratorRegistry:
+    """
+    Per-project orchestrators, created on first use and kept in an LRU cache.
+
+    Each project gets its own orchestrator (state store, similarity index,
+    artifacts, GCP clients, default context and workflow quota). At most
+    max_size are kept; creating one more evicts the least recently used
+    orchestrator that is idle (no running workflows, status watchers or
+    leases) and shuts it down. Busy orchestrators are never evicted, so the
+    cache can exceed max_size while they all are.
+
+    Callers hold an orchestrator through lease() for as long as they use it.
+    """
+
+    def __init__(
+        self,
+        projects: Dict[str, ProjectConfig],
+        default_project: str = DEFAULT_PROJECT,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        factory: Callable[[ProjectConfig], Any] = _create_orchestrator
+    ):
+        """
+        Args:
+            projects: Project configs by key
+            default_project: Key used when a request names no project
+            max_size: Orchestrators kept before idle ones are evicted
+            factory: Builds an orchestrator from a ProjectConfig
+        """
+        if default_project not in projects:
+            raise ValueError(f"Default project {default_project} is not configured")
+        self.projects = projects
+        self.default_project = default_project
+        self.max_size = max(1, max_size)
+        self.factory = factory
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "OrchestratorRegistry":
+        """
+        The default project from GOOGLE_CLOUD_PROJECT / STORAGE_BUCKET /
+        PROJECT_ROOT, plus the projects of the PROJECTS_FILE JSON map
+        ({"<key>": {"project_root": ..., "state_dir": ..., "max_concurrent_workflows": ...,
+        "context": {...}, "gcp_project_id": ..., "bucket_name": ...}}).
+        A "default" entry in the file overrides the environment's.
+        """
+        default = ProjectConfig(
+            key=DEFAULT_PROJECT,
+            gcp_project_id=os.getenv('GOOGLE_CLOUD_PROJECT', 'local-project'),
+            bucket_name=os.getenv('STORAGE_BUCKET', 'local-bucket'),
+            project_root=os.getenv('PROJECT_ROOT')
+        )
+        projects = {DEFAULT_PROJECT: default}
+        projects_file = os.getenv('PROJECTS_FILE')
+        if projects_file:
+            data = json.loads(Path(projects_file).read_text(encoding='utf-8'))
+            for key, settings in data.items():
+                config = ProjectConfig.from_dict(key, settings, default)
+                if key == DEFAULT_PROJECT and 'state_dir' not in settings:
+                    config.state_dir = None
+                projects[key] = config
+        return cls(projects, max_size=int(os.getenv('PROJECT_CACHE_SIZE', str(DEFAULT_CACHE_SIZE))))
+
+    def has_project(self, project: Optional[str]) -> bool:
+        return (project or self.default_project) in self.projects
+
+    def project_keys(self) -> List[str]:
+        return sorted(self.projects)
+
+    def config(self, project: Optional[str] = None) -> ProjectConfig:
+        key = project or self.default_project
+        if key not in self.projects:
+            raise UnknownProject(key)
+        return self.projects[key]
+
+    @contextmanager
+    def lease(self, project: Optional[str] = None):
+        """Orchestrator of project (default project if None), protected from eviction while held"""
+        config = self.config(project)
+        with self._lock:
+            entry = self._entries.get(config.key)
+            if entry is None:
+                entry = self._entries[config.key] = _Entry(config)
+            self._entries.move_to_end(config.key)
+            entry.leases += 1
+        try:
+            # GCP clients are created outside the registry lock; other projects are not held up
+            with entry.ready:
+                if entry.orchestrator is None:
+                    print(f"🏗️  Creating orchestrator for project {config.key}")
+                    entry.orchestrator = self.factory(config)
+                    self.created += 1
+                    self._evict()
+            yield entry.orchestrator
+        finally:
+            with self._lock:
+                entry.leases -= 1
+
+    def get(self, project: Optional[str] = None):
+        """Orchestrator of project without a lease (it may be evicted once idle)"""
+        with self.lease(project) as orchestrator:
+            return orchestrator
+
+    def _evict(self) -> None:
+        evicted = []
+        with self._lock:
+            excess = len(self._entries) - self.max_size
+            for key, entry in list(self._entries.items()):
+                if excess <= 0:
+                    break
+                if entry.leases or entry.orchestrator is None or not entry.orchestrator.is_idle():
+                    continue
+                del self._entries[key]
+                evicted.append((key, entry.orchestrator))
+                excess -= 1
+        for key, orchestrator in evicted:
+            print(f"♻️  Evicting idle orchestrator for project {key}")
+            self._shutdown(key, orchestrator)
+            self.evicted += 1
+
+    def _shutdown(self, key: str, orchestrator) -> None:
+        try:
+            orchestrator.shutdown()
+        except Exception as e:
+            print(f"⚠️  Could not shut down orchestrator for project {key}: {e}")
+
+    def shutdown(self) -> None:
+        """Shut down every cached orchestrator"""
+        with self._lock:
+            entries, self._entries = list(self._entries.items()), OrderedDict()
+        for key, entry in entries:
+            if entry.orchestrator is not None:
+                self._shutdown(key, entry.orchestrator)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = [
+                {
+                    'project': key,
+                    'leases': entry.leases,
+                    'idle': entry.orchestrator.is_idle() if entry.orchestrator is not None else True
+                }
+                for key, entry in self._entries.items()
+            ]
+        return {
+            'default_project': self.default_project,
+            'max_size': self.max_size,
+            'cached': cached,
+            'created': self.created,
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,192 @@
+from typing import Dict, Any, List, Optional, Set
+from pathlib import Path
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SHINGLE_SIZE = 3
+INDEX_VERSION = 1
+
+_MASK_57 = (1 << 57) - 1
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word n-grams of the normalised text (single words for very short texts)"""
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text: str, num_perm: int = 128) -> List[int]:
+    """
+    One-permutation MinHash signature of text.
+
+    Each shingle is hashed once; the low bits pick one of num_perm bins and
+    each bin keeps its minimum. Empty bins borrow from the next filled bin
+    (rotation densification), so the fraction of equal positions between
+    two signatures estimates the Jaccard similarity of their shingle sets.
+    """
+    bin_bits = num_perm.bit_length() - 1
+    if 1 << bin_bits != num_perm:
+        raise ValueError("num_perm must be a power of two")
+
+    bins: List[Optional[int]] = [None] * num_perm
+    for shingle in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index, value = h & (num_perm - 1), (h >> bin_bits) & _MASK_57
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+
+    if all(b is None for b in bins):
+        return [0] * num_perm
+
+    signature = [0] * num_perm
+    for i in range(num_perm):
+        offset = 0
+        while bins[(i + offset) % num_perm] is None:
+            offset += 1
+        # Offset keeps borrowed values distinct from the bin they came from
+        signature[i] = bins[(i + offset) % num_perm] + offset * (_MASK_57 + 1)
+    return signature
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a) if a else 0.0
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index over the requirements of approved workflows.
+
+    Each completed workflow is stored with its requirements signature and
+    artifact paths. A query hashes the new requirements once, collects
+    candidates from matching LSH bands and ranks them by estimated Jaccard
+    similarity, so the closest prior workflows are found in milliseconds.
+    """
+
+    def __init__(self, index_path: str = ".ai/state/similarity_index.json", num_perm: int = 128, bands: int = 32):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.index_path = Path(index_path)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---- Persistence ----
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get('version') != INDEX_VERSION or data.get('num_perm') != self.num_perm:
+            return
+        for ticket_id, entry in data.get('entries', {}).items():
+            self._insert(ticket_id, entry)
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'version': INDEX_VERSION,
+            'num_perm': self.num_perm,
+            'entries': self.entries,
+        }), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    # ---- LSH ----
+
+    def _band_keys(self, signature: List[int]) -> List[str]:
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            keys.append(f"{band}:{hash(tuple(rows))}")
+        return keys
+
+    def _insert(self, ticket_id: str, entry: Dict[str, Any]) -> None:
+        self._remove(ticket_id)
+        self.entries[ticket_id] = entry
+        for key in self._band_keys(entry['signature']):
+            self._buckets.setdefault(key, set()).add(ticket_id)
+
+    def _remove(self, ticket_id: str) -> None:
+        entry = self.entries.pop(ticket_id, None)
+        if entry is None:
+            return
+        for key in self._band_keys(entry['signature']):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(ticket_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    # ---- Public API ----
+
+    def add(self, ticket_id: str, requirements: str, artifacts: Dict[str, str], title: Optional[str] = None) -> None:
+        """Index (or re-index) an approved workflow"""
+        if title is None:
+            title = requirements.strip().splitlines()[0][:120] if requirements.strip() else ticket_id
+        entry = {
+            'signature': minhash_signature(requirements, self.num_perm),
+            'artifacts': artifacts,
+            'title': title,
+            'added_at': datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self._insert(ticket_id, entry)
+            self._save()
+
+    def remove(self, ticket_id: str) -> None:
+        with self._lock:
+            self._remove(ticket_id)
+            self._save()
+
+    def query(
+        self,
+        requirements: str,
+        k: int = 3,
+        min_similarity: float = 0.5,
+        exclude: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the approved workflows most similar to requirements.
+
+        Returns:
+            Up to k matches, best first: {'ticket_id', 'similarity', 'title', 'artifacts'}
+        """
+        signature = minhash_signature(requirements, self.num_perm)
+        with self._lock:
+            candidates: Set[str] = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            candidates.discard(exclude)
+            scored = [
+                (estimate_similarity(signature, self.entries[ticket_id]['signature']), ticket_id)
+                for ticket_id in candidates
+            ]
+            scored.sort(reverse=True)
+            return [
+                {
+                    'ticket_id': ticket_id,
+                    'similarity': round(similarity, 3),
+                    'title': self.entries[ticket_id]['title'],
+                    'artifacts': dict(self.entries[ticket_id]['artifacts']),
+                }
+                for similarity, ticket_id in scored[:k]
+                if similarity >= min_similarity
+            ]
+
+    def __len__(self) -> int:
+        return len(self.entries)
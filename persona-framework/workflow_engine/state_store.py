@@ -0,0 +1,319 @@
+from typing import Dict, Any, List, Optional, Callable
+from pathlib import Path
+from datetime import datetime
+import json
+import sqlite3
+import threading
+import weakref
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflows (
+    ticket_id     TEXT PRIMARY KEY,
+    status        TEXT NOT NULL,
+    current_step  TEXT,
+    started_at    TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    completed_at  TEXT,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_workflows_status ON workflows(status, started_at);
+CREATE INDEX IF NOT EXISTS idx_workflows_started ON workflows(started_at);
+
+CREATE TABLE IF NOT EXISTS stages (
+    ticket_id         TEXT NOT NULL,
+    stage             TEXT NOT NULL,
+    status            TEXT NOT NULL,
+    started_at        TEXT NOT NULL,
+    completed_at      TEXT,
+    duration_seconds  REAL,
+    PRIMARY KEY (ticket_id, stage)
+);
+
+CREATE TABLE IF NOT EXISTS approvals (
+    ticket_id     TEXT NOT NULL,
+    stage         TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    artifact_url  TEXT,
+    requested_at  TEXT NOT NULL,
+    decided_at    TEXT,
+    PRIMARY KEY (ticket_id, stage)
+);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    ticket_id   TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    PRIMARY KEY (ticket_id, name)
+);
+
+-- Every gate decision, kept across re-runs of a ticket
+CREATE TABLE IF NOT EXISTS approval_audit (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id     TEXT NOT NULL,
+    stage         TEXT NOT NULL,
+    decision      TEXT NOT NULL,
+    decided_by    TEXT NOT NULL,
+    policy        TEXT,
+    checks        TEXT,
+    reasons       TEXT,
+    artifact_url  TEXT,
+    decided_at    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_approval_audit_ticket ON approval_audit(ticket_id, id);
+"""
+
+WORKFLOW_FIELDS = {'status', 'current_step', 'completed_at', 'error'}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced (the base class cannot)"""
+
+
+class WorkflowStateStore:
+    """
+    Embedded SQLite (WAL mode) store for workflow state.
+
+    Records workflows, stage timings, approvals and artifact references so
+    status lookups and listings are local indexed queries, with or without
+    Firestore. on_change, if set, is called with (ticket_id, change) after
+    each write, e.g. to push status transitions to watchers.
+    """
+
+    def __init__(
+        self,
+        db_path: str = ".ai/state/workflows.db",
+        on_change: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ):
+        self.db_path = str(db_path)
+        self.on_change = on_change
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Weak, so a thread's connection is freed (and closed) when the thread exits
+        self._connections: "weakref.WeakSet[_Connection]" = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers proceed during writes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False, factory=_Connection)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.add(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every thread's connection; the store is unusable afterwards"""
+        with self._connections_lock:
+            connections, self._connections = list(self._connections), weakref.WeakSet()
+        for conn in connections:
+            conn.close()
+
+    def _write(self, sql: str, params: tuple = ()) -> None:
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(sql, params)
+            conn.commit()
+
+    def _changed(self, ticket_id: str, change: Dict[str, Any]) -> None:
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(ticket_id, change)
+        except Exception as e:
+            print(f"⚠️  Status change listener failed: {e}")
+
+    # ---- Writes ----
+
+    def create_workflow(self, ticket_id: str, current_step: Optional[str] = None) -> None:
+        """Start (or restart) a workflow record, clearing state from any previous run"""
+        now = _now()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO workflows (ticket_id, status, current_step, started_at, updated_at) "
+                "VALUES (?, 'RUNNING', ?, ?, ?) "
+                "ON CONFLICT(ticket_id) DO UPDATE SET status='RUNNING', current_step=excluded.current_step, "
+                "started_at=excluded.started_at, updated_at=excluded.updated_at, completed_at=NULL, error=NULL",
+                (ticket_id, current_step, now, now)
+            )
+            for table in ('stages', 'approvals', 'artifacts'):
+                conn.execute(f"DELETE FROM {table} WHERE ticket_id = ?", (ticket_id,))
+            conn.commit()
+        self._changed(ticket_id, {'type': 'workflow', 'status': 'RUNNING', 'current_step': current_step})
+
+    def update_workflow(self, ticket_id: str, **fields: Any) -> None:
+        unknown = set(fields) - WORKFLOW_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown workflow fields: {sorted(unknown)}")
+        change = {'type': 'workflow', **fields}
+        fields['updated_at'] = _now()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._write(
+            f"UPDATE workflows SET {assignments} WHERE ticket_id = ?",
+            tuple(fields.values()) + (ticket_id,)
+        )
+        self._changed(ticket_id, change)
+
+    def start_stage(self, ticket_id: str, stage: str) -> None:
+        now = _now()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO stages (ticket_id, stage, status, started_at) VALUES (?, ?, 'RUNNING', ?)",
+                (ticket_id, stage, now)
+            )
+            conn.execute(
+                "UPDATE workflows SET current_step = ?, updated_at = ? WHERE ticket_id = ?",
+                (stage, now, ticket_id)
+            )
+            conn.commit()
+        self._changed(ticket_id, {'type': 'stage', 'stage': stage, 'status': 'RUNNING'})
+
+    def finish_stage(self, ticket_id: str, stage: str, status: str = 'COMPLETED') -> None:
+        now = datetime.utcnow()
+        row = self._conn().execute(
+            "SELECT started_at FROM stages WHERE ticket_id = ? AND stage = ?", (ticket_id, stage)
+        ).fetchone()
+        duration = (now - datetime.fromisoformat(row['started_at'])).total_seconds() if row else None
+        self._write(
+            "UPDATE stages SET status = ?, completed_at = ?, duration_seconds = ? WHERE ticket_id = ? AND stage = ?",
+            (status, now.isoformat(), duration, ticket_id, stage)
+        )
+        self._changed(ticket_id, {'type': 'stage', 'stage': stage, 'status': status, 'duration_seconds': duration})
+
+    def record_approval(self, ticket_id: str, stage: str, status: str, artifact_url: Optional[str] = None) -> None:
+        now = _now()
+        decided_at = None if status == 'PENDING' else now
+        self._write(
+            "INSERT INTO approvals (ticket_id, stage, status, artifact_url, requested_at, decided_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(ticket_id, stage) DO UPDATE SET status=excluded.status, "
+            "artifact_url=COALESCE(excluded.artifact_url, approvals.artifact_url), decided_at=excluded.decided_at",
+            (ticket_id, stage, status, artifact_url, now, decided_at)
+        )
+        self._changed(ticket_id, {'type': 'approval', 'stage': stage, 'status': status})
+
+    def record_audit(
+        self,
+        ticket_id: str,
+        stage: str,
+        decision: str,
+        decided_by: str,
+        artifact_url: Optional[str] = None,
+        policy: Optional[str] = None,
+        checks: Optional[Dict[str, bool]] = None,
+        reasons: Optional[List[str]] = None
+    ) -> None:
+        """Append a gate decision; decided_by is 'policy', 'callback', 'console' or 'reviewer'"""
+        self._write(
+            "INSERT INTO approval_audit "
+            "(ticket_id, stage, decision, decided_by, policy, checks, reasons, artifact_url, decided_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ticket_id, stage, decision, decided_by, policy,
+             json.dumps(checks) if checks is not None else None,
+             json.dumps(reasons) if reasons is not None else None,
+             artifact_url, _now())
+        )
+
+    def record_artifact(self, ticket_id: str, name: str, path: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO artifacts (ticket_id, name, path, created_at) VALUES (?, ?, ?, ?)",
+            (ticket_id, name, path, _now())
+        )
+        self._changed(ticket_id, {'type': 'artifact', 'name': name})
+
+    # ---- Reads ----
+
+    def get_workflow(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM workflows WHERE ticket_id = ?", (ticket_id,)).fetchone()
+        if row is None:
+            return None
+        workflow = dict(row)
+        workflow['stages'] = [
+            dict(r) for r in conn.execute(
+                "SELECT stage, status, started_at, completed_at, duration_seconds FROM stages "
+                "WHERE ticket_id = ? ORDER BY started_at", (ticket_id,)
+            )
+        ]
+        workflow['approval_gates'] = {
+            r['stage']: dict(r) for r in conn.execute(
+                "SELECT stage, status, artifact_url, requested_at, decided_at FROM approvals WHERE ticket_id = ?",
+                (ticket_id,)
+            )
+        }
+        workflow['artifacts'] = {
+            r['name']: r['path'] for r in conn.execute(
+                "SELECT name, path FROM artifacts WHERE ticket_id = ?", (ticket_id,)
+            )
+        }
+        return workflow
+
+    def list_audit(self, ticket_id: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """Gate decisions for a ticket, oldest first"""
+        entries = []
+        for row in self._conn().execute(
+            "SELECT * FROM (SELECT * FROM approval_audit WHERE ticket_id = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+            (ticket_id, limit)
+        ):
+            entry = dict(row)
+            entry['checks'] = json.loads(entry['checks']) if entry['checks'] else {}
+            entry['reasons'] = json.loads(entry['reasons']) if entry['reasons'] else []
+            entries.append(entry)
+        return entries
+
+    def list_workflows(
+        self,
+        status: Optional[str] = None,
+        ticket_prefix: Optional[str] = None,
+        started_after: Optional[str] = None,
+        started_before: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        List workflows newest first with optional filters.
+
+        Returns:
+            {'items': [...], 'total': int, 'limit': int, 'offset': int}
+        """
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if ticket_prefix:
+            # Range scan on the primary key instead of LIKE
+            clauses.append("ticket_id >= ? AND ticket_id < ?")
+            params.extend([ticket_prefix, ticket_prefix + '￿'])
+        if started_after:
+            clauses.append("started_at >= ?")
+            params.append(started_after)
+        if started_before:
+            clauses.append("started_at < ?")
+            params.append(started_before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM workflows {where}", params).fetchone()[0]
+        items = [
+            dict(r) for r in conn.execute(
+                f"SELECT * FROM workflows {where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            )
+        ]
+        return {'items': items, 'total': total, 'limit': limit, 'offset': offset}
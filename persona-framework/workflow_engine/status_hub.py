@@ -0,0 +1,125 @@
+from typing import Dict, Any, List, Optional, Callable
+import asyncio
+import threading
+
+# Workflow statuses after which nothing else happens to a run
+TERMINAL_STATUSES = {'COMPLETED', 'FAILED', 'CANCELLED', 'REJECTED', 'CHANGES_REQUESTED'}
+
+
+class Subscription:
+    """One watcher's bounded event queue, consumed on the watcher's event loop"""
+
+    def __init__(self, ticket_id: str, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.ticket_id = ticket_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def _offer(self, event: Dict[str, Any]) -> None:
+        # A slow watcher loses its oldest events, never blocks publishers
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class StatusHub:
+    """
+    Fan-out of workflow status events to watchers (SSE clients).
+
+    Publishers (the orchestrator's state updates, from any thread) call
+    publish(); every watcher of the ticket receives the event on its own
+    queue. Watchers of one ticket share a single upstream subscription:
+    the first watcher starts it (e.g. a Firestore snapshot listener for runs
+    executing on other nodes) and the last one to leave stops it. The latest
+    event of a watched ticket is kept, so status reads while it is watched
+    need no store or Firestore read.
+    """
+
+    def __init__(
+        self,
+        upstream: Optional[Callable[[str, Callable[[Dict[str, Any]], None]], Callable[[], None]]] = None,
+        max_queue: int = 100
+    ):
+        """
+        Args:
+            upstream: Called as upstream(ticket_id, publish) when a ticket gets
+                its first watcher; returns a function that stops it
+            max_queue: Events buffered per watcher
+        """
+        self.upstream = upstream
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._upstreams: Dict[str, Callable[[], None]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._sequence: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, ticket_id: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        subscription = Subscription(ticket_id, loop or asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(ticket_id, [])
+            subscribers.append(subscription)
+            first = len(subscribers) == 1
+        if first and self.upstream:
+            try:
+                stop = self.upstream(ticket_id, lambda event: self.publish(ticket_id, event))
+            except Exception as e:
+                print(f"⚠️  Could not start status listener for {ticket_id}: {e}")
+            else:
+                with self._lock:
+                    if self._subscribers.get(ticket_id):
+                        self._upstreams[ticket_id] = stop
+                        stop = None
+                if stop:
+                    stop()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        stop = None
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.ticket_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.ticket_id, None)
+                self._latest.pop(subscription.ticket_id, None)
+                self._sequence.pop(subscription.ticket_id, None)
+                stop = self._upstreams.pop(subscription.ticket_id, None)
+        if stop:
+            try:
+                stop()
+            except Exception as e:
+                print(f"⚠️  Could not stop status listener for {subscription.ticket_id}: {e}")
+
+    def has_subscribers(self, ticket_id: str) -> bool:
+        return ticket_id in self._subscribers
+
+    def watching(self) -> int:
+        """Number of tickets with at least one watcher"""
+        return len(self._subscribers)
+
+    def publish(self, ticket_id: str, event: Dict[str, Any]) -> None:
+        """Deliver event to the ticket's watchers (safe from any thread)"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(ticket_id, ()))
+            if not subscribers:
+                return
+            sequence = self._sequence[ticket_id] = self._sequence.get(ticket_id, 0) + 1
+            event = {**event, 'ticket_id': ticket_id, 'sequence': sequence}
+            self._latest[ticket_id] = event
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError:
+                # Watcher's loop already closed; it is removed when its stream ends
+                pass
+
+    def latest(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Most recent event of a watched ticket"""
+        return self._latest.get(ticket_id)
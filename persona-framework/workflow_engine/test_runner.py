@@ -0,0 +1,269 @@
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+import xml.etree.ElementTree as ET
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows - no rlimits, timeouts still apply
+    resource = None
+
+# Only results parsed from a completed pytest run are reproducible enough to cache;
+# timeouts and killed runs can be one-off slowness or load
+CACHEABLE_STATUSES = ('passed', 'failed')
+
+# Applies the rlimits inside the child, then runs the module as `python -m` would.
+# (preexec_fn is not safe to use from the runner's worker threads.)
+# argv: -c <cpu seconds> <memory bytes> <module> <module args...>
+LIMITS_WRAPPER = (
+    "import resource, runpy, sys\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "sys.argv = sys.argv[3:]\n"
+    "runpy.run_module(sys.argv[0], run_name='__main__', alter_sys=True)\n"
+)
+
+
+class TestRunner:
+    """
+    Executes generated unit tests against generated code in a throwaway tree.
+
+    Each test file runs in its own subprocess (in parallel) with a wall-clock
+    timeout and CPU/memory rlimits. Passed and failed results are cached by
+    the combined hash of the code bundle and the test file, so unchanged
+    pairs are never re-run; timeouts and killed runs are retried next time.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        max_workers: int = 4,
+        timeout_seconds: int = 60,
+        cpu_seconds: int = 60,
+        memory_mb: int = 1024
+    ):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.coverage_available = importlib.util.find_spec('coverage') is not None
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.cache_file and self.cache_file.exists():
+            try:
+                self._cache = json.loads(self.cache_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._cache = {}
+
+    def run(self, code_files: Dict[str, str], test_files: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Run generated tests against generated code.
+
+        Args:
+            code_files: Dictionary of {filename: code_content}
+            test_files: Dictionary of {test_filename: test_code}
+
+        Returns:
+            {'passed', 'failed', 'errors', 'skipped', 'all_passed',
+             'results': {test_filename: result}, 'cache_hits', 'duration_seconds'}
+        """
+        started = time.perf_counter()
+        code_hash = self._bundle_hash(code_files)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        with self._lock:
+            for test_name, test_code in test_files.items():
+                key = hashlib.sha256(
+                    f"{code_hash}\0{test_name}\0{test_code}".encode('utf-8')
+                ).hexdigest()
+                keys[test_name] = key
+                if key in self._cache:
+                    results[test_name] = dict(self._cache[key], cached=True)
+                else:
+                    pending[test_name] = test_code
+        cache_hits = len(results)
+
+        if pending:
+            with tempfile.TemporaryDirectory(prefix="persona-sandbox-") as tmp:
+                root = Path(tmp)
+                self._materialise(root, code_files)
+                self._materialise(root, test_files)
+
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    futures = {name: pool.submit(self._run_one, root, name) for name in pending}
+                    for name, future in futures.items():
+                        results[name] = future.result()
+
+            with self._lock:
+                for name in pending:
+                    if results[name]['status'] in CACHEABLE_STATUSES:
+                        self._cache[keys[name]] = results[name]
+            self._persist()
+
+        totals = {'passed': 0, 'failed': 0, 'errors': 0, 'skipped': 0}
+        for result in results.values():
+            for field in totals:
+                totals[field] += result.get(field, 0)
+
+        return {
+            **totals,
+            'all_passed': all(r['status'] in ('passed', 'unsupported') for r in results.values()),
+            'results': results,
+            'cache_hits': cache_hits,
+            'duration_seconds': round(time.perf_counter() - started, 3),
+        }
+
+    # ---- Internals ----
+
+    @staticmethod
+    def _bundle_hash(files: Dict[str, str]) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(files):
+            digest.update(name.encode('utf-8') + b'\0' + files[name].encode('utf-8') + b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def _safe_path(root: Path, filename: str) -> Optional[Path]:
+        """Map a generated filename into root, refusing absolute or escaping paths"""
+        parts = [p for p in PurePosixPath(filename.replace('\\', '/')).parts if p not in ('', '.', '/')]
+        if not parts or '..' in parts:
+            return None
+        return root.joinpath(*parts)
+
+    def _materialise(self, root: Path, files: Dict[str, str]) -> None:
+        for filename, content in files.items():
+            path = self._safe_path(root, filename)
+            if path is None:
+                print(f"   ⚠️  Skipping unsafe path in generated files: {filename}")
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding='utf-8')
+
+        # Make every directory importable as a package for generated imports
+        for directory in [root, *[p for p in root.rglob('*') if p.is_dir()]]:
+            init_file = directory / '__init__.py'
+            if directory != root and not init_file.exists():
+                init_file.write_text('', encoding='utf-8')
+
+    def _limited(self, module: str, args: List[str]) -> List[str]:
+        """Command running `python -m module args` under the CPU/memory rlimits"""
+        if resource is None:
+            return [sys.executable, '-m', module] + args
+        return [sys.executable, '-c', LIMITS_WRAPPER, str(self.cpu_seconds),
+                str(self.memory_mb * 1024 * 1024), module] + args
+
+    def _run_one(self, root: Path, test_name: str) -> Dict[str, Any]:
+        test_path = self._safe_path(root, test_name)
+        if test_path is None or not test_name.endswith('.py'):
+            return {'status': 'unsupported', 'passed': 0, 'failed': 0, 'errors': 0, 'skipped': 0,
+                    'output': 'Only pytest test files are executed'}
+
+        report_dir = Path(tempfile.mkdtemp(prefix="report-", dir=root))
+        junit_path = report_dir / 'junit.xml'
+        coverage_data = report_dir / '.coverage'
+        pytest_args = ['-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+                       f'--junitxml={junit_path}', '--rootdir', str(root), str(test_path)]
+        if self.coverage_available:
+            cmd = self._limited('coverage', ['run', f'--data-file={coverage_data}',
+                                             f'--source={root}', '--omit=*/test_*,*_test.py'] + pytest_args)
+        else:
+            cmd = self._limited('pytest', pytest_args[2:])
+
+        env = {
+            'PATH': os.environ.get('PATH', ''),
+            'PYTHONPATH': str(root),
+            'PYTHONDONTWRITEBYTECODE': '1',
+            'HOME': str(root),
+        }
+
+        started = time.perf_counter()
+        try:
+            completed = subprocess.run(
+                cmd,
+                cwd=root,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=self.timeout_seconds,
+            )
+        except subprocess.TimeoutExpired as e:
+            output = e.stdout.decode('utf-8', 'replace') if isinstance(e.stdout, bytes) else (e.stdout or '')
+            return {'status': 'timeout', 'passed': 0, 'failed': 0, 'errors': 1, 'skipped': 0,
+                    'duration_seconds': self.timeout_seconds, 'output': output[-2000:]}
+
+        result = self._parse_junit(junit_path)
+        result['duration_seconds'] = round(time.perf_counter() - started, 3)
+        result['return_code'] = completed.returncode
+        result['output'] = (completed.stdout + completed.stderr)[-2000:]
+        if self.coverage_available and coverage_data.exists():
+            result['coverage_percent'] = self._coverage_percent(root, coverage_data, env)
+
+        if completed.returncode < 0:  # killed by a signal, e.g. CPU or memory rlimit
+            result['status'] = 'killed'
+            result['errors'] = max(1, result['errors'])
+        elif result['failed'] or result['errors']:
+            result['status'] = 'failed'
+        elif completed.returncode not in (0, 5):  # 5 = no tests collected
+            result['status'] = 'error'
+            result['errors'] = max(1, result['errors'])
+        else:
+            result['status'] = 'passed'
+        return result
+
+    @staticmethod
+    def _parse_junit(junit_path: Path) -> Dict[str, Any]:
+        counts = {'passed': 0, 'failed': 0, 'errors': 0, 'skipped': 0}
+        if not junit_path.exists():
+            return counts
+        try:
+            tree = ET.parse(junit_path)
+        except ET.ParseError:
+            return counts
+        for suite in tree.iter('testsuite'):
+            tests = int(suite.get('tests', 0))
+            failures = int(suite.get('failures', 0))
+            errors = int(suite.get('errors', 0))
+            skipped = int(suite.get('skipped', 0))
+            counts['failed'] += failures
+            counts['errors'] += errors
+            counts['skipped'] += skipped
+            counts['passed'] += tests - failures - errors - skipped
+        return counts
+
+    def _coverage_percent(self, root: Path, data_file: Path, env: Dict[str, str]) -> Optional[float]:
+        json_path = data_file.with_suffix('.json')
+        try:
+            subprocess.run(
+                [sys.executable, '-m', 'coverage', 'json', f'--data-file={data_file}', '-o', str(json_path), '-q'],
+                cwd=root, env=env, capture_output=True, timeout=self.timeout_seconds
+            )
+            report = json.loads(json_path.read_text(encoding='utf-8'))
+            return round(report['totals']['percent_covered'], 2)
+        except (OSError, ValueError, KeyError, subprocess.TimeoutExpired):
+            return None
+
+    def _persist(self) -> None:
+        if not self.cache_file:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                payload = json.dumps(self._cache)
+            self.cache_file.write_text(payload, encoding='utf-8')
+        except OSError as e:
+            print(f"   ⚠️  Could not persist test result cache: {e}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Standalone queue worker process
+
+Usage:
+    python -m workflow_engine.worker --workers 4 [--auto-approve]
+
+Runs workflow jobs from the shared job queue (JOB_QUEUE_BACKEND, see
+workflow_engine.job_queue.create_job_queue) without serving the API.
+Start as many of these processes, on as many nodes, as throughput needs;
+jobs are leased, so a crashed worker's job is picked up by another one and
+resumes from its last approved stage.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from workflow_engine.orchestrator import ApprovalStatus
+from workflow_engine.project_registry import OrchestratorRegistry
+from workflow_engine.job_queue import QueueWorker, create_job_queue
+
+
+def _auto_approve(stage: str, artifact_url: str) -> ApprovalStatus:
+    print(f"🤖 Auto-approving {stage} stage")
+    return ApprovalStatus.APPROVED
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run workflow jobs from the shared job queue")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKER_CONCURRENCY', '2')),
+                        help="Concurrent jobs in this process")
+    parser.add_argument('--auto-approve', action='store_true',
+                        default=os.getenv('QUEUE_AUTO_APPROVE', 'false').lower() == 'true',
+                        help="Approve every gate; otherwise jobs wait at each gate for "
+                             "POST /api/v1/queue/jobs/{job_id}/approve")
+    parser.add_argument('--poll-seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Jobs run on their payload's project (PROJECTS_FILE), the default project otherwise
+    registry = OrchestratorRegistry.from_env()
+    queue = create_job_queue()
+    node = f"{socket.gethostname()}-{os.getpid()}"
+    workers = [
+        QueueWorker(
+            queue,
+            registry,
+            worker_id=f"{node}-{i}",
+            approval_callback=_auto_approve if args.auto_approve else None,
+            poll_seconds=args.poll_seconds
+        )
+        for i in range(args.workers)
+    ]
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    print(f"👷 {node}: {len(workers)} worker(s), lease {queue.lease_seconds:g}s")
+    for worker in workers:
+        worker.start()
+    stopping.wait()
+
+    # Running jobs keep their lease until it expires, then another worker resumes them
+    print("👋 Stopping workers...")
+    for worker in workers:
+        worker.stop(timeout=1)
+    registry.shutdown()
+
+
+if __name__ == "__main__":
+    main()